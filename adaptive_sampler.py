@@ -0,0 +1,100 @@
+import os
+import json
+import cv2
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Decides, per candidate frame on the PROCESS_FPS grid, whether the heavy models
+# (YOLO + MediaPipe) run. The score is apply_global_motion's blurred absdiff, on a
+# thumbnail: busy scenes get every candidate, idle ones one call every MAX_INTERVAL.
+THUMB_WIDTH = 160
+BLUR_KERNEL = (5, 5)          # ~21x21 at 1080p, scaled to the thumbnail
+LOW_MOTION = 1.0              # At or below: idle, sample every MAX_INTERVAL candidates
+HIGH_MOTION = 4.0             # At or above: busy, sample every candidate
+SCENE_CHANGE = 20.0           # Drift since the last model call that forces a call
+MAX_INTERVAL = 10             # 2 s between model calls at PROCESS_FPS = 5
+
+
+class AdaptiveSampler:
+    def __init__(self, low=LOW_MOTION, high=HIGH_MOTION, scene_change=SCENE_CHANGE, max_interval=MAX_INTERVAL):
+        self.low = low
+        self.high = high
+        self.scene_change = scene_change
+        self.max_interval = max_interval
+        self.prev = None        # Thumbnail of the previous candidate
+        self.last_called = None # Thumbnail of the last frame the models saw
+        self.since_call = 0
+        self.candidates = 0
+        self.calls = 0
+        self.scene_changes = 0
+
+    def _thumb(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (THUMB_WIDTH, max(1, round(h * THUMB_WIDTH / w))), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), BLUR_KERNEL, 0)
+
+    def interval(self, score):
+        """Candidates between model calls for a given motion score (1 = every one)."""
+        if score >= self.high:
+            return 1
+        if score <= self.low:
+            return self.max_interval
+        frac = (score - self.low) / (self.high - self.low)
+        return max(1, int(round(self.max_interval - frac * (self.max_interval - 1))))
+
+    def should_process(self, frame):
+        thumb = self._thumb(frame)
+        self.candidates += 1
+        self.since_call += 1
+        call = self.prev is None
+        if not call:
+            score = float(np.mean(cv2.absdiff(self.prev, thumb)))
+            drift = float(np.mean(cv2.absdiff(self.last_called, thumb)))
+            if drift >= self.scene_change:
+                self.scene_changes += 1
+                call = True
+            else:
+                call = self.since_call >= self.interval(score)
+        self.prev = thumb
+        if call:
+            self.last_called = thumb
+            self.since_call = 0
+            self.calls += 1
+        return call
+
+    def merge(self, other):
+        self.candidates += other["candidates"]
+        self.calls += other["model_calls"]
+        self.scene_changes += other["scene_changes"]
+
+    def report(self, **extra):
+        saved = self.candidates - self.calls
+        return {
+            **extra,
+            "candidates": self.candidates,
+            "model_calls": self.calls,
+            "saved_calls": saved,
+            "saved_pct": round(100.0 * saved / self.candidates, 1) if self.candidates else 0.0,
+            "scene_changes": self.scene_changes,
+            "settings": {"low_motion": self.low, "high_motion": self.high,
+                         "scene_change": self.scene_change, "max_interval": self.max_interval},
+        }
+
+
+def report_path(base_name, output_dir):
+    return os.path.join(output_dir, f"{base_name}_sampling.json")
+
+
+def write_report(report, base_name, output_dir):
+    with open(report_path(base_name, output_dir), "w") as f:
+        json.dump(report, f, indent=4)
+
+
+def rolling_seconds(series, frames, seconds, fps):
+    """Time-based rolling window over rows whose sampling-grid frame numbers have gaps.
+    On an unbroken grid it covers the same rows as rolling(window=fps * seconds)."""
+    index = pd.to_timedelta((np.asarray(frames) - 1) / fps, unit="s")
+    return pd.Series(np.asarray(series), index=index).rolling(f"{seconds}s", min_periods=1)
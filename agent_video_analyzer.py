@@ -3,12 +3,19 @@ import sys
 import time
 import json
 import base64
+import hashlib
+import argparse
 import tempfile
+import threading
 import subprocess
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import requests
 import pandas as pd
 from loguru import logger
 from dotenv import load_dotenv
+import work_bouts
 
 load_dotenv()
 
@@ -18,14 +25,180 @@ load_dotenv()
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:8080")
 VISION_MODEL    = os.getenv("OLLAMA_VISION_MODEL", "llava:latest")
 
+# Retry transient failures (connection drops, timeouts, 5xx) with exponential backoff
+REQUEST_TIMEOUT_S = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+MAX_RETRIES       = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+RETRY_BACKOFF_S   = float(os.getenv("OLLAMA_RETRY_BACKOFF", "2.0"))
+
+# ── Multiple backends ────────────────────────────────────────────────────────
+# OLLAMA_BASE_URLS is a comma-separated list of servers; requests go to the
+# least-loaded healthy one and fail over when a backend errors out.
+OLLAMA_BASE_URLS         = [u.strip() for u in os.getenv("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",") if u.strip()]
+BACKEND_MAX_CONCURRENCY  = int(os.getenv("OLLAMA_BACKEND_CONCURRENCY", "1"))
+HEALTH_CHECK_TIMEOUT_S   = 3.0
+HEALTH_RECHECK_S         = 30.0   # How long a failed backend sits out before being probed again
+UNHEALTHY_AFTER_ERRORS   = 2      # Consecutive 5xx before a reachable backend is taken out
+
+# ── Chunked (map-reduce) mode for long recordings ────────────────────────────
+# Long videos are split into windows aligned to work/idle bout boundaries; each
+# window gets its own vision call and the per-window JSON is merged afterwards.
+CHUNKED_AUTO_S   = 20 * 60   # Videos longer than this use chunked mode by default
+WINDOW_TARGET_S  = 120       # Close a window at the first bout boundary past this length
+WINDOW_MAX_S     = 300       # Bouts longer than this are cut mid-bout
+WINDOW_MIN_S     = 20        # A shorter trailing window is folded into the previous one
+WINDOW_FRAMES    = 8         # Frames sent per window
+WINDOW_CACHE_DIR = "outputs/agent_cache"
+
 MASTER_CSV = "master_dashboard.csv"
+MASTER_CSV_LOCK = threading.Lock()  # analyze_video may run on several threads at once
+
+# ── Backend scheduling ────────────────────────────────────────────────────────
+
+class Backend:
+    def __init__(self, url: str, max_concurrency: int):
+        self.url = url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.healthy = True
+        self.retry_at = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.latencies = deque(maxlen=1000)
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.max_concurrency
+
+    def summary(self) -> dict:
+        lat = np.array(self.latencies)
+        return {
+            "backend": self.url,
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 3) if self.requests else 0.0,
+            "p50_s": round(float(np.percentile(lat, 50)), 3) if len(lat) else None,
+            "p95_s": round(float(np.percentile(lat, 95)), 3) if len(lat) else None,
+        }
+
+
+class BackendPool:
+    """Least-loaded scheduling over several Ollama servers with per-backend
+    concurrency limits, health checks and failover."""
+
+    def __init__(self, urls: list[str], max_concurrency: int = BACKEND_MAX_CONCURRENCY):
+        if not urls:
+            raise ValueError("BackendPool needs at least one backend URL")
+        self.backends = [Backend(u, max_concurrency) for u in urls]
+        self.cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.backends)
+
+    @property
+    def capacity(self) -> int:
+        return sum(b.max_concurrency for b in self.backends)
+
+    def probe(self, backend: Backend) -> bool:
+        try:
+            requests.get(f"{backend.url}/api/tags", timeout=HEALTH_CHECK_TIMEOUT_S).raise_for_status()
+            ok = True
+        except requests.RequestException:
+            ok = False
+        with self.cond:
+            backend.healthy = ok
+            backend.retry_at = 0.0 if ok else time.monotonic() + HEALTH_RECHECK_S
+            self.cond.notify_all()
+        return ok
+
+    def health_check(self) -> list[dict]:
+        for b in self.backends:
+            ok = self.probe(b)
+            logger.info(f"Backend {b.url}: {'healthy' if ok else 'UNREACHABLE'}")
+        return [b.summary() for b in self.backends]
+
+    def _recheck_due(self):
+        now = time.monotonic()
+        with self.cond:
+            due = [b for b in self.backends if not b.healthy and b.retry_at <= now]
+            for b in due:
+                b.retry_at = now + HEALTH_RECHECK_S  # Only one thread probes it
+        for b in due:
+            if self.probe(b):
+                logger.info(f"Backend {b.url} is back online.")
+
+    def acquire(self, exclude: set[str] = frozenset()) -> Backend:
+        """Block until a backend has a free slot and return the least-loaded one."""
+        self._recheck_due()
+        with self.cond:
+            while True:
+                candidates = [b for b in self.backends if b.url not in exclude and b.healthy]
+                if not candidates:
+                    # Everything is marked down: try the excluded/unhealthy ones rather than stall
+                    candidates = [b for b in self.backends if b.url not in exclude] or self.backends
+                free = [b for b in candidates if b.in_flight < b.max_concurrency]
+                if free:
+                    backend = min(free, key=lambda b: (b.load, np.mean(b.latencies) if b.latencies else 0.0))
+                    backend.in_flight += 1
+                    backend.requests += 1
+                    return backend
+                self.cond.wait(timeout=1.0)
+
+    def release(self, backend: Backend, ok: bool, latency_s: float | None = None, unreachable: bool = False):
+        with self.cond:
+            backend.in_flight -= 1
+            if ok:
+                backend.healthy = True
+                backend.consecutive_errors = 0
+                if latency_s is not None:
+                    backend.latencies.append(latency_s)
+            else:
+                backend.errors += 1
+                backend.consecutive_errors += 1
+                if unreachable or backend.consecutive_errors >= UNHEALTHY_AFTER_ERRORS:
+                    backend.healthy = False
+                    backend.retry_at = time.monotonic() + HEALTH_RECHECK_S
+            self.cond.notify_all()
+
+    def summary(self) -> list[dict]:
+        with self.cond:
+            return [b.summary() for b in self.backends]
+
+
+_backend_pool = None
+_backend_pool_lock = threading.Lock()
+
+
+def configure_backends(urls: list[str], max_concurrency: int = BACKEND_MAX_CONCURRENCY) -> BackendPool:
+    global _backend_pool
+    with _backend_pool_lock:
+        _backend_pool = BackendPool(urls, max_concurrency)
+    return _backend_pool
+
+
+def get_backend_pool() -> BackendPool:
+    global _backend_pool
+    with _backend_pool_lock:
+        if _backend_pool is None:
+            _backend_pool = BackendPool(OLLAMA_BASE_URLS, BACKEND_MAX_CONCURRENCY)
+        return _backend_pool
+
+
+def print_backend_summary():
+    rows = get_backend_pool().summary()
+    print("\n" + "=" * 90)
+    print("OLLAMA BACKEND SUMMARY")
+    print("=" * 90)
+    for row in rows:
+        print(f"{row['backend']:<32} healthy={str(row['healthy']):<5} requests={row['requests']:<5} "
+              f"errors={row['errors']:<4} p50={row['p50_s'] or '-'}s p95={row['p95_s'] or '-'}s")
+    print("=" * 90 + "\n")
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def extract_frames(video_path: str, num_frames: int = 16) -> list[str]:
-    """Extract up to `num_frames` evenly-spaced frames from *video_path*.
-    Returns a list of temporary PNG file paths (caller must delete them)."""
-    # Get duration via ffprobe
+def probe_duration(video_path: str) -> float | None:
+    """Duration of the first video stream in seconds, via ffprobe."""
     probe_cmd = [
         "ffprobe", "-v", "error",
         "-select_streams", "v:0",
@@ -34,16 +207,34 @@ def extract_frames(video_path: str, num_frames: int = 16) -> list[str]:
         video_path,
     ]
     try:
-        duration = float(subprocess.check_output(probe_cmd, stderr=subprocess.DEVNULL).strip())
+        return float(subprocess.check_output(probe_cmd, stderr=subprocess.DEVNULL).strip())
     except Exception:
-        duration = 60.0  # fallback
+        return None
+
+
+def extract_frames(video_path: str, num_frames: int = 16,
+                   start_s: float | None = None, duration_s: float | None = None) -> list[str]:
+    """Extract up to `num_frames` evenly-spaced frames from *video_path*, optionally
+    restricted to the window [start_s, start_s + duration_s).
+    Returns a list of temporary PNG file paths (caller must delete them)."""
+    if duration_s is None:
+        duration = probe_duration(video_path) or 60.0  # fallback
+    else:
+        duration = duration_s
 
     interval = max(duration / num_frames, 1.0)
     tmp_dir  = tempfile.mkdtemp(prefix="ollama_frames_")
     out_pattern = os.path.join(tmp_dir, "frame_%04d.png")
 
+    # -ss/-t before -i seeks on keyframes, so a window costs only its own decode
+    window_args = []
+    if start_s is not None:
+        window_args += ["-ss", f"{start_s:.2f}"]
+    if duration_s is not None:
+        window_args += ["-t", f"{duration_s:.2f}"]
+
     ffmpeg_cmd = [
-        "ffmpeg", "-y", "-i", video_path,
+        "ffmpeg", "-y", *window_args, "-i", video_path,
         "-vf", f"fps=1/{interval:.2f}",
         "-vframes", str(num_frames),
         "-q:v", "3",
@@ -60,28 +251,98 @@ def extract_frames(video_path: str, num_frames: int = 16) -> list[str]:
     return frames
 
 
+def cleanup_frames(frames: list[str]):
+    for f in frames:
+        try:
+            os.remove(f)
+            os.rmdir(os.path.dirname(f))
+        except Exception:
+            pass
+
+
 def encode_image_b64(path: str) -> str:
     with open(path, "rb") as f:
         return base64.b64encode(f.read()).decode("utf-8")
 
 
-def ollama_generate(prompt: str, images_b64: list[str]) -> str:
-    """Call the Ollama /api/generate endpoint with vision support."""
+def ollama_generate(prompt: str, images_b64: list[str], stream: bool = False, stats: dict | None = None) -> str:
+    """Call the Ollama /api/generate endpoint with vision support.
+    Requests go to the least-loaded healthy backend; when one fails the request
+    fails over to another, and once every backend has failed it backs off and
+    retries, up to MAX_RETRIES rounds. If *stats* is given, `attempts`,
+    `retries`, `failovers`, `backend` and (when streaming) `first_token_s` are recorded in it."""
     payload = {
         "model":  VISION_MODEL,
         "prompt": prompt,
         "images": images_b64,
-        "stream": False,
+        "stream": stream,
         "options": {
             "temperature": 0.1,
             "num_predict": 1024,
         },
     }
-    url = f"{OLLAMA_BASE_URL}/api/generate"
-    logger.info(f"Sending request to {url} with {len(images_b64)} image(s)...")
-    resp = requests.post(url, json=payload, timeout=300)
-    resp.raise_for_status()
-    return resp.json().get("response", "")
+    pool = get_backend_pool()
+    stats = stats if stats is not None else {}
+    stats.setdefault("attempts", 0)
+    stats.setdefault("retries", 0)
+    stats.setdefault("failovers", 0)
+
+    tried = set()
+    rounds = 0
+    while True:
+        stats["attempts"] += 1
+        backend = pool.acquire(exclude=tried)
+        url = f"{backend.url}/api/generate"
+        logger.info(f"Sending request to {url} with {len(images_b64)} image(s)...")
+        started = time.perf_counter()
+        released = False
+        try:
+            with requests.post(url, json=payload, timeout=REQUEST_TIMEOUT_S, stream=stream) as resp:
+                resp.raise_for_status()
+                if not stream:
+                    text = resp.json().get("response", "")
+                else:
+                    # Ollama streams one JSON object per line until "done": true
+                    pieces = []
+                    for line in resp.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if not pieces:
+                            stats.setdefault("first_token_s", time.perf_counter() - started)
+                        pieces.append(chunk.get("response", ""))
+                        if chunk.get("done"):
+                            break
+                    text = "".join(pieces)
+            pool.release(backend, ok=True, latency_s=time.perf_counter() - started)
+            released = True
+            stats["backend"] = backend.url
+            return text
+        except (requests.RequestException, ValueError) as e:
+            # ValueError: a malformed (e.g. truncated) JSON body or stream line; worth a retry
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            retryable = status is None or status >= 500 or status == 429
+            pool.release(backend, ok=not retryable, unreachable=status is None and not isinstance(e, ValueError))
+            released = True
+            if not retryable:
+                raise
+            tried.add(backend.url)
+            if len(tried) < len(pool):
+                stats["failovers"] += 1
+                logger.warning(f"Request to {url} failed ({e}); failing over to another backend")
+                continue
+            if rounds == MAX_RETRIES:
+                raise
+            wait = RETRY_BACKOFF_S * (2 ** rounds)
+            rounds += 1
+            tried.clear()
+            stats["retries"] += 1
+            logger.warning(f"Request to {url} failed ({e}); retrying in {wait:.1f}s ({rounds}/{MAX_RETRIES})")
+            time.sleep(wait)
+        finally:
+            # Any other error (or Ctrl-C) must still hand the slot back, or later acquire() calls block forever
+            if not released:
+                pool.release(backend, ok=False)
 
 
 def parse_json_from_response(text: str) -> dict:
@@ -99,9 +360,191 @@ def parse_json_from_response(text: str) -> dict:
     return json.loads(text[start:end])
 
 
+JSON_SCHEMA_PROMPT = """Based on the provided frames, return ONLY a valid JSON object (no markdown, no extra text) with these exact keys:
+
+{
+  "primary_trade": "String (e.g., Plumber, Mason, Electrician)",
+  "specific_tasks": "String (short list of specific tasks observed)",
+  "quantified_output": "String (quantify actions, e.g., '5 joints welded, 3 pipes cut')",
+  "universal_efficiency_score": <Integer 1-100 judging how well physical exertion translated to actual work output>,
+  "performance_summary": "String (2-sentence summary of work ethic and technique)"
+}
+
+Return ONLY valid JSON. No markdown code fences."""
+
+
+def build_prompt(cv_productivity, cv_peak_exertion) -> str:
+    return f"""You are analyzing frames extracted from first-person (POV) body-camera footage of a construction worker.
+
+A computer vision pipeline already computed these quantitative metrics for the full video:
+- Physical Productivity (Active Global Motion): {cv_productivity}% of the video
+- Peak Physical Exertion: {cv_peak_exertion} pixels of frame-shake
+
+{JSON_SCHEMA_PROMPT}"""
+
+
+def build_window_prompt(window: dict) -> str:
+    # Only window-local context, so a window's prompt (and cache key) does not
+    # change when more footage is appended to the recording
+    return f"""You are analyzing frames extracted from one segment of a long first-person (POV) body-camera recording of a construction worker.
+
+This segment covers {fmt_ts(window['start_s'])}–{fmt_ts(window['end_s'])} of the recording.
+A computer vision pipeline marked the worker as actively working for {window['working_pct']:.0f}% of this segment.
+
+{JSON_SCHEMA_PROMPT}"""
+
+
+# ── Chunked (map-reduce) analysis ─────────────────────────────────────────────
+
+def fmt_ts(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def plan_windows(duration_s: float, bouts: list[dict] | None = None,
+                 target_s: float = WINDOW_TARGET_S, max_s: float = WINDOW_MAX_S,
+                 min_s: float = WINDOW_MIN_S) -> list[dict]:
+    """Split [0, duration_s) into windows that end on work/idle bout boundaries.
+    Windows are planned greedily from the start, so appending footage only
+    changes the last window(s) and earlier ones keep their cache entries."""
+    bouts = bouts or []
+    edges = sorted({b["end_s"] for b in bouts if 0 < b["end_s"] < duration_s} | {duration_s})
+
+    spans, start = [], 0.0
+    for edge in edges:
+        while edge - start > max_s:
+            spans.append((start, start + target_s))
+            start += target_s
+        if edge - start >= target_s or edge == duration_s:
+            if edge > start:
+                spans.append((start, edge))
+            start = edge
+    if len(spans) > 1 and spans[-1][1] - spans[-1][0] < min_s:
+        tail = spans.pop()
+        spans[-1] = (spans[-1][0], tail[1])
+
+    windows = []
+    for start, end in spans:
+        working = sum(
+            max(0.0, min(end, b["end_s"]) - max(start, b["start_s"]))
+            for b in bouts if b["working"]
+        )
+        windows.append({
+            "start_s": round(start, 2),
+            "end_s": round(end, 2),
+            "working_pct": 100.0 * working / (end - start) if bouts else 0.0,
+        })
+    return windows
+
+
+def window_cache_path(base_name: str, window: dict, prompt: str, num_frames: int, images_b64: list[str]) -> str:
+    # Keyed on the frames sampled from this window, so a re-recorded clip with the same
+    # base name misses while appended footage leaves earlier windows' entries valid
+    digest = hashlib.sha1()
+    for image in images_b64:
+        digest.update(image.encode("ascii"))
+    key = hashlib.sha1(json.dumps([VISION_MODEL, prompt, num_frames, digest.hexdigest()]).encode("utf-8")).hexdigest()[:12]
+    name = f"{window['start_s']:.2f}-{window['end_s']:.2f}_{key}.json"
+    return os.path.join(WINDOW_CACHE_DIR, base_name, name)
+
+
+def analyze_window(video_path: str, base_name: str, window: dict, num_frames: int = WINDOW_FRAMES) -> dict:
+    """Map step: one vision call for one window, cached on disk by its sampled frames."""
+    prompt = build_window_prompt(window)
+    frames = []
+    try:
+        frames = extract_frames(video_path, num_frames=num_frames,
+                                start_s=window["start_s"], duration_s=window["end_s"] - window["start_s"])
+        images_b64 = [encode_image_b64(f) for f in frames]
+    finally:
+        cleanup_frames(frames)
+
+    cache_path = window_cache_path(base_name, window, prompt, num_frames, images_b64)
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return json.load(f)
+
+    raw_response = ollama_generate(prompt, images_b64)
+    result = parse_json_from_response(raw_response)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, "w") as f:
+        json.dump(result, f, indent=4)
+    return result
+
+
+def split_tasks(tasks) -> list[str]:
+    if isinstance(tasks, list):
+        tasks = ", ".join(str(t) for t in tasks)
+    return [t.strip() for t in str(tasks or "").split(",") if t.strip()]
+
+
+def merge_window_results(windows: list[dict], results: list[dict]) -> dict:
+    """Reduce step: fold per-window JSON into the single-video schema, weighting by window length."""
+    trades, tasks = Counter(), Counter()
+    outputs, ues_sum, ues_weight = [], 0.0, 0.0
+    for window, data in zip(windows, results):
+        weight = window["end_s"] - window["start_s"]
+        trade = str(data.get("primary_trade") or "").strip().title()
+        if trade:
+            trades[trade] += weight
+        for task in split_tasks(data.get("specific_tasks")):
+            tasks[task.lower()] += weight
+        if data.get("quantified_output"):
+            outputs.append(f"[{fmt_ts(window['start_s'])}] {data['quantified_output']}")
+        try:
+            ues_sum += float(data.get("universal_efficiency_score")) * weight
+            ues_weight += weight
+        except (TypeError, ValueError):
+            pass
+
+    total_s = windows[-1]["end_s"] - windows[0]["start_s"] if windows else 0.0
+    longest = max(range(len(windows)), key=lambda i: windows[i]["end_s"] - windows[i]["start_s"]) if windows else None
+    lead = results[longest].get("performance_summary", "") if longest is not None else ""
+    return {
+        "primary_trade": trades.most_common(1)[0][0] if trades else "Unknown",
+        "specific_tasks": ", ".join(t.capitalize() for t, _ in tasks.most_common(8)),
+        "quantified_output": "; ".join(outputs),
+        "universal_efficiency_score": round(ues_sum / ues_weight) if ues_weight else 0,
+        "performance_summary": f"{lead} (Merged from {len(windows)} segments covering {fmt_ts(total_s)}.)".strip(),
+    }
+
+
+def analyze_video_chunked(video_path: str, base_name: str, num_frames: int = WINDOW_FRAMES) -> dict:
+    bouts = work_bouts.load_bouts(base_name)
+    duration = probe_duration(video_path)
+    if duration is None:
+        duration = bouts[-1]["end_s"] if bouts else 60.0
+    windows = plan_windows(duration, bouts)
+    logger.info(f"Chunked analysis: {len(windows)} windows over {fmt_ts(duration)} "
+                f"({'bout-aligned' if bouts else 'fixed-length, no per-frame data'})")
+
+    workers = max(1, min(len(windows), get_backend_pool().capacity))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda w: analyze_window(video_path, base_name, w, num_frames), windows))
+    return merge_window_results(windows, results)
+
+
 # ── Main entry ────────────────────────────────────────────────────────────────
 
-def analyze_video(video_path: str, num_frames: int = 16):
+def master_columns(ai_data: dict) -> dict:
+    """The master CSV's AI columns for one analysis result."""
+    return {
+        "AI_Trade":   ai_data.get("primary_trade", "Unknown"),
+        "AI_Tasks":   ai_data.get("specific_tasks", "Unknown"),
+        "AI_Output":  ai_data.get("quantified_output", "Unknown"),
+        "AI_UES":     ai_data.get("universal_efficiency_score", 0),
+        "AI_Summary": ai_data.get("performance_summary", "Unknown"),
+    }
+
+
+def analyze_video(video_path: str, num_frames: int = 16, chunked: bool | None = None,
+                  cv_metrics: dict | None = None, update_master: bool = True):
+    """Analyze one video and back-fill its AI columns in the master CSV.
+    *chunked* forces map-reduce mode on or off; by default it is used for videos
+    longer than CHUNKED_AUTO_S. *cv_metrics* (a master row) skips reading the OpenCV
+    metrics from the master CSV; with *update_master* off the result is only saved as
+    JSON and returned."""
     if not os.path.exists(video_path):
         logger.error(f"Video not found: {video_path}")
         return
@@ -110,8 +553,11 @@ def analyze_video(video_path: str, num_frames: int = 16):
 
     # 1. Read existing OpenCV Metrics
     try:
-        df = pd.read_csv(MASTER_CSV)
-        video_row = df[df["Video"] == base_name]
+        if cv_metrics is not None:
+            video_row = pd.DataFrame([cv_metrics])
+        else:
+            df = pd.read_csv(MASTER_CSV)
+            video_row = df[df["Video"] == base_name]
         if video_row.empty:
             logger.warning(f"No OpenCV metrics found in {MASTER_CSV} for {base_name}.")
             cv_productivity  = "Unknown"
@@ -125,39 +571,30 @@ def analyze_video(video_path: str, num_frames: int = 16):
 
     logger.info(f"OpenCV metrics → Productivity: {cv_productivity}%, Peak Exertion: {cv_peak_exertion}px")
 
+    if chunked is None:
+        chunked = (probe_duration(video_path) or 0.0) > CHUNKED_AUTO_S
+
     # 2. Extract frames
     frames = []
     try:
-        frames = extract_frames(video_path, num_frames=num_frames)
-
-        # Encode frames to base64
-        images_b64 = [encode_image_b64(f) for f in frames]
-
-        # 3. Build prompt
-        prompt = f"""You are analyzing frames extracted from first-person (POV) body-camera footage of a construction worker.
-
-A computer vision pipeline already computed these quantitative metrics for the full video:
-- Physical Productivity (Active Global Motion): {cv_productivity}% of the video
-- Peak Physical Exertion: {cv_peak_exertion} pixels of frame-shake
-
-Based on the provided frames, return ONLY a valid JSON object (no markdown, no extra text) with these exact keys:
+        if chunked:
+            # 2-5. One vision call per bout-aligned window, merged into one result
+            ai_data = analyze_video_chunked(video_path, base_name)
+        else:
+            frames = extract_frames(video_path, num_frames=num_frames)
 
-{{
-  "primary_trade": "String (e.g., Plumber, Mason, Electrician)",
-  "specific_tasks": "String (short list of specific tasks observed)",
-  "quantified_output": "String (quantify actions, e.g., '5 joints welded, 3 pipes cut')",
-  "universal_efficiency_score": <Integer 1-100 judging how well physical exertion translated to actual work output>,
-  "performance_summary": "String (2-sentence summary of work ethic and technique)"
-}}
+            # Encode frames to base64
+            images_b64 = [encode_image_b64(f) for f in frames]
 
-Return ONLY valid JSON. No markdown code fences."""
+            # 3. Build prompt
+            prompt = build_prompt(cv_productivity, cv_peak_exertion)
 
-        # 4. Call Ollama
-        raw_response = ollama_generate(prompt, images_b64)
-        logger.debug(f"Raw Ollama response:\n{raw_response}")
+            # 4. Call Ollama
+            raw_response = ollama_generate(prompt, images_b64)
+            logger.debug(f"Raw Ollama response:\n{raw_response}")
 
-        # 5. Parse JSON
-        ai_data = parse_json_from_response(raw_response)
+            # 5. Parse JSON
+            ai_data = parse_json_from_response(raw_response)
         logger.success(f"AI Analysis:\n{json.dumps(ai_data, indent=2)}")
 
         # 6. Save raw JSON
@@ -167,34 +604,34 @@ Return ONLY valid JSON. No markdown code fences."""
             json.dump(ai_data, f, indent=4)
         logger.success(f"Saved → {output_file}")
 
-        # 7. Update Master CSV
-        if not video_row.empty:
-            idx = df.index[df["Video"] == base_name].tolist()[0]
-            df.at[idx, "AI_Trade"]   = ai_data.get("primary_trade", "Unknown")
-            df.at[idx, "AI_Tasks"]   = ai_data.get("specific_tasks", "Unknown")
-            df.at[idx, "AI_Output"]  = ai_data.get("quantified_output", "Unknown")
-            df.at[idx, "AI_UES"]     = ai_data.get("universal_efficiency_score", 0)
-            df.at[idx, "AI_Summary"] = ai_data.get("performance_summary", "Unknown")
-            df.to_csv(MASTER_CSV, index=False)
+        # 7. Update Master CSV (re-read under the lock: other videos may be finishing concurrently)
+        if update_master and not video_row.empty:
+            with MASTER_CSV_LOCK:
+                df = pd.read_csv(MASTER_CSV)
+                idx = df.index[df["Video"] == base_name].tolist()[0]
+                for column, value in master_columns(ai_data).items():
+                    df.at[idx, column] = value
+                df.to_csv(MASTER_CSV, index=False)
             logger.success(f"Updated {MASTER_CSV} for {base_name}")
+        return ai_data
 
     except Exception as e:
         logger.error(f"Analysis failed for {video_path}: {e}")
         raise
     finally:
         # Cleanup temp frames
-        for f in frames:
-            try:
-                os.remove(f)
-                os.rmdir(os.path.dirname(f))
-            except Exception:
-                pass
+        cleanup_frames(frames)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        video_to_analyze = sys.argv[1]
-    else:
-        video_to_analyze = "IronsiteHackathonData/14_production_mp.mp4"
-
-    analyze_video(video_to_analyze)
+    parser = argparse.ArgumentParser(description="Analyze one body-cam video with the Ollama vision model.")
+    parser.add_argument("video", nargs="?", default="IronsiteHackathonData/14_production_mp.mp4")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--chunked", dest="chunked", action="store_true", default=None,
+                      help="Force map-reduce mode (one call per bout-aligned window)")
+    mode.add_argument("--single", dest="chunked", action="store_false",
+                      help="Force a single call over the whole video")
+    parser.set_defaults(chunked=None)
+    args = parser.parse_args()
+
+    analyze_video(args.video, chunked=args.chunked)
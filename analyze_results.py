@@ -1,7 +1,8 @@
 import os
+import argparse
 import pandas as pd
-import google.generativeai as genai
 from loguru import logger
+import report_context
 
 # ---------------------------------------------------------
 # CONFIGURATION
@@ -12,36 +13,36 @@ REPORT_OUTPUT = 'outputs/Final_AI_Site_Report.txt'
 # TODO: Add your Gemini API Key here
 # Get a free key at: https://aistudio.google.com/
 API_KEY = "[ENCRYPTION_KEY]"
-genai.configure(api_key=API_KEY)
 
-def generate_site_report(df):
-    logger.info("Preparing data for the LLM...")
-    
+# Prompt size is capped regardless of how many videos are in the master table.
+# A share of the budget goes to the per-trade summaries that are generated first.
+TOKEN_BUDGET = report_context.DEFAULT_TOKEN_BUDGET
+TRADE_NOTES_SHARE = 0.3
+
+
+def gemini_generate_fn():
+    import google.generativeai as genai
+    genai.configure(api_key=API_KEY)
     # We use Gemini 2.5 Flash because it is highly capable for text/data tasks and very fast
     model = genai.GenerativeModel('gemini-2.5-flash')
-    
-    # 1. Calculate some site-wide aggregates from your exact data
-    total_videos = len(df)
-    avg_productivity = round(df['Productivity %'].mean(), 1)
-    max_exertion_val = df['Peak Exertion (px)'].max()
-    max_exertion_video = df.loc[df['Peak Exertion (px)'].idxmax()]['Video']
-    common_tasks = df['Detected Task'].value_counts().index.tolist()
-    
-    # 2. Convert the dataframe to a string format the LLM can easily read
-    raw_data_string = df.to_string(index=False)
-    
-    # 3. Build the Prompt
-    prompt = f"""
+    return lambda prompt: model.generate_content(prompt).text
+
+
+def ollama_generate_fn():
+    # Local stand-in (an Ollama text model, or mock_ollama_server.py for testing)
+    import agent_video_analyzer
+    return lambda prompt: agent_video_analyzer.ollama_generate(prompt, [])
+
+
+def build_prompt(n_videos, data_context, trade_notes):
+    return f"""
     You are an AI Site Supervisor for a construction company. 
-    I have run a computer vision pipeline on {total_videos} video feeds across the site today. 
+    I have run a computer vision pipeline on {n_videos} video feeds across the site today. 
     
-    Here is the exact numerical data extracted:
-    {raw_data_string}
+    Here is a summary of the numerical data extracted:
+    {data_context}
     
-    Site-Wide Aggregates:
-    - Average Site Productivity: {avg_productivity}%
-    - Highest Peak Exertion: {max_exertion_val} pixels/frame (Observed in video: {max_exertion_video})
-    - Most common tasks detected: {', '.join(common_tasks)}
+    {trade_notes}
     
     Based ONLY on the data provided above, write a comprehensive but concise 4-part report for the site manager:
     
@@ -52,13 +53,31 @@ def generate_site_report(df):
     
     Format the output cleanly with bold headings. Maintain a professional, analytical tone.
     """
+
+
+def generate_site_report(df, generate_fn=None, token_budget=TOKEN_BUDGET):
+    logger.info("Preparing data for the LLM...")
+    generate_fn = generate_fn or gemini_generate_fn()
     
-    logger.info("Sending data to Gemini for analysis...")
+    # 1. Summarize each trade in parallel with small, separately budgeted prompts
+    notes_budget = int(token_budget * TRADE_NOTES_SHARE)
+    trade_summaries = report_context.summarize_trades(df, generate_fn)
+    trade_notes = report_context.merge_trade_summaries(trade_summaries, notes_budget)
+    
+    # 2. Precomputed aggregates, rollups, rankings and outliers fitted to what the
+    # fixed instructions and the trade notes leave of the budget
+    template_tokens = report_context.estimate_tokens(build_prompt(len(df), "", ""))
+    context_budget = max(0, token_budget - template_tokens - report_context.estimate_tokens(trade_notes))
+    data_context = report_context.build_report_context(df, token_budget=context_budget)
+    
+    # 3. Build the Prompt
+    prompt = build_prompt(len(df), data_context, trade_notes)
+    
+    logger.info(f"Sending ~{report_context.estimate_tokens(prompt)} tokens to the LLM for analysis...")
     
     try:
         # 4. Generate the response
-        response = model.generate_content(prompt)
-        report_text = response.text
+        report_text = generate_fn(prompt)
         
         # 5. Save the report
         os.makedirs('outputs', exist_ok=True)
@@ -71,11 +90,18 @@ def generate_site_report(df):
         print("="*50)
         print(report_text)
         print("="*50 + "\n")
+        return report_text
         
     except Exception as e:
         logger.error(f"Failed to generate report. Error: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate the executive site report from the master dashboard.")
+    parser.add_argument("--backend", choices=["gemini", "ollama"], default="gemini",
+                        help="ollama uses OLLAMA_BASE_URL (a local model or mock_ollama_server.py)")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    args = parser.parse_args()
+    
     if not os.path.exists(MASTER_CSV):
         logger.error(f"Could not find {MASTER_CSV}. Please ensure your previous script generated it.")
         return
@@ -87,7 +113,8 @@ def main():
         logger.warning(f"The file {MASTER_CSV} is empty.")
         return
         
-    generate_site_report(df)
+    generate_fn = ollama_generate_fn() if args.backend == "ollama" else gemini_generate_fn()
+    generate_site_report(df, generate_fn=generate_fn, token_budget=args.token_budget)
 
 if __name__ == "__main__":
     main()
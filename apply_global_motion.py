@@ -5,6 +5,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from loguru import logger
+import timeline_pyramid
+import adaptive_sampler
+import event_index
 
 INPUT_DIR = 'IronsiteHackathonData/'
 OUTPUT_DIR = 'outputs/'
@@ -13,7 +16,22 @@ PROCESS_FPS = 5
 
 global_movement_threshold = 2.0  # Mean pixel difference required to be "Action"
 
+def blurred_gray(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(gray, (21, 21), 0)
+
+
+def motion_score(prev_gray, gray):
+    """Mean pixel difference between two consecutive sampled frames (0 for the first)."""
+    return 0 if prev_gray is None else np.mean(cv2.absdiff(prev_gray, gray))
+
+
 def process_motion_for_video(video_path, base_name):
+    return apply_motion_scores(base_name, motion_scores(video_path))
+
+
+def motion_scores(video_path):
+    """{sampled frame number: motion score} over the PROCESS_FPS grid of the video."""
     cap = cv2.VideoCapture(video_path)
     fps = int(cap.get(cv2.CAP_PROP_FPS))
     frame_skip = max(1, int(fps / PROCESS_FPS))
@@ -31,30 +49,33 @@ def process_motion_for_video(video_path, base_name):
         if frame_count % frame_skip != 0: continue
             
         analyzed_frames += 1
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
-        
-        score = 0
-        if prev_frame is not None:
-            score = np.mean(cv2.absdiff(prev_frame, gray))
-            
-        motion_data.append({"frame": analyzed_frames, "motion_score": score})
+        gray = blurred_gray(frame)
+        motion_data.append({"frame": analyzed_frames, "motion_score": motion_score(prev_frame, gray)})
         prev_frame = gray
 
     cap.release()
-    
+    return pd.Series({m['frame']: m['motion_score'] for m in motion_data}, dtype=float)
+
+
+def apply_motion_scores(base_name, scores):
+    """Use *scores* ({sampled frame number: motion score}) as the exertion signal of the
+    video's _data.csv: rewrite it with motion-based is_working, plot it, return the master row."""
     # --- Map this back to the existing CSV data ---
     csv_path = os.path.join(OUTPUT_DIR, f"{base_name}_data.csv")
     if os.path.exists(csv_path):
         df = pd.read_csv(csv_path)
         # We need to map our new motion_score back into the DataFrame
-        # The lengths should match exactly since we used the same frame_skip logic
-        min_len = min(len(df), len(motion_data))
-        df = df.iloc[:min_len].copy()
-        df['smoothed_exertion'] = [m['motion_score'] for m in motion_data[:min_len]]
+        # Match on the frame number, not the row: adaptively sampled data has gaps in `frame`,
+        # and rows without a score (decode ended early) are dropped
+        weighted = 'weight' in df
+        df = df[df['frame'].isin(scores.index)].copy()
+        df['smoothed_exertion'] = df['frame'].map(scores).to_numpy()
         
         # Smooth the global motion to remove micro-jitters
-        df['smoothed_exertion'] = df['smoothed_exertion'].rolling(window=PROCESS_FPS, min_periods=1).mean()
+        if weighted:
+            df['smoothed_exertion'] = adaptive_sampler.rolling_seconds(df['smoothed_exertion'], df['frame'], 1, PROCESS_FPS).mean().to_numpy()
+        else:
+            df['smoothed_exertion'] = df['smoothed_exertion'].rolling(window=PROCESS_FPS, min_periods=1).mean()
         
         # WORKER IS ACTIVE IF THE CAMERA/BODY IS SHAKING
         df['is_working'] = df['smoothed_exertion'] > global_movement_threshold
@@ -69,6 +90,8 @@ def process_motion_for_video(video_path, base_name):
             task = f"Handling {Counter(all_tools).most_common(1)[0][0]}".title()
             
         df.to_csv(csv_path, index=False)
+        timeline_pyramid.save_pyramid(df, base_name, OUTPUT_DIR, PROCESS_FPS)
+        event_index.save_index(df, base_name, OUTPUT_DIR, PROCESS_FPS)
         
         # Output Plot
         plt.style.use('dark_background')
@@ -100,13 +123,16 @@ def process_motion_for_video(video_path, base_name):
         plt.savefig(os.path.join(OUTPUT_DIR, f"{base_name}_plot.png"), dpi=300)
         plt.close()
 
-        prod = (df['is_working'].sum() / len(df)) * 100
+        weight = df['weight'] if weighted else 1
+        total = int(np.sum(weight)) if weighted else len(df)
+        working = int((df['is_working'] * weight).sum())
+        prod = (working / total) * 100
         logger.info(f"{base_name} mapped. New Prod: {prod:.1f}%")
         
         return {
             "Video": base_name,
-            "Total Frames": len(df),
-            "Working Frames": int(df['is_working'].sum()),
+            "Total Frames": total,
+            "Working Frames": working,
             "Productivity %": round(prod, 1),
             "Peak Exertion (px)": round(df['smoothed_exertion'].max(), 2),
             "Detected Task": task
@@ -1,33 +1,39 @@
 import os
-import time
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 import agent_video_analyzer
 
 VIDEO_DIR = "IronsiteHackathonData/"
 
+def analyze_one(i, total, video):
+    video_path = os.path.join(VIDEO_DIR, video)
+    logger.info(f"[{i+1}/{total}] Processing {video_path}...")
+    try:
+        agent_video_analyzer.analyze_video(video_path)
+    except Exception as e:
+        logger.error(f"Failed to process {video_path}: {e}")
+
+
 def main():
     videos = [f for f in os.listdir(VIDEO_DIR) if f.endswith('.mp4')]
     videos.sort()
     
     logger.info(f"Starting batch AI analysis on {len(videos)} videos...")
     
-    for i, video in enumerate(videos):
-        # We know 14_production_mp.mp4 was already processed
-        if video == "14_production_mp.mp4":
-            logger.info("Skipping 14_production_mp.mp4 as it was already completed.")
-            continue
-            
-        video_path = os.path.join(VIDEO_DIR, video)
-        logger.info(f"[{i+1}/{len(videos)}] Processing {video_path}...")
-        try:
-            agent_video_analyzer.analyze_video(video_path)
-        except Exception as e:
-            logger.error(f"Failed to process {video_path}: {e}")
-            
-        # Optional sleep to be careful with rate limits if needed
-        # but the video processing takes ~1 min itself
-        time.sleep(5)
+    # Check every backend up front; unreachable ones sit out and are re-probed later
+    pool = agent_video_analyzer.get_backend_pool()
+    pool.health_check()
+    
+    # Keep every backend slot busy: the pool hands each request to the least-loaded server
+    with ThreadPoolExecutor(max_workers=pool.capacity) as executor:
+        for i, video in enumerate(videos):
+            # We know 14_production_mp.mp4 was already processed
+            if video == "14_production_mp.mp4":
+                logger.info("Skipping 14_production_mp.mp4 as it was already completed.")
+                continue
+            executor.submit(analyze_one, i, len(videos), video)
         
+    agent_video_analyzer.print_backend_summary()
     logger.success("Batch analysis complete!")
 
 if __name__ == "__main__":
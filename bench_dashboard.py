@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Renders dashboard.py headlessly (streamlit.testing) against a synthetic master
+# table and times a cold render, a warm rerun, a filter change and a page flip.
+DASHBOARD = os.path.abspath(os.path.join(os.path.dirname(__file__), "dashboard.py"))
+DEFAULT_ROWS = 10_000
+TRADES = ["Mason", "Plumber", "Electrician", "Carpenter", "Construction Worker", "Welder", "Roofer"]
+TASKS = ["Handling Hardhat", "Handling Brick", "Handling Pipe", "Handling Drill", "General Labor", "Handling Ladder"]
+
+
+def synthetic_master(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    total = rng.integers(1_000, 150_000, rows)
+    prod = rng.uniform(20, 100, rows).round(1)
+    return pd.DataFrame({
+        "Video": [f"{i:05d}_site_clip" for i in range(rows)],
+        "Total Frames": total,
+        "Working Frames": (total * prod / 100).astype(int),
+        "Productivity %": prod,
+        "Peak Exertion (px)": rng.uniform(5, 120, rows).round(2),
+        "Detected Task": rng.choice(TASKS, rows),
+        "AI_Trade": rng.choice(TRADES, rows),
+        "AI_Tasks": "Laying bricks, spreading mortar",
+        "AI_Output": "12 bricks laid",
+        "AI_UES": rng.integers(40, 100, rows).astype(float),
+        "AI_Summary": "Steady pace with consistent technique.",
+        "Date": pd.to_datetime("2026-01-01") + pd.to_timedelta(rng.integers(0, 180, rows), unit="D"),
+    })
+
+
+def timed(label, fn, results):
+    started = time.perf_counter()
+    at = fn()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(f"{label}: dashboard raised {at.exception}")
+    results[label] = round(elapsed, 3)
+    logger.info(f"{label:<14} {elapsed * 1000:8.1f} ms")
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard render time on a large synthetic archive.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--json", help="Write the timings to this JSON file")
+    args = parser.parse_args()
+
+    # Imported here so the CLI --help works without streamlit installed
+    from streamlit.testing.v1 import AppTest
+
+    results = {"rows": args.rows}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="dash_bench_") as tmp:
+        os.makedirs(os.path.join(tmp, "outputs"))
+        synthetic_master(args.rows).to_csv(os.path.join(tmp, "master_dashboard.csv"), index=False)
+        os.chdir(tmp)
+        try:
+            at = AppTest.from_file(DASHBOARD, default_timeout=120)
+            timed("cold_render", at.run, results)
+            timed("warm_rerun", at.run, results)
+            at.sidebar.multiselect[0].select(TRADES[0])
+            timed("filter_trade", at.run, results)
+            at.number_input[0].set_value(3)
+            timed("page_flip", at.run, results)
+        finally:
+            os.chdir(cwd)
+
+    print(json.dumps(results, indent=4))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
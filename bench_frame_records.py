@@ -0,0 +1,99 @@
+import gc
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from loguru import logger
+import frame_records
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Memory and time of the per-frame record path in process_video: the old list of
+# dicts + pd.DataFrame(list) vs. FrameRecordBuffer + to_frame().
+DEFAULT_ROWS = 180_000     # 10-hour shift sampled at 5 fps
+CLASS_NAMES = {0: "Hardhat", 1: "Brick", 2: "Drill", 3: "Pipe", 4: "Ladder"}
+
+
+def synthetic_records(rows, seed=0):
+    """Yields record dicts shaped like first_person_pipeline.new_frame_record + detections."""
+    rng = np.random.default_rng(seed)
+    for i in range(rows):
+        ids = [int(c) for c in rng.integers(0, len(CLASS_NAMES), rng.integers(0, 4))]
+        seen_l, seen_r = rng.random() < 0.7, rng.random() < 0.6
+        yield {
+            "frame": i + 1,
+            "lw_x": int(rng.integers(0, 1920)) if seen_l else np.nan,
+            "lw_y": int(rng.integers(0, 1080)) if seen_l else np.nan,
+            "rw_x": int(rng.integers(0, 1920)) if seen_r else np.nan,
+            "rw_y": int(rng.integers(0, 1080)) if seen_r else np.nan,
+            "objects_detected": len(ids),
+            "objects_list": ", ".join(CLASS_NAMES[c] for c in ids),
+            "class_ids": ids,
+        }
+
+
+def measure(build, records):
+    """Feed *records* through *build*; returns (DataFrame, stats)."""
+    gc.collect()
+    tracemalloc.start()
+    container, to_frame = build()
+    append_s = 0.0
+    for r in records:
+        start = time.perf_counter()
+        container.append(r)
+        append_s += time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    df = to_frame(container)
+    to_frame_s = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, {
+        "records_mb": round(retained / 1e6, 2),
+        "peak_mb": round(peak / 1e6, 2),
+        "with_frame_mb": round(current / 1e6, 2),
+        "append_s": round(append_s, 3),   # Under tracemalloc, so relative only
+        "to_frame_s": round(to_frame_s, 3),
+    }
+
+
+def dict_path():
+    return [], lambda data: pd.DataFrame(data).drop(columns="class_ids")
+
+
+def buffer_path():
+    # Same columns as the dicts: the landmark store is measured separately
+    return frame_records.FrameRecordBuffer(landmarks=False), lambda buf: buf.to_frame()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-frame record memory: list of dicts vs FrameRecordBuffer.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    # Records are generated inside the measurement, as in process_video, so the dicts
+    # the old path keeps alive are counted; generation time is the same for both
+    logger.info(f"Measuring {args.rows} frame records...")
+    df_dicts, dicts = measure(dict_path, synthetic_records(args.rows))
+    df_buffer, buffer = measure(buffer_path, synthetic_records(args.rows))
+
+    # Same table either way (objects_list is categorical in the buffer path)
+    pd.testing.assert_frame_equal(df_dicts, df_buffer.astype({"objects_list": object}), check_dtype=False)
+
+    results = {"rows": args.rows, "list_of_dicts": dicts, "record_buffer": buffer,
+               "records_ratio": round(dicts["records_mb"] / max(buffer["records_mb"], 1e-6), 1),
+               "peak_ratio": round(dicts["peak_mb"] / max(buffer["peak_mb"], 1e-6), 1)}
+    print(json.dumps(results, indent=4))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import cv2
+import numpy as np
+from loguru import logger
+import first_person_pipeline as fpp
+import benchmark_pipeline
+import frame_prep
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Per-frame allocations and latency of the detect + hands path: source-size frames
+# for both models (baseline) vs. one shared resize into reused buffers (frame_prep).
+RESOLUTIONS = [(1920, 1080), (1280, 720)]
+DEFAULT_WORK_WIDTH = 640
+DEFAULT_SECONDS = 10
+DEFAULT_FRAMES = 40
+WRIST_COLUMNS = ("lw_x", "lw_y", "rw_x", "rw_y")
+
+
+def load_frames(width, height, seconds, count):
+    clip = benchmark_pipeline.get_clip(seconds, width, height, benchmark_pipeline.DEFAULT_FPS,
+                                       benchmark_pipeline.DEFAULT_SEED)
+    cap = cv2.VideoCapture(clip)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def analyze(frame, prep):
+    record = fpp.new_frame_record(1)
+    if prep is not None:
+        prep.load(frame)
+    annotated = fpp.detect_objects(frame, record, prep=prep)
+    fpp.track_hands(annotated, record, prep=prep)
+    return record
+
+
+def measure(frames, prep):
+    """Transient bytes allocated per frame (traced peak above the steady state) and latency."""
+    analyze(frames[0], prep)   # Warm-up; also allocates the prep buffers once
+    tracemalloc.start()
+    transient, retained = [], []
+    for frame in frames:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        analyze(frame, prep)
+        after, peak = tracemalloc.get_traced_memory()
+        transient.append(peak - before)
+        retained.append(after - before)
+    tracemalloc.stop()
+
+    # Latency without tracemalloc's overhead
+    latencies, records = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        records.append(analyze(frame, prep))
+        latencies.append(time.perf_counter() - start)
+    transient, latencies = np.array(transient), np.array(latencies)
+    return records, {
+        "transient_kb_p50": round(float(np.median(transient)) / 1024, 1),
+        "transient_kb_max": round(float(transient.max()) / 1024, 1),
+        "retained_kb_per_frame": round(float(np.mean(retained)) / 1024, 2),
+        "latency_ms_p50": round(float(np.median(latencies)) * 1000, 2),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)) * 1000, 2),
+    }
+
+
+def wrist_drift(baseline, shared):
+    """Mean |wrist px difference| where both runs saw the hand: checks the coordinate mapping."""
+    a = np.array([[r[k] for k in WRIST_COLUMNS] for r in baseline], dtype=float)
+    b = np.array([[r[k] for k in WRIST_COLUMNS] for r in shared], dtype=float)
+    both = ~np.isnan(a) & ~np.isnan(b)
+    return round(float(np.abs(a - b)[both].mean()), 2) if both.any() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame allocations and latency: source-size model inputs vs shared preprocessing.")
+    parser.add_argument("--work-width", type=int, default=DEFAULT_WORK_WIDTH)
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument("--backend", choices=["stub", "real"], default="stub",
+                        help="stub: colour-threshold detectors, no weights needed; real: YOLO + MediaPipe models")
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+    benchmark_pipeline.use_backend(args.backend)
+
+    results = {"backend": args.backend, "work_width": args.work_width, "frames": args.frames, "resolutions": {}}
+    for width, height in RESOLUTIONS:
+        logger.info(f"Measuring {width}x{height}...")
+        frames = load_frames(width, height, DEFAULT_SECONDS, args.frames)
+        base_records, baseline = measure(frames, None)
+        shared_records, shared = measure(frames, frame_prep.FramePrep(args.work_width))
+        results["resolutions"][f"{width}x{height}"] = {
+            "baseline": baseline,
+            "shared": shared,
+            "transient_ratio": round(baseline["transient_kb_p50"] / max(shared["transient_kb_p50"], 1e-6), 1),
+            "speedup": round(baseline["latency_ms_p50"] / max(shared["latency_ms_p50"], 1e-6), 2),
+            "wrist_drift_px": wrist_drift(base_records, shared_records),
+            "objects_agree_pct": round(100.0 * np.mean([a["objects_list"] == b["objects_list"]
+                                                        for a, b in zip(base_records, shared_records)]), 1),
+        }
+
+    print(json.dumps(results, indent=4))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
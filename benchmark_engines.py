@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import cv2
+import numpy as np
+from loguru import logger
+import yolo_engines
+import detection_reuse
+import benchmark_pipeline
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Latency, throughput and detection agreement of the YOLO CPU engines against the
+# PyTorch baseline, on a fixed set of frames extracted once from a clip.
+FRAME_SET_DIR = 'benchmarks/engine_frames'
+RESULTS_DIR = benchmark_pipeline.RESULTS_DIR
+DEFAULT_FRAMES = 60
+WARMUP = 5
+DEFAULT_REPEAT = 3
+
+
+def build_frame_set(video_path, count, frame_dir):
+    """Evenly spaced frames of *video_path* as PNGs (lossless, so every engine and every
+    later run sees identical pixels). Reused when the directory already holds them."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    out_dir = os.path.join(frame_dir, f"{stem}_{count}")
+    paths = sorted(os.path.join(out_dir, f) for f in os.listdir(out_dir)) if os.path.isdir(out_dir) else []
+    if len(paths) == count:
+        return paths
+
+    os.makedirs(out_dir, exist_ok=True)
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    wanted = set(np.linspace(0, max(total - 1, 0), count).astype(int).tolist())
+    paths, idx = [], 0
+    while len(paths) < len(wanted):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if idx in wanted:
+            paths.append(os.path.join(out_dir, f"{idx:07d}.png"))
+            cv2.imwrite(paths[-1], frame)
+        idx += 1
+    cap.release()
+    logger.info(f"Frame set: {len(paths)} frames of {video_path} in {out_dir}")
+    return paths
+
+
+def run_engine(model, frame_paths, repeat):
+    """Per-frame latencies (fastest of *repeat* passes per frame) and the detections of the last pass."""
+    first = cv2.imread(frame_paths[0])
+    for _ in range(WARMUP):
+        model(first, verbose=False)
+
+    latencies = np.full(len(frame_paths), np.inf)
+    detections = []
+    for i, path in enumerate(frame_paths):
+        frame = cv2.imread(path)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            boxes = model(frame, verbose=False)[0].boxes
+            latencies[i] = min(latencies[i], time.perf_counter() - start)
+        detections.append((detection_reuse.to_numpy(boxes.xyxy).reshape(-1, 4),
+                           detection_reuse.to_numpy(boxes.cls).astype(np.int64)))
+    return latencies, detections
+
+
+def agreement(baseline, detections):
+    """How closely *detections* reproduce the PyTorch boxes: same-class matches at IoU >= 0.5."""
+    held = ref = matched = same_set = 0
+    ious = []
+    for (ref_xyxy, ref_cls), (xyxy, cls) in zip(baseline, detections):
+        n, frame_ious = detection_reuse.match_boxes(xyxy, cls, ref_xyxy, ref_cls)
+        held += len(cls)
+        ref += len(ref_cls)
+        matched += n
+        ious.extend(frame_ious)
+        same_set += int(set(cls.tolist()) == set(ref_cls.tolist()))
+    return {
+        "precision": round(matched / held, 3) if held else None,
+        "recall": round(matched / ref, 3) if ref else None,
+        "mean_iou": round(float(np.mean(ious)), 3) if ious else None,
+        "class_set_agreement": round(same_set / len(baseline), 3) if baseline else None,
+        "boxes": held,
+        "baseline_boxes": ref,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare YOLO CPU inference engines against the PyTorch baseline.")
+    parser.add_argument("--video", help="Clip to take the frame set from (default: a synthetic POV clip)")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="Size of the fixed frame set")
+    parser.add_argument("--engines", nargs="+", choices=list(yolo_engines.ENGINES),
+                        default=list(yolo_engines.ENGINES))
+    parser.add_argument("--weights", default="yolov8n-construction.pt")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Keep the fastest of N runs per frame")
+    parser.add_argument("--out", help=f"Result JSON (default: {RESULTS_DIR}/engines_<timestamp>.json)")
+    args = parser.parse_args()
+
+    video = args.video or benchmark_pipeline.get_clip(benchmark_pipeline.DEFAULT_SECONDS, benchmark_pipeline.DEFAULT_WIDTH,
+                                                      benchmark_pipeline.DEFAULT_HEIGHT, benchmark_pipeline.DEFAULT_FPS,
+                                                      benchmark_pipeline.DEFAULT_SEED)
+    frame_paths = build_frame_set(video, args.frames, FRAME_SET_DIR)
+    engines = ["pytorch"] + [e for e in args.engines if e != "pytorch"]  # Baseline first
+
+    results = {}
+    baseline = None
+    for engine in engines:
+        start = time.perf_counter()
+        path = yolo_engines.ensure_engine(args.weights, engine)
+        prepare_s = time.perf_counter() - start
+        model = yolo_engines.load_engine(args.weights, engine)
+        logger.info(f"Timing {engine} ({path})...")
+        latencies, detections = run_engine(model, frame_paths, args.repeat)
+        if baseline is None:
+            baseline = detections
+        results[engine] = {
+            "model_path": path,
+            "prepare_s": round(prepare_s, 2),   # Export time on a cold cache, hash check otherwise
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+            "mean_ms": round(float(latencies.mean()) * 1000, 2),
+            "throughput_fps": round(len(latencies) / float(latencies.sum()), 2),
+            "agreement": agreement(baseline, detections),
+        }
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": benchmark_pipeline._git_commit(),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(),
+                     "processor": platform.processor(), "cpus": os.cpu_count()},
+        "config": {"video": video, "frames": len(frame_paths), "weights": args.weights,
+                   "imgsz": yolo_engines.IMGSZ, "int8_data": yolo_engines.INT8_DATA, "repeat": args.repeat},
+        "engines": results,
+    }
+
+    base_ms = results["pytorch"]["mean_ms"]
+    print(f"\n{'engine':<16}{'p50 ms':>9}{'p95 ms':>9}{'fps':>8}{'speedup':>9}{'prec':>7}{'recall':>8}{'IoU':>7}")
+    for engine, r in results.items():
+        a = r["agreement"]
+        fmt = lambda v: f"{v:.3f}" if v is not None else "-"
+        print(f"{engine:<16}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['throughput_fps']:>8.1f}"
+              f"{base_ms / r['mean_ms']:>8.2f}x{fmt(a['precision']):>7}{fmt(a['recall']):>8}{fmt(a['mean_iou']):>7}")
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"engines_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=4)
+    logger.success(f"Engine benchmark saved to {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,416 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+import cv2
+import numpy as np
+import pandas as pd
+from loguru import logger
+import first_person_pipeline as fpp
+import frame_records
+import apply_global_motion
+import recalculate_metrics
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Stage timings for the CV pipeline on deterministic synthetic POV clips, so
+# performance can be measured without IronsiteHackathonData/ or model weights.
+CLIP_CACHE_DIR = 'benchmarks/clips'
+RESULTS_DIR = 'benchmarks/results'
+DEFAULT_SECONDS = 60
+DEFAULT_WIDTH = 1280
+DEFAULT_HEIGHT = 720
+DEFAULT_FPS = 30
+DEFAULT_SEED = 7
+DEFAULT_REPEAT = 3
+REGRESSION_TOLERANCE = 0.15   # Flag stages whose median per-call time grew by more than this
+
+STAGES = ["decode", "detect", "hands", "encode", "metrics", "plot", "global_motion", "recalculate"]
+
+# Colours of the synthetic scene (BGR) and the HSV ranges the stub detectors look for
+SKIN_BGR = (90, 140, 200)
+TOOL_BGR = (0, 215, 230)     # Yellow power tool
+BRICK_BGR = (30, 40, 170)
+SKIN_HSV = ((5, 80, 120), (20, 185, 255))
+STUB_CLASSES = {
+    0: ("Drill", ((25, 200, 120), (35, 255, 255))),
+    1: ("Brick", ((0, 190, 90), (4, 255, 255))),
+}
+
+
+# ---------------------------------------------------------
+# SYNTHETIC CLIPS
+# ---------------------------------------------------------
+def clip_path(seconds, width, height, fps, seed, cache_dir=CLIP_CACHE_DIR):
+    return os.path.join(cache_dir, f"synthetic_{width}x{height}_{fps}fps_{seconds}s_seed{seed}.mp4")
+
+
+def work_schedule(seconds, rng):
+    """Alternating work / idle bouts of 2-10 s: [(start_s, end_s, working)]."""
+    bouts, t, working = [], 0.0, True
+    while t < seconds:
+        length = float(rng.uniform(2, 10))
+        bouts.append((t, min(t + length, seconds), working))
+        t += length
+        working = not working
+    return bouts
+
+
+def _background(width, height, margin, rng):
+    # Low-saturation "concrete" texture, larger than the frame so the camera can shake over it
+    h, w = height + 2 * margin, width + 2 * margin
+    noise = rng.integers(0, 255, (h // 8 + 1, w // 8 + 1), dtype=np.uint8)
+    texture = cv2.resize(noise, (w, h), interpolation=cv2.INTER_CUBIC)[:h, :w]
+    gradient = np.linspace(60, 140, h, dtype=np.float32)[:, None]
+    gray = np.clip(0.35 * texture + gradient, 0, 255).astype(np.uint8)
+    bg = cv2.merge([gray, (gray * 1.03).clip(0, 255).astype(np.uint8), (gray * 1.08).clip(0, 255).astype(np.uint8)])
+    step = max(height // 6, 20)
+    for y in range(0, h, step):  # Block courses to give the global-motion pass texture
+        cv2.line(bg, (0, y), (w, y), (70, 70, 75), 2)
+    return bg
+
+
+def make_synthetic_clip(path, seconds=DEFAULT_SECONDS, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT,
+                        fps=DEFAULT_FPS, seed=DEFAULT_SEED):
+    """Render a deterministic POV-style clip: shaking camera, two hands, a tool that is
+    swung during work bouts and a brick that drifts through the view."""
+    rng = np.random.default_rng(seed)
+    margin = max(width, height) // 20
+    bg = _background(width, height, margin, rng)
+    schedule = work_schedule(seconds, rng)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not out.isOpened():
+        raise RuntimeError(f"Cannot open a video writer for {path}")
+
+    hand_axes = (width // 22, height // 12)
+    shake = np.zeros(2)
+    bout_idx = 0
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        while bout_idx < len(schedule) - 1 and t >= schedule[bout_idx][1]:
+            bout_idx += 1
+        working = schedule[bout_idx][2]
+
+        # Camera: random walk + walking bob, stronger while working
+        shake = 0.9 * shake + rng.normal(0, 3.0 if working else 1.0, 2)
+        dx = int(np.clip(shake[0] + margin * 0.3 * np.sin(t * 1.3), -margin, margin))
+        dy = int(np.clip(shake[1] + margin * 0.2 * np.sin(t * 2.1), -margin, margin))
+        frame = bg[margin + dy: margin + dy + height, margin + dx: margin + dx + width].copy()
+
+        # Brick sliding across the lower third every ~12 s
+        bx = int(((t % 12) / 12) * (width + 200)) - 100
+        cv2.rectangle(frame, (bx, int(height * 0.72)), (bx + width // 10, int(height * 0.72) + height // 14), BRICK_BGR, -1)
+
+        # Hands: hammering motion while working, slow drift while idle
+        swing = np.sin(t * 2 * np.pi * 2.0) * height * 0.08 if working else np.sin(t * 0.5) * height * 0.01
+        left = (int(width * 0.3 + np.sin(t * 0.7) * width * 0.02), int(height * 0.75 + swing * 0.3))
+        right = (int(width * 0.68), int(height * 0.62 + swing))
+        cv2.ellipse(frame, left, hand_axes, 20, 0, 360, SKIN_BGR, -1)
+        cv2.ellipse(frame, right, hand_axes, -20, 0, 360, SKIN_BGR, -1)
+        if working:
+            tool_w, tool_h = width // 12, height // 10
+            cv2.rectangle(frame, (right[0] - tool_w // 2, right[1] - hand_axes[1] - tool_h),
+                          (right[0] + tool_w // 2, right[1] - hand_axes[1]), TOOL_BGR, -1)
+        out.write(frame)
+    out.release()
+    logger.info(f"Synthetic clip written to {path}")
+    return schedule
+
+
+def get_clip(seconds, width, height, fps, seed, cache_dir=CLIP_CACHE_DIR):
+    path = clip_path(seconds, width, height, fps, seed, cache_dir)
+    if not os.path.exists(path):
+        make_synthetic_clip(path, seconds, width, height, fps, seed)
+    return path
+
+
+# ---------------------------------------------------------
+# STUB BACKENDS
+# ---------------------------------------------------------
+# Colour-threshold stand-ins with the same call shape as the ultralytics and
+# MediaPipe objects first_person_pipeline uses. Cheap, but real per-frame work.
+def _blobs(frame, lo, hi, min_area, scale=4):
+    small = cv2.resize(frame, (frame.shape[1] // scale, frame.shape[0] // scale), interpolation=cv2.INTER_AREA)
+    mask = cv2.inRange(cv2.cvtColor(small, cv2.COLOR_BGR2HSV), lo, hi)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for c in contours:
+        if cv2.contourArea(c) * scale * scale >= min_area:
+            x, y, w, h = cv2.boundingRect(c)
+            boxes.append((x * scale, y * scale, (x + w) * scale, (y + h) * scale, cv2.contourArea(c)))
+    return boxes
+
+
+class StubYOLO:
+    names = {cls: name for cls, (name, _) in STUB_CLASSES.items()}
+
+    def __call__(self, frame, verbose=False):
+        xyxy, cls = [], []
+        min_area = frame.shape[0] * frame.shape[1] * 0.002
+        for c, (_, (lo, hi)) in STUB_CLASSES.items():
+            for x1, y1, x2, y2, _ in _blobs(frame, lo, hi, min_area):
+                xyxy.append((x1, y1, x2, y2))
+                cls.append(c)
+        boxes = _StubBoxes(xyxy=np.array(xyxy, dtype=np.float32).reshape(-1, 4), cls=np.array(cls, dtype=np.float32))
+        return [_StubResults(frame, boxes, self.names)]
+
+
+class _StubBoxes(SimpleNamespace):
+    def __len__(self):
+        return len(self.cls)
+
+
+class _StubResults:
+    def __init__(self, frame, boxes, names):
+        self.orig_img = frame
+        self.boxes = boxes
+        self.names = names
+
+    def plot(self):
+        annotated = self.orig_img.copy()
+        for (x1, y1, x2, y2), c in zip(self.boxes.xyxy.astype(int), self.boxes.cls.astype(int)):
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 128, 0), 2)
+            cv2.putText(annotated, self.names[c], (x1, max(y1 - 5, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 128, 0), 2)
+        return annotated
+
+
+class StubHandLandmarker:
+    """Two largest skin-coloured blobs become hands; 21 landmarks ring the blob centre."""
+
+    def detect(self, mp_image):
+        rgb = mp_image.numpy_view()
+        h, w = rgb.shape[:2]
+        blobs = _blobs(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), *SKIN_HSV, min_area=h * w * 0.001)
+        blobs = sorted(blobs, key=lambda b: b[4], reverse=True)[:2]
+        landmarks, handedness = [], []
+        for x1, y1, x2, y2, _ in sorted(blobs, key=lambda b: b[0]):
+            cx, cy = (x1 + x2) / 2 / w, (y1 + y2) / 2 / h
+            rx, ry = (x2 - x1) / 2 / w, (y2 - y1) / 2 / h
+            angles = np.linspace(0, 2 * np.pi, 20, endpoint=False)
+            points = [SimpleNamespace(x=cx, y=cy + ry, z=0.0)]  # Landmark 0 = wrist
+            points += [SimpleNamespace(x=cx + rx * np.cos(a), y=cy + ry * np.sin(a), z=0.0) for a in angles]
+            landmarks.append(points)
+            handedness.append([SimpleNamespace(category_name="Left" if cx < 0.5 else "Right", score=1.0)])
+        return SimpleNamespace(hand_landmarks=landmarks, handedness=handedness)
+
+    def close(self):
+        pass
+
+
+def use_backend(backend):
+    if backend == "stub":
+        fpp.yolo_model = StubYOLO()
+        fpp.detector = StubHandLandmarker()
+    else:
+        fpp.load_models()
+
+
+# ---------------------------------------------------------
+# TIMING
+# ---------------------------------------------------------
+class StageTimes:
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        out = {}
+        for stage in STAGES:
+            s = np.array(self.samples.get(stage, []))
+            if not len(s):
+                continue
+            out[stage] = {
+                "calls": int(len(s)),
+                "total_s": round(float(s.sum()), 4),
+                "mean_ms": round(float(s.mean()) * 1000, 3),
+                "p50_ms": round(float(np.percentile(s, 50)) * 1000, 3),
+                "p95_ms": round(float(np.percentile(s, 95)) * 1000, 3),
+                "max_ms": round(float(s.max()) * 1000, 3),
+            }
+        return out
+
+
+def _writer(path, fps, size):
+    # Same codec as the pipeline when this OpenCV build has it
+    for codec in ("avc1", "mp4v"):
+        out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if out.isOpened():
+            return out, codec
+    raise RuntimeError("No usable mp4 codec in this OpenCV build")
+
+
+def run_once(video_path, work_dir):
+    """One pass over *video_path* mirroring first_person_pipeline.process_video,
+    then the post-processing scripts, each stage timed separately."""
+    timer = StageTimes()
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    frame_skip = max(1, int(fps / fpp.PROCESS_FPS))
+    out, codec = _writer(os.path.join(work_dir, f"{base_name}_annotated.mp4"), fpp.PROCESS_FPS, (width, height))
+
+    data = frame_records.FrameRecordBuffer()
+    frame_count = 0
+    wall = time.perf_counter()
+    while True:
+        with timer.time("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        if frame_count % frame_skip != 0:
+            continue
+        record = fpp.new_frame_record(len(data) + 1)
+        with timer.time("detect"):
+            annotated = fpp.detect_objects(frame, record)
+        with timer.time("hands"):
+            fpp.track_hands(annotated, record)
+        with timer.time("encode"):
+            out.write(annotated)
+        data.append(record)
+    cap.release()
+    out.release()
+    frame_loop_s = time.perf_counter() - wall
+
+    with timer.time("metrics"):
+        df, task = fpp.compute_exertion_metrics(data)
+    with timer.time("plot"):
+        fpp.plot_exertion(df, base_name, os.path.join(work_dir, f"{base_name}_plot.png"))
+    df.to_csv(os.path.join(work_dir, f"{base_name}_data.csv"), index=False)
+    metrics = fpp.summarize_metrics(df, base_name, task)
+
+    # The post-processing scripts read and write module-level paths; point them at the scratch dir
+    apply_global_motion.OUTPUT_DIR = work_dir
+    with timer.time("global_motion"):
+        apply_global_motion.process_motion_for_video(video_path, base_name)
+    recalculate_metrics.INPUT_DIR = work_dir
+    recalculate_metrics.MASTER_CSV = os.path.join(work_dir, "master_dashboard.csv")
+    with timer.time("recalculate"):
+        recalculate_metrics.recalculate_metrics()
+
+    stages = timer.summary()
+    return {
+        "decoded_frames": frame_count,
+        "sampled_frames": len(data),
+        "codec": codec,
+        "frame_loop_s": round(frame_loop_s, 3),
+        "sampled_fps": round(len(data) / frame_loop_s, 2) if frame_loop_s else None,
+        "total_s": round(sum(s["total_s"] for s in stages.values()), 3),
+        "stages": stages,
+        "productivity_pct": float(metrics["Productivity %"]),
+        "detected_task": metrics["Detected Task"],
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(result, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Per-stage p50_ms deltas vs *baseline*. Returns the list of regressed stages."""
+    if result["config"] != baseline.get("config"):
+        logger.warning(f"Config differs from baseline: {baseline.get('config')} vs {result['config']}")
+    regressions = []
+    print(f"\n{'stage':<14}{'base p50 ms':>13}{'p50 ms':>13}{'change':>10}")
+    for stage, cur in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or not base["p50_ms"]:
+            print(f"{stage:<14}{'-':>13}{cur['p50_ms']:>13.3f}{'new':>10}")
+            continue
+        change = cur["p50_ms"] / base["p50_ms"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(stage)
+            flag = "  REGRESSION"
+        print(f"{stage:<14}{base['p50_ms']:>13.3f}{cur['p50_ms']:>13.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the CV pipeline stages on a synthetic POV clip.")
+    parser.add_argument("--seconds", type=int, default=DEFAULT_SECONDS)
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH)
+    parser.add_argument("--height", type=int, default=DEFAULT_HEIGHT)
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--backend", choices=["stub", "real"], default="stub",
+                        help="stub: colour-threshold detectors, no weights needed; real: YOLO + MediaPipe models")
+    parser.add_argument("--video", help="Benchmark this clip instead of a synthetic one")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Keep the fastest of N runs")
+    parser.add_argument("--out", help=f"Result JSON (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline result JSON; exit 1 if any stage regressed")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    video = args.video or get_clip(args.seconds, args.width, args.height, args.fps, args.seed)
+    use_backend(args.backend)
+
+    runs = []
+    for i in range(args.repeat):
+        work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+        try:
+            runs.append(run_once(video, work_dir))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        logger.info(f"Run {i + 1}/{args.repeat}: {runs[-1]['total_s']:.2f}s, {runs[-1]['sampled_fps']} sampled fps")
+    best = min(runs, key=lambda r: r["total_s"])
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": _git_commit(),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(),
+                     "system": platform.system(), "opencv": cv2.__version__,
+                     "numpy": np.__version__, "pandas": pd.__version__, "cpus": os.cpu_count()},
+        "config": {"backend": args.backend, "video": args.video, "seconds": args.seconds,
+                   "width": args.width, "height": args.height, "fps": args.fps, "seed": args.seed,
+                   "process_fps": fpp.PROCESS_FPS},
+        "repeat": args.repeat,
+        **best,
+    }
+
+    print(f"\n{'stage':<14}{'calls':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage, s in result["stages"].items():
+        print(f"{stage:<14}{s['calls']:>7}{s['total_s']:>10.3f}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}")
+    print(f"Sampled frames/s: {result['sampled_fps']}  |  total {result['total_s']:.2f}s")
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=4)
+    logger.success(f"Benchmark results saved to {out_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            logger.error(f"Regressed stages (> {args.tolerance:.0%} slower): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
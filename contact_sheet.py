@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import cv2
+import numpy as np
+from loguru import logger
+import work_bouts
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# One small thumbnail per work/idle bout, packed into a single JPEG sprite per
+# video with a JSON index mapping each tile back to its bout's frame range.
+OUTPUT_DIR = 'outputs/'
+PROCESS_FPS = 5
+TILE_WIDTH = 160
+COLUMNS = 8
+MAX_TILES = 48           # Longest bouts win when a video has more than this
+MIN_BOUT_S = 1.0         # Bouts shorter than this are noise, not worth a tile
+JPEG_QUALITY = 70
+BORDER = 3
+WORK_COLOR = (94, 197, 34)    # BGR green
+IDLE_COLOR = (85, 85, 85)
+
+
+def sheet_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_contact.jpg")
+
+
+def index_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_contact.json")
+
+
+def pick_bouts(bouts, max_tiles=MAX_TILES, min_bout_s=MIN_BOUT_S):
+    bouts = [b for b in bouts if b["end_s"] - b["start_s"] >= min_bout_s]
+    if len(bouts) > max_tiles:
+        bouts = sorted(bouts, key=lambda b: b["end_s"] - b["start_s"], reverse=True)[:max_tiles]
+    return sorted(bouts, key=lambda b: b["start"])
+
+
+def grab_frames(video_path, frame_indices):
+    """Read the given (sorted) frame indices, seeking only when the gap is large."""
+    cap = cv2.VideoCapture(video_path)
+    frames = {}
+    position = 0
+    for idx in frame_indices:
+        if idx - position > 30 or idx < position:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            position = idx
+        frame = None
+        while position <= idx:
+            ret, frame = cap.read()
+            position += 1
+            if not ret:
+                frame = None
+                break
+        frames[idx] = frame
+    cap.release()
+    return frames
+
+
+def build_contact_sheet(base_name, output_dir=OUTPUT_DIR, video_path=None, fps=PROCESS_FPS):
+    """Write `<video>_contact.jpg` + `<video>_contact.json`. Thumbnails come from the
+    annotated video, which has one frame per sampling-grid slot."""
+    video_path = video_path or os.path.join(output_dir, f"{base_name}_annotated.mp4")
+    bouts = work_bouts.load_bouts(base_name, output_dir, fps)
+    if not bouts or not os.path.exists(video_path):
+        logger.warning(f"Contact sheet skipped for {base_name}: missing per-frame data or video.")
+        return None
+
+    bouts = pick_bouts(bouts)
+    # Annotated frame i is sampling-grid frame i + 1 (also with adaptive sampling)
+    mids = [(b["first_frame"] + b["last_frame"]) // 2 - 1 for b in bouts]
+    frames = grab_frames(video_path, sorted(set(mids)))
+
+    sample = next((f for f in frames.values() if f is not None), None)
+    if sample is None:
+        logger.warning(f"Contact sheet skipped for {base_name}: could not decode {video_path}.")
+        return None
+    tile_h = int(round(TILE_WIDTH * sample.shape[0] / sample.shape[1]))
+    rows = -(-len(bouts) // COLUMNS)
+    sheet = np.zeros((rows * tile_h, COLUMNS * TILE_WIDTH, 3), dtype=np.uint8)
+
+    tiles = []
+    for i, (bout, mid) in enumerate(zip(bouts, mids)):
+        row, col = divmod(i, COLUMNS)
+        y, x = row * tile_h, col * TILE_WIDTH
+        frame = frames.get(mid)
+        if frame is not None:
+            sheet[y:y + tile_h, x:x + TILE_WIDTH] = cv2.resize(frame, (TILE_WIDTH, tile_h), interpolation=cv2.INTER_AREA)
+        color = WORK_COLOR if bout["working"] else IDLE_COLOR
+        cv2.rectangle(sheet, (x, y), (x + TILE_WIDTH - 1, y + tile_h - 1), color, BORDER)
+        tiles.append({
+            "row": row, "col": col,
+            "working": bout["working"],
+            # Frame numbers as in the `frame` column of _data.csv (1-based sampled frames)
+            "start_frame": bout["first_frame"], "end_frame": bout["last_frame"],
+            "start_s": bout["start_s"], "end_s": bout["end_s"],
+        })
+
+    cv2.imwrite(sheet_path(base_name, output_dir), sheet, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    index = {"video": base_name, "tile_width": TILE_WIDTH, "tile_height": tile_h, "columns": COLUMNS, "tiles": tiles}
+    with open(index_path(base_name, output_dir), "w") as f:
+        json.dump(index, f, indent=4)
+    logger.success(f"Contact sheet with {len(tiles)} tiles saved to {sheet_path(base_name, output_dir)}")
+    return index
+
+
+def main():
+    # Back-fill contact sheets for videos processed before this existed
+    names = sys.argv[1:] or sorted(
+        f.replace("_annotated.mp4", "") for f in os.listdir(OUTPUT_DIR) if f.endswith("_annotated.mp4")
+    )
+    for name in names:
+        build_contact_sheet(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
 import os
-import json
 import altair as alt
-from PIL import Image
+import dashboard_data
+import timeline_pyramid
+import progress_events
 
 # ---------------------------------------------------------
 # CONFIGURATION
@@ -24,22 +25,14 @@ h1 { letter-spacing: -1px; }
 </style>
 """, unsafe_allow_html=True)
 
-MASTER_CSV = "master_dashboard.csv"
-OUTPUT_DIR = "outputs/"
+OUTPUT_DIR = dashboard_data.OUTPUT_DIR
 
 # ---------------------------------------------------------
 # DATA LOADING
 # ---------------------------------------------------------
-@st.cache_data(ttl=30)
-def load_data():
-    if not os.path.exists(MASTER_CSV):
-        return pd.DataFrame()
-    df = pd.read_csv(MASTER_CSV)
-    # Clean AI_UES column — coerce any non-numeric partial values to NaN
-    df["AI_UES"] = pd.to_numeric(df["AI_UES"], errors="coerce")
-    return df
-
-df = load_data()
+# Shared, typed frame that is only re-parsed when master_dashboard.csv changes
+# (see dashboard_data.py). It is shared across sessions: never mutate it in place.
+df = dashboard_data.load_master()
 
 # ---------------------------------------------------------
 # HEADER
@@ -47,39 +40,91 @@ df = load_data()
 st.title("🏗️ Ironsite AI — Supervisor Dashboard")
 st.caption("Powered by Ollama LLaVA · OpenCV Global Motion Analysis · Real-time body-cam intelligence")
 
+# ---------------------------------------------------------
+# LIVE PIPELINE PROGRESS
+# ---------------------------------------------------------
+# Each session tails outputs/pipeline_events.jsonl from its last read offset;
+# only this fragment reruns on the timer, not the whole page.
+@st.fragment(run_every="2s")
+def live_progress():
+    if "event_tailer" not in st.session_state:
+        st.session_state.event_tailer = progress_events.EventTailer(
+            os.path.join(OUTPUT_DIR, os.path.basename(progress_events.EVENT_LOG))
+        )
+    tailer = st.session_state.event_tailer
+    tailer.poll()
+    running = tailer.active()
+    if not running:
+        return
+    st.subheader(f"🛰️ Live Pipeline Progress ({len(running)} running)")
+    for event in sorted(running, key=lambda e: e["video"]):
+        total = event.get("total_frames") or 0
+        done = event.get("frames_done", 0)
+        eta = event.get("eta_s")
+        label = (
+            f"`{event['video']}` · {done:,}/{total:,} frames · {event.get('fps', 0):.0f} fps · "
+            f"running productivity ≈ {event.get('productivity', 0):.1f}%"
+            + (f" · ETA {int(eta // 60)}m {int(eta % 60)}s" if eta is not None else "")
+        )
+        st.progress(min(done / total, 1.0) if total else 0.0, text=label)
+
+
+live_progress()
+
 if df.empty:
     st.warning(f"⚠️ No data found. Run `first_person_pipeline.py` then `batch_agent_analysis.py`.")
     st.stop()
 
+# ---------------------------------------------------------
+# FILTERS (applied server-side; everything below works on the filtered view)
+# ---------------------------------------------------------
+with st.sidebar:
+    st.header("🔎 Filters")
+    dates = df["Date"].dropna()
+    date_range = None
+    if not dates.empty and dates.min() != dates.max():
+        picked = st.date_input("Recording date", (dates.min(), dates.max()),
+                               min_value=dates.min(), max_value=dates.max())
+        if isinstance(picked, (list, tuple)) and len(picked) == 2:
+            date_range = tuple(picked)
+    trades = st.multiselect("Trade", sorted(df["AI_Trade"].fillna("Unclassified").unique()))
+    tasks = st.multiselect("Detected task", sorted(df["Detected Task"].dropna().unique()))
+    top_n = st.slider("Videos per chart", 5, 50, 15, help="The rest are aggregated into one 'Other' bar")
+
+view = dashboard_data.filter_master(df, date_range, trades, tasks)
+if view.empty:
+    st.info("No videos match the current filters.")
+    st.stop()
+
 # ---------------------------------------------------------
 # SITE OVERVIEW METRICS
 # ---------------------------------------------------------
 st.header("📊 Site Overview", divider="orange")
 
 c1, c2, c3, c4, c5 = st.columns(5)
-c1.metric("Videos Analyzed", len(df))
-c2.metric("Avg Productivity",       f"{df['Productivity %'].mean():.1f}%")
-c3.metric("Site Peak Intensity",    f"{df['Peak Exertion (px)'].max():.1f} px")
-c4.metric("Avg AI Efficiency (UES)", f"{df['AI_UES'].mean():.1f}/100")
-c5.metric("Trades Identified",      df["AI_Trade"].nunique())
+c1.metric("Videos Analyzed", f"{len(view):,}")
+c2.metric("Avg Productivity",       f"{view['Productivity %'].mean():.1f}%")
+c3.metric("Site Peak Intensity",    f"{view['Peak Exertion (px)'].max():.1f} px")
+c4.metric("Avg AI Efficiency (UES)", f"{view['AI_UES'].mean():.1f}/100")
+c5.metric("Trades Identified",      view["AI_Trade"].nunique())
 
 st.divider()
 
 # ---------------------------------------------------------
-# CHARTS ROW
+# CHARTS ROW (top N videos, the rest aggregated)
 # ---------------------------------------------------------
 col_left, col_right = st.columns(2)
 
 with col_left:
     st.subheader("⚡ Productivity vs AI Efficiency")
-    chart_df = df[["Video", "Productivity %", "AI_UES"]].dropna().melt(
+    chart_df = dashboard_data.top_n_with_other(view, ["Productivity %", "AI_UES"], top_n).dropna().melt(
         id_vars="Video", var_name="Metric", value_name="Score"
     )
     chart = (
         alt.Chart(chart_df)
         .mark_bar(cornerRadiusTopLeft=4, cornerRadiusTopRight=4)
         .encode(
-            x=alt.X("Video:N", sort="-y", axis=alt.Axis(labelAngle=-40, labelLimit=150)),
+            x=alt.X("Video:N", sort=None, axis=alt.Axis(labelAngle=-40, labelLimit=150)),
             y=alt.Y("Score:Q", scale=alt.Scale(domain=[0, 110])),
             color=alt.Color(
                 "Metric:N",
@@ -94,14 +139,14 @@ with col_left:
 
 with col_right:
     st.subheader("🔨 Peak Exertion Intensity by Video")
-    exertion_df = df[["Video", "Peak Exertion (px)"]].sort_values("Peak Exertion (px)", ascending=False)
+    exertion_df = dashboard_data.top_n_with_other(view, ["Peak Exertion (px)"], top_n)
     bar = (
         alt.Chart(exertion_df)
         .mark_bar(cornerRadiusTopLeft=4, cornerRadiusTopRight=4, color="#F97316")
         .encode(
-            x=alt.X("Video:N", sort="-y", axis=alt.Axis(labelAngle=-40, labelLimit=150)),
+            x=alt.X("Video:N", sort=None, axis=alt.Axis(labelAngle=-40, labelLimit=150)),
             y=alt.Y("Peak Exertion (px):Q"),
-            tooltip=["Video", "Peak Exertion (px)"],
+            tooltip=["Video", alt.Tooltip("Peak Exertion (px):Q", format=".2f")],
         )
         .properties(height=320)
     )
@@ -109,7 +154,7 @@ with col_right:
 
 # Trade breakdown pie
 st.subheader("👷 Trade Breakdown")
-trade_counts = df["AI_Trade"].value_counts().reset_index()
+trade_counts = dashboard_data.top_counts_with_other(view["AI_Trade"], 9, "trades").reset_index()
 trade_counts.columns = ["Trade", "Count"]
 pie = (
     alt.Chart(trade_counts)
@@ -126,16 +171,25 @@ st.altair_chart(pie, use_container_width=True)
 st.divider()
 
 # ---------------------------------------------------------
-# LEADERBOARD TABLE
+# LEADERBOARD TABLE (sorted and paginated server-side)
 # ---------------------------------------------------------
 st.subheader("📋 Worker Productivity Leaderboard")
 
-sorted_df = df.sort_values(by="Productivity %", ascending=False).reset_index(drop=True)
+SORTABLE = ["Productivity %", "AI_UES", "Peak Exertion (px)", "Date", "Video"]
+s1, s2, s3, s4 = st.columns([2, 1, 1, 1])
+sort_by = s1.selectbox("Sort by", SORTABLE)
+ascending = s2.toggle("Ascending", value=False)
+page_size = s3.selectbox("Rows per page", [25, 50, 100], index=1)
+page_count = max(1, -(-len(view) // page_size))
+page = s4.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=1, step=1)
+
+page_df, _ = dashboard_data.page_of(view, sort_by, ascending, int(page), page_size)
 
 st.dataframe(
-    sorted_df,
+    page_df,
     column_config={
         "Video": st.column_config.TextColumn("Source Footage"),
+        "Date": st.column_config.DateColumn("Date"),
         "Detected Task": st.column_config.TextColumn("Primary Task"),
         "Productivity %": st.column_config.ProgressColumn(
             "Productivity Score",
@@ -159,10 +213,11 @@ st.dataframe(
         "Total Frames": None,
         "Working Frames": None,
     },
-    column_order=["Video", "Detected Task", "Productivity %", "Peak Exertion (px)", "AI_Trade", "AI_UES"],
+    column_order=["Video", "Date", "Detected Task", "Productivity %", "Peak Exertion (px)", "AI_Trade", "AI_UES"],
     use_container_width=True,
     hide_index=True,
 )
+st.caption(f"Showing {len(page_df):,} of {len(view):,} videos")
 
 st.divider()
 
@@ -171,11 +226,14 @@ st.divider()
 # ---------------------------------------------------------
 st.subheader("🔍 Deep Dive: Individual Worker Review")
 
-video_list = sorted_df["Video"].tolist()
+# Search first, then pick from at most 200 matches; only the chosen video's
+# artifacts are loaded
+query = st.text_input("Search recordings:", placeholder="e.g. masonry, 14_production")
+video_list = dashboard_data.search_videos(view, query)
 selected_video = st.selectbox("Select a recording:", video_list)
 
 if selected_video:
-    vdata = sorted_df[sorted_df["Video"] == selected_video].iloc[0]
+    vdata = view[view["Video"] == selected_video].iloc[0]
 
     st.markdown(f"### 📁 `{selected_video}`")
 
@@ -203,26 +261,115 @@ if selected_video:
             st.markdown("**📦 Quantified Output**")
             st.write(vdata.get("AI_Output", "N/A"))
 
-        # Load raw JSON if available
-        json_path = os.path.join(OUTPUT_DIR, f"Agent_Analysis_{selected_video}.json")
-        if os.path.exists(json_path):
+        # Load raw JSON if available (cached until the file changes)
+        raw_json = dashboard_data.load_agent_json(selected_video)
+        if raw_json is not None:
             with st.expander("📄 View Raw AI JSON Output"):
-                with open(json_path) as f:
-                    st.json(json.load(f))
+                st.json(raw_json)
 
     st.markdown("---")
 
+    # Contact sheet: one thumbnail per work/idle bout; clicking a tile zooms the
+    # timeline below to that bout
+    timeline = dashboard_data.load_timeline(selected_video)
+    zoom_key = f"zoom_{selected_video}"
+    total_min = round(max(timeline_pyramid.duration_s(timeline) / 60, 0.1), 1) if timeline is not None else 0.0
+
+    def jump_to(start_s, end_s):
+        pad = max((end_s - start_s) * 0.1, 3.0)
+        lo = max(0.0, round((start_s - pad) / 60, 1))
+        hi = min(total_min, round(max((end_s + pad) / 60, lo + 0.2), 1))
+        st.session_state[zoom_key] = (lo, hi)
+
+    sheet_index, tiles = dashboard_data.load_contact_sheet(selected_video)
+    if sheet_index is not None:
+        with st.expander(f"🎞️ Contact Sheet ({len(tiles)} bouts)", expanded=True):
+            cols = st.columns(sheet_index["columns"])
+            for i, (tile, img) in enumerate(zip(sheet_index["tiles"], tiles)):
+                with cols[i % len(cols)]:
+                    st.image(img, use_container_width=True)
+                    st.button(
+                        f"{'🟢' if tile['working'] else '⚪'} {int(tile['start_s'] // 60)}:{int(tile['start_s'] % 60):02d}",
+                        key=f"tile_{selected_video}_{i}",
+                        on_click=jump_to, args=(tile["start_s"], tile["end_s"]),
+                        disabled=timeline is None,
+                        use_container_width=True,
+                    )
+
+    # Interactive exertion timeline: the server picks the pyramid level that fits
+    # the zoomed range, so the browser only ever receives a bounded number of points
+    if timeline is not None:
+        st.markdown("**📈 Exertion Timeline**")
+        if zoom_key not in st.session_state:
+            st.session_state[zoom_key] = (0.0, total_min)
+        zoom = st.slider("Zoom (minutes)", 0.0, total_min, step=0.1, key=zoom_key)
+        points, bucket_s = timeline_pyramid.query(timeline, zoom[0] * 60, zoom[1] * 60)
+        points["minute"] = points["t"] / 60
+        points["state"] = (points["working"] >= 0.5).map({True: "Working", False: "Idle"})
+
+        base = alt.Chart(points).encode(x=alt.X("minute:Q", title="Time (minutes)", scale=alt.Scale(domain=list(zoom))))
+        band = base.mark_area(opacity=0.3, color="cyan").encode(y=alt.Y("min:Q", title="Movement Intensity"), y2="max:Q")
+        line = base.mark_line(color="cyan", strokeWidth=1.5).encode(
+            y="mean:Q",
+            tooltip=[alt.Tooltip("minute:Q", format=".2f"), alt.Tooltip("mean:Q", format=".2f"),
+                     alt.Tooltip("working:Q", format=".0%", title="Working")],
+        )
+        strip = base.mark_tick(thickness=4, size=12).encode(
+            y=alt.value(0),
+            color=alt.Color("state:N", scale=alt.Scale(domain=["Working", "Idle"], range=["#22C55E", "#555555"]), title=None),
+        )
+        st.altair_chart(alt.layer(band, line, strip).properties(height=300), use_container_width=True)
+        resolution = "raw sampled frames" if bucket_s == 0 else f"{bucket_s:g} s buckets (min/max band, mean line)"
+        st.caption(f"{len(points):,} points · {resolution}")
+
+        # Range summary and tool lookups are binary searches in the event index, not CSV scans
+        events = dashboard_data.load_events(selected_video)
+        if events is not None:
+            window = events.window(zoom[0] * 60, zoom[1] * 60)
+            tools = ", ".join(f"{tool} {s / 60:.1f} min" for tool, s in list(window["tools_s"].items())[:5]) or "none"
+            blind = len(window["hand_gaps"].get("Both", []))
+            st.caption(f"In range: {window['working_s'] / 60:.1f} min working · {window['idle_s'] / 60:.1f} min idle · "
+                       f"tools in view: {tools} · {blind} stretches with no hand in view")
+            if events.tools:
+                tool = st.selectbox("Working bouts with tool", events.tools, key=f"tool_{selected_video}")
+                bouts = events.bouts_with(tool)
+                cols = st.columns(6)
+                for i, bout in enumerate(bouts[:24]):
+                    with cols[i % len(cols)]:
+                        st.button(f"{int(bout['start_s'] // 60)}:{int(bout['start_s'] % 60):02d}",
+                                  key=f"toolbout_{selected_video}_{tool}_{i}",
+                                  on_click=jump_to, args=(bout["start_s"], bout["end_s"]),
+                                  use_container_width=True)
+                st.caption(f"{len(bouts)} working bouts with {tool} in view" + (" (first 24 shown)" if len(bouts) > 24 else ""))
+
     # Exertion plot image
-    plot_path = os.path.join(OUTPUT_DIR, f"{selected_video}_plot.png")
-    if os.path.exists(plot_path):
-        st.image(Image.open(plot_path), caption=f"Time-Series Exertion — {selected_video}", use_container_width=True)
-    else:
+    plot_png = dashboard_data.load_plot_png(selected_video)
+    if plot_png is not None:
+        with st.expander("🖼️ Static Exertion Plot", expanded=timeline is None):
+            st.image(plot_png, caption=f"Time-Series Exertion — {selected_video}", use_container_width=True)
+    elif timeline is None:
         st.info("📈 Time-series exertion plot not generated for this clip.")
 
-    # Annotated video
+    # Annotated video: a low-bitrate proxy and short per-bout clips, served with
+    # HTTP Range support so playback starts after a few KB instead of the full file
     with st.expander("▶️ Watch Annotated Highlight Reel"):
+        clip_index = dashboard_data.load_clip_index(selected_video)
         video_path = os.path.join(OUTPUT_DIR, f"{selected_video}_annotated.mp4")
-        if os.path.exists(video_path):
+        if clip_index is not None:
+            st.video(dashboard_data.media_url(clip_index["proxy"]))
+            clips = clip_index["clips"]
+            if clips:
+                clip = st.selectbox(
+                    "Jump to a bout:",
+                    clips,
+                    format_func=lambda c: (
+                        f"{'🟢 Work' if c['working'] else '⚪ Idle'} · "
+                        f"{c['bout_start_s'] / 60:.1f}–{c['bout_end_s'] / 60:.1f} min"
+                    ),
+                    key=f"clip_{selected_video}",
+                )
+                st.video(dashboard_data.media_url(os.path.join(clip_index["clips_dir"], clip["file"])))
+        elif os.path.exists(video_path):
             st.video(video_path)
         else:
             st.warning("Annotated video file not found in outputs/.")
@@ -0,0 +1,260 @@
+import os
+import io
+import json
+import streamlit as st
+from PIL import Image
+import pandas as pd
+import timeline_pyramid
+import event_index
+import media_proxies
+import media_server
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+MASTER_CSV = "master_dashboard.csv"
+OUTPUT_DIR = "outputs/"
+
+# Per-video artifacts (agent JSON, plot PNG) kept in memory; least recently
+# used entries are evicted once this many are cached
+ARTIFACT_CACHE_SIZE = 64
+
+AI_COLUMNS = ["AI_Trade", "AI_Tasks", "AI_Output", "AI_UES", "AI_Summary"]
+NUMERIC_COLUMNS = {
+    "Total Frames": "Int64",
+    "Working Frames": "Int64",
+    "Productivity %": "float64",
+    "Peak Exertion (px)": "float64",
+    "AI_UES": "float64",
+}
+
+
+# ---------------------------------------------------------
+# VERSION STAMPS
+# ---------------------------------------------------------
+# Caches are keyed by (mtime, size) of the file they were built from, so they
+# are invalidated exactly when the pipeline rewrites a result and never otherwise.
+def file_version(path):
+    try:
+        st_ = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st_.st_mtime_ns, st_.st_size)
+
+
+def results_version():
+    return file_version(MASTER_CSV)
+
+
+# ---------------------------------------------------------
+# MASTER TABLE
+# ---------------------------------------------------------
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _load_master(version):
+    # cache_resource hands every session the same object: callers must not mutate it
+    if version is None:
+        return pd.DataFrame()
+    df = pd.read_csv(MASTER_CSV)
+    for col in AI_COLUMNS:
+        if col not in df:
+            df[col] = pd.NA
+    for col, dtype in NUMERIC_COLUMNS.items():
+        if col in df:
+            # Coerce any non-numeric partial values (e.g. a half-written AI_UES) to NaN
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    # Older master tables have no Date: fall back to when each video's data was written
+    if "Date" not in df:
+        df["Date"] = pd.NA
+    missing = df["Date"].isna()
+    if missing.any():
+        df.loc[missing, "Date"] = [_data_date(v) for v in df.loc[missing, "Video"]]
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.date
+    return df.sort_values(by="Productivity %", ascending=False).reset_index(drop=True)
+
+
+def _data_date(video):
+    version = file_version(os.path.join(OUTPUT_DIR, f"{video}_data.csv"))
+    return pd.Timestamp(version[0], unit="ns").date() if version else pd.NaT
+
+
+def load_master():
+    """The preprocessed master table, sorted by productivity and shared by all sessions.
+    Re-parsed only when master_dashboard.csv changes on disk."""
+    return _load_master(results_version())
+
+
+# ---------------------------------------------------------
+# FILTERING, PAGINATION & TOP-N
+# ---------------------------------------------------------
+# Everything below runs on the server; only the current page / top-N rows are
+# ever sent to the browser, however many videos the archive holds.
+def filter_master(df, date_range=None, trades=None, tasks=None):
+    mask = pd.Series(True, index=df.index)
+    if date_range:
+        start, end = date_range
+        mask &= df["Date"].between(start, end)
+    if trades:
+        mask &= df["AI_Trade"].fillna("Unclassified").isin(trades)
+    if tasks:
+        mask &= df["Detected Task"].isin(tasks)
+    return df[mask]
+
+
+def page_of(df, sort_by, ascending, page, page_size):
+    """One page of *df* sorted by *sort_by*; `page` is 1-based. Returns (rows, page_count)."""
+    page_count = max(1, -(-len(df) // page_size))
+    page = min(max(1, page), page_count)
+    start = (page - 1) * page_size
+    rows = df.sort_values(sort_by, ascending=ascending, na_position="last").iloc[start:start + page_size]
+    return rows, page_count
+
+
+def top_n_with_other(df, value_cols, n, rank_by=None):
+    """The *n* videos with the highest *rank_by* plus one "Other (k videos)" row holding the mean of the rest."""
+    rank_by = rank_by or value_cols[0]
+    ranked = df[["Video", *value_cols]].sort_values(rank_by, ascending=False, na_position="last")
+    top, rest = ranked.head(n), ranked.iloc[n:]
+    if rest.empty:
+        return top
+    other = {"Video": f"Other ({len(rest):,} videos, avg)", **{c: rest[c].mean() for c in value_cols}}
+    return pd.concat([top, pd.DataFrame([other])], ignore_index=True)
+
+
+def top_counts_with_other(series, n, label):
+    counts = series.fillna("Unclassified").value_counts()
+    out = counts.head(n)
+    if len(counts) > n:
+        out = pd.concat([out, pd.Series({f"Other ({len(counts) - n} {label})": counts.iloc[n:].sum()})])
+    return out
+
+
+def search_videos(df, query, limit=200):
+    videos = df["Video"]
+    if query:
+        videos = videos[videos.str.contains(query, case=False, regex=False, na=False)]
+    return videos.head(limit).tolist()
+
+
+# ---------------------------------------------------------
+# PER-VIDEO ARTIFACTS (lazy, LRU)
+# ---------------------------------------------------------
+@st.cache_resource(max_entries=ARTIFACT_CACHE_SIZE, show_spinner=False)
+def _read_json(path, version):
+    with open(path) as f:
+        return json.load(f)
+
+
+@st.cache_resource(max_entries=ARTIFACT_CACHE_SIZE, show_spinner=False)
+def _read_bytes(path, version):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def agent_json_path(video):
+    return os.path.join(OUTPUT_DIR, f"Agent_Analysis_{video}.json")
+
+
+def plot_path(video):
+    return os.path.join(OUTPUT_DIR, f"{video}_plot.png")
+
+
+def load_agent_json(video):
+    path = agent_json_path(video)
+    version = file_version(path)
+    return _read_json(path, version) if version else None
+
+
+def load_plot_png(video):
+    path = plot_path(video)
+    version = file_version(path)
+    return _read_bytes(path, version) if version else None
+
+
+def data_csv_path(video):
+    return os.path.join(OUTPUT_DIR, f"{video}_data.csv")
+
+
+@st.cache_resource(max_entries=ARTIFACT_CACHE_SIZE, show_spinner=False)
+def _load_timeline(path, version):
+    return timeline_pyramid.load_pyramid(path)
+
+
+def load_timeline(video):
+    """Multi-resolution exertion timeline for one video, built on first use for
+    outputs that predate the pyramid files."""
+    path = timeline_pyramid.pyramid_path(video, OUTPUT_DIR)
+    csv_path = data_csv_path(video)
+    csv_version = file_version(csv_path)
+    version = file_version(path)
+    if csv_version is not None and (version is None or version[0] < csv_version[0]):
+        df = pd.read_csv(csv_path, usecols=lambda c: c in ("frame", "weight", "smoothed_exertion", "is_working"))
+        timeline_pyramid.save_pyramid(df, video, OUTPUT_DIR)
+        version = file_version(path)
+    return _load_timeline(path, version) if version else None
+
+
+@st.cache_resource(max_entries=ARTIFACT_CACHE_SIZE, show_spinner=False)
+def _load_events(video, version):
+    return event_index.load_index(video, OUTPUT_DIR, fresh_only=False)
+
+
+def load_events(video):
+    """Interval index (bouts, tool presence, hand gaps) for one video, built on first
+    use for outputs that predate the index files."""
+    path = event_index.events_path(video, OUTPUT_DIR)
+    csv_version = file_version(data_csv_path(video))
+    version = file_version(path)
+    if csv_version is not None and (version is None or version[0] < csv_version[0]):
+        event_index.ensure_index(video, OUTPUT_DIR)
+        version = file_version(path)
+    return _load_events(video, version) if version else None
+
+
+# ---------------------------------------------------------
+# MEDIA (proxy + highlight clips over HTTP Range)
+# ---------------------------------------------------------
+# URL the *browser* uses to reach media_server.py; override when the dashboard
+# sits behind a proxy or runs on another host.
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", f"http://localhost:{media_server.MEDIA_PORT}")
+
+
+@st.cache_resource(show_spinner=False)
+def _media_server():
+    try:
+        return media_server.start_media_server(OUTPUT_DIR)
+    except OSError:
+        # Another dashboard process on this box already serves outputs/
+        return None
+
+
+def media_url(rel_path):
+    _media_server()
+    return f"{MEDIA_BASE_URL.rstrip('/')}/{rel_path.replace(os.sep, '/')}"
+
+
+def load_clip_index(video):
+    path = media_proxies.clips_index_path(video, OUTPUT_DIR)
+    version = file_version(path)
+    return _read_json(path, version) if version else None
+
+
+# ---------------------------------------------------------
+# CONTACT SHEET (one sprite per video, cut into tiles once)
+# ---------------------------------------------------------
+@st.cache_resource(max_entries=ARTIFACT_CACHE_SIZE, show_spinner=False)
+def _contact_tiles(path, version, tile_w, tile_h, positions):
+    with Image.open(io.BytesIO(_read_bytes(path, version))) as sheet:
+        sheet.load()
+        return [sheet.crop((c * tile_w, r * tile_h, (c + 1) * tile_w, (r + 1) * tile_h)) for r, c in positions]
+
+
+def load_contact_sheet(video):
+    """(index, tile images) for a video's contact sheet, or (None, None)."""
+    sheet = os.path.join(OUTPUT_DIR, f"{video}_contact.jpg")
+    index_file = os.path.join(OUTPUT_DIR, f"{video}_contact.json")
+    sheet_version, index_version = file_version(sheet), file_version(index_file)
+    if sheet_version is None or index_version is None:
+        return None, None
+    index = _read_json(index_file, index_version)
+    positions = tuple((t["row"], t["col"]) for t in index["tiles"])
+    return index, _contact_tiles(sheet, sheet_version, index["tile_width"], index["tile_height"], positions)
@@ -0,0 +1,187 @@
+import os
+import json
+import cv2
+import numpy as np
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# POV footage keeps the same hardhat and tools in view for long stretches. Between
+# full YOLO passes, a frame that differs from the last inferred one only by camera
+# shift gets that frame's boxes, moved by the shift (phase correlation on thumbnails).
+THUMB_WIDTH = 160
+BLUR_KERNEL = (5, 5)           # Same smoothing as adaptive_sampler: sensor noise is not content change
+REFRESH_EVERY = int(os.getenv("YOLO_REFRESH_EVERY", "5"))       # Full inference at least every K sampled frames
+MAX_RESIDUAL = float(os.getenv("YOLO_REUSE_MAX_DIFF", "6.0"))   # Mean abs diff after undoing the shift
+MAX_BOX_RESIDUAL = 2 * MAX_RESIDUAL   # Same, inside each held box: a swung tool barely moves the frame mean
+MAX_SHIFT_FRAC = 0.15          # Larger camera moves than this (of the frame width) always re-infer
+AUDIT_EVERY = int(os.getenv("YOLO_REUSE_AUDIT_EVERY", "10"))    # Also run YOLO on every Nth reused frame (0 = never)
+AUDIT_IOU = 0.5
+BORDER = 4                     # Thumbnail pixels ignored at the edges when comparing
+
+
+def to_numpy(values):
+    # ultralytics returns torch tensors; the benchmark stubs return arrays
+    return values.cpu().numpy() if hasattr(values, "cpu") else np.asarray(values)
+
+
+def iou_matrix(a, b):
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_boxes(held_xyxy, held_cls, true_xyxy, true_cls, iou=AUDIT_IOU):
+    """Greedy same-class matching. Returns (matched, IoUs of the matches)."""
+    ious = iou_matrix(held_xyxy, true_xyxy)
+    ious[held_cls[:, None] != true_cls[None, :]] = 0.0
+    matched = []
+    while ious.size and ious.max() >= iou:
+        i, j = np.unravel_index(np.argmax(ious), ious.shape)
+        matched.append(float(ious[i, j]))
+        ious[i, :] = 0.0
+        ious[:, j] = 0.0
+    return len(matched), matched
+
+
+class DetectionReuser:
+    def __init__(self, refresh_every=REFRESH_EVERY, max_residual=MAX_RESIDUAL, max_box_residual=MAX_BOX_RESIDUAL,
+                 max_shift_frac=MAX_SHIFT_FRAC, audit_every=AUDIT_EVERY):
+        self.refresh_every = refresh_every
+        self.max_residual = max_residual
+        self.max_box_residual = max_box_residual
+        self.max_shift_frac = max_shift_frac
+        self.audit_every = audit_every
+        self.key = None          # Thumbnail (float32) of the last inferred frame
+        self.scale = 1.0
+        self.xyxy = np.zeros((0, 4), dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.since_refresh = 0
+        self.stats = {"frames": 0, "inferred": 0, "reused": 0, "audited": 0,
+                      "audit_held": 0, "audit_true": 0, "audit_matched": 0,
+                      "audit_iou_sum": 0.0, "audit_class_set_equal": 0}
+        self._window = None
+        self._pending = None
+
+    def _thumb(self, frame):
+        h, w = frame.shape[:2]
+        self.scale = w / THUMB_WIDTH
+        small = cv2.resize(frame, (THUMB_WIDTH, max(1, round(h / self.scale))), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), BLUR_KERNEL, 0).astype(np.float32)
+
+    def lookup(self, frame):
+        """(xyxy, class_ids) carried over from the last inferred frame, or None when the
+        frame has to go through YOLO. Call store() after every full inference."""
+        self.stats["frames"] += 1
+        self._pending = self._thumb(frame)
+        if self.key is None or self.since_refresh + 1 >= self.refresh_every or self.key.shape != self._pending.shape:
+            return None
+
+        if self._window is None or self._window.shape != self.key.shape:
+            self._window = cv2.createHanningWindow(self.key.shape[::-1], cv2.CV_32F)
+        # Copies: some OpenCV builds apply the window to the inputs in place
+        (dx, dy), _ = cv2.phaseCorrelate(self.key.copy(), self._pending.copy(), self._window)
+        if max(abs(dx), abs(dy)) > self.max_shift_frac * self.key.shape[1]:
+            return None
+
+        # What is left after undoing the camera shift is content change (a tool moved, a hand came in)
+        shifted = cv2.warpAffine(self.key, np.float32([[1, 0, dx], [0, 1, dy]]), self.key.shape[::-1])
+        pad = BORDER + int(np.ceil(max(abs(dx), abs(dy))))
+        if 2 * pad >= min(self.key.shape):
+            return None
+        diff = np.abs(shifted - self._pending)
+        if float(np.mean(diff[pad:-pad, pad:-pad])) > self.max_residual:
+            return None
+        offset = np.float32([dx, dy, dx, dy]) * self.scale
+        held = self.xyxy + offset
+        if self._box_residual(diff, held) > self.max_box_residual:
+            return None
+
+        self.since_refresh += 1
+        self.stats["reused"] += 1
+        return held, self.cls
+
+    def _box_residual(self, diff, xyxy):
+        """Largest mean residual inside any of the boxes (thumbnail coordinates)."""
+        h, w = diff.shape
+        worst = 0.0
+        for x1, y1, x2, y2 in np.round(xyxy / self.scale).astype(int):
+            x1, x2 = max(x1, 0), min(max(x2, x1 + 1), w)
+            y1, y2 = max(y1, 0), min(max(y2, y1 + 1), h)
+            if x1 < x2 and y1 < y2:
+                worst = max(worst, float(np.mean(diff[y1:y2, x1:x2])))
+        return worst
+
+    def store(self, xyxy, class_ids):
+        self.key = self._pending
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.cls = np.asarray(class_ids, dtype=np.int64)
+        self.since_refresh = 0
+        self.stats["inferred"] += 1
+
+    def audit_due(self):
+        return self.audit_every > 0 and self.stats["reused"] % self.audit_every == 0
+
+    def audit(self, held_xyxy, held_cls, true_xyxy, true_cls):
+        """Score one reused frame against a full inference of it."""
+        true_xyxy = np.asarray(true_xyxy, dtype=np.float32).reshape(-1, 4)
+        true_cls = np.asarray(true_cls, dtype=np.int64)
+        matched, ious = match_boxes(held_xyxy, held_cls, true_xyxy, true_cls)
+        s = self.stats
+        s["audited"] += 1
+        s["audit_held"] += len(held_cls)
+        s["audit_true"] += len(true_cls)
+        s["audit_matched"] += matched
+        s["audit_iou_sum"] += sum(ious)
+        s["audit_class_set_equal"] += int(set(held_cls.tolist()) == set(true_cls.tolist()))
+
+    def merge(self, stats):
+        for k, v in stats.items():
+            self.stats[k] += v
+
+    def report(self, **extra):
+        s = self.stats
+        return {
+            **extra,
+            "sampled_frames": s["frames"],
+            "yolo_calls": s["inferred"],
+            "reused_frames": s["reused"],
+            "reuse_pct": round(100.0 * s["reused"] / s["frames"], 1) if s["frames"] else 0.0,
+            "audit": {
+                "frames": s["audited"],
+                "precision": round(s["audit_matched"] / s["audit_held"], 3) if s["audit_held"] else None,
+                "recall": round(s["audit_matched"] / s["audit_true"], 3) if s["audit_true"] else None,
+                "mean_iou": round(s["audit_iou_sum"] / s["audit_matched"], 3) if s["audit_matched"] else None,
+                "class_set_agreement": round(s["audit_class_set_equal"] / s["audited"], 3) if s["audited"] else None,
+                "iou_threshold": AUDIT_IOU,
+            },
+            "settings": {"refresh_every": self.refresh_every, "max_residual": self.max_residual,
+                         "max_box_residual": self.max_box_residual,
+                         "max_shift_frac": self.max_shift_frac, "audit_every": self.audit_every},
+        }
+
+
+def report_path(base_name, output_dir):
+    return os.path.join(output_dir, f"{base_name}_reuse.json")
+
+
+def write_report(report, base_name, output_dir):
+    with open(report_path(base_name, output_dir), "w") as f:
+        json.dump(report, f, indent=4)
+
+
+def draw_held_boxes(frame, xyxy, class_ids, names, copy=True):
+    """Reused boxes, drawn thinner than YOLO's own plot so they are recognisable."""
+    annotated = frame.copy() if copy else frame
+    for (x1, y1, x2, y2), c in zip(np.asarray(xyxy).astype(int), class_ids):
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (255, 160, 0), 1)
+        cv2.putText(annotated, f"{names[int(c)]} (held)", (x1, max(y1 - 4, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 160, 0), 1)
+    return annotated
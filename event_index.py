@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from loguru import logger
+import landmark_store
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Per-video interval index written next to _data.csv as `{video}_events.npz` every
+# time the metrics are (re)computed. It holds work/idle bouts, when each detected
+# tool class was in view, and when each hand was out of view. Every interval list
+# is sorted and non-overlapping, so a time-range lookup is two binary searches
+# instead of a scan of the per-frame CSV.
+OUTPUT_DIR = 'outputs/'
+PROCESS_FPS = 5
+TOOL_MERGE_S = float(os.getenv("EVENTS_TOOL_MERGE_S", "1.0"))  # Bridge detector dropouts up to this long
+GAP_MIN_S = float(os.getenv("EVENTS_GAP_MIN_S", "0.0"))        # Shortest hand-visibility gap kept
+GAPS = landmark_store.HANDS + ("Both",)                        # "Both" = neither hand in view
+
+
+def events_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_events.npz")
+
+
+def _row_times(df, fps):
+    """Start/end second of the grid slots each row stands for, as in work_bouts.bouts_to_seconds."""
+    frames = df["frame"].to_numpy(dtype=np.int64)
+    weights = df["weight"].to_numpy(dtype=np.int64) if "weight" in df else 1
+    return (frames - 1) / fps, (frames + weights - 1) / fps
+
+
+def _runs(mask):
+    """(start_row, end_row) of each run of True, end exclusive."""
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _intervals(mask, start_s, end_s, merge_s=0.0, min_s=0.0):
+    lo, hi = _runs(mask)
+    spans = np.column_stack((start_s[lo], end_s[hi - 1])) if len(lo) else np.empty((0, 2))
+    if merge_s > 0 and len(spans) > 1:
+        keep = np.concatenate(([True], spans[1:, 0] - spans[:-1, 1] > merge_s))
+        spans = np.column_stack((spans[keep, 0], np.maximum.reduceat(spans[:, 1], np.flatnonzero(keep))))
+    if min_s > 0:
+        spans = spans[spans[:, 1] - spans[:, 0] >= min_s]
+    return spans
+
+
+def _tool_masks(objects_list):
+    """{tool: per-row bool} from the comma-separated `objects_list` column."""
+    codes, labels = pd.factorize(objects_list.fillna("").astype(str))
+    holders = {}
+    for code, label in enumerate(labels):
+        for tool in {t.strip() for t in label.split(",") if t.strip()}:
+            holders.setdefault(tool, []).append(code)
+    return {tool: np.isin(codes, holder) for tool, holder in sorted(holders.items())}
+
+
+def _visibility(df, base_name, output_dir):
+    """Per-row [Left, Right] visibility: the landmark store's presence mask when it covers
+    these rows, else the wrist columns (which lose short gaps once forward-filled)."""
+    frames = df["frame"].to_numpy(dtype=np.int64)
+    hands = landmark_store.load(base_name, output_dir) if base_name else None
+    if hands is not None and len(hands):
+        stored = np.asarray(hands.frame, dtype=np.int64)
+        at = np.clip(np.searchsorted(stored, frames), 0, len(stored) - 1)
+        if np.array_equal(stored[at], frames):
+            return np.asarray(hands.present)[at]
+    return np.column_stack((df["lw_x"].notna().to_numpy(), df["rw_x"].notna().to_numpy()))
+
+
+def build_index(df: pd.DataFrame, fps=PROCESS_FPS, visible=None) -> dict:
+    """Flat arrays for np.savez from a per-frame data frame with `is_working`.
+
+    `visible` is a per-row [Left, Right] bool array. Without it no hand gaps are stored.
+    Grouped intervals (tools, gaps) are one [n, 2] seconds array with per-name offsets."""
+    start_s, end_s = _row_times(df, fps)
+    frames = df["frame"].to_numpy(dtype=np.int64)
+    last_slot = frames + (df["weight"].to_numpy(dtype=np.int64) if "weight" in df else 1) - 1
+    working = df["is_working"].astype(bool).to_numpy()
+    # Bouts as in work_bouts.find_bouts: runs of equal is_working, alternating
+    first = np.flatnonzero(np.concatenate(([len(working) > 0], working[1:] != working[:-1])))
+    last = np.append(first[1:], len(working)) - 1
+    arrays = {
+        "fps": np.float64(fps),
+        "duration_s": np.float64(end_s[-1] if len(end_s) else 0.0),
+        "bout_rows": np.column_stack((first, last + 1)),
+        "bout_s": np.column_stack((start_s[first], end_s[last])),
+        "bout_frames": np.column_stack((frames[first], last_slot[last])),
+        "bout_working": working[first],
+    }
+
+    groups = {"tool": {tool: _intervals(mask, start_s, end_s, merge_s=TOOL_MERGE_S)
+                       for tool, mask in _tool_masks(df["objects_list"]).items()} if "objects_list" in df else {}}
+    if visible is not None:
+        visible = np.asarray(visible, dtype=bool)
+        hidden = {hand: ~visible[:, h] for h, hand in enumerate(landmark_store.HANDS)}
+        hidden["Both"] = hidden[landmark_store.HANDS[0]] & hidden[landmark_store.HANDS[1]]
+        groups["gap"] = {name: _intervals(hidden[name], start_s, end_s, min_s=GAP_MIN_S) for name in GAPS}
+    else:
+        groups["gap"] = {}
+    for group, spans in groups.items():
+        names = list(spans)
+        arrays[f"{group}_names"] = np.array(names, dtype=str)
+        arrays[f"{group}_offsets"] = np.cumsum([0] + [len(spans[n]) for n in names]).astype(np.int64)
+        arrays[f"{group}_s"] = np.concatenate([spans[n] for n in names]) if names else np.empty((0, 2))
+    return arrays
+
+
+def save_index(df: pd.DataFrame, base_name, output_dir=OUTPUT_DIR, fps=PROCESS_FPS, visible=None):
+    if visible is None:
+        visible = _visibility(df, base_name, output_dir)
+    path = events_path(base_name, output_dir)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **build_index(df, fps, visible))
+    os.replace(tmp, path)
+    logger.info(f"Event index saved to {path}")
+    return path
+
+
+def _overlapping(spans, t0, t1):
+    """Slice of sorted, non-overlapping [n, 2] *spans* that intersect [t0, t1]."""
+    lo = 0 if t0 is None else np.searchsorted(spans[:, 1], t0, side="right")
+    hi = len(spans) if t1 is None else np.searchsorted(spans[:, 0], t1, side="left")
+    return slice(lo, max(lo, hi))
+
+
+class EventIndex:
+    """Time-range queries over one video's events. All times are seconds from the
+    start of the video; a range [t0, t1] matches every interval that overlaps it."""
+
+    def __init__(self, arrays):
+        self.fps = float(arrays["fps"])
+        self.duration_s = float(arrays["duration_s"])
+        self.bout_rows = arrays["bout_rows"]
+        self.bout_s = arrays["bout_s"]
+        self.bout_frames = arrays["bout_frames"]
+        self.bout_working = arrays["bout_working"]
+        self._groups = {}
+        for group in ("tool", "gap"):
+            offsets, spans = arrays[f"{group}_offsets"], arrays[f"{group}_s"]
+            self._groups[group] = {str(name): spans[offsets[i]:offsets[i + 1]]
+                                   for i, name in enumerate(arrays[f"{group}_names"])}
+
+    @property
+    def tools(self):
+        return list(self._groups["tool"])
+
+    def bouts(self, t0=None, t1=None, working=None) -> list[dict]:
+        """Bouts in the work_bouts.load_bouts format, optionally only working / idle ones."""
+        sel = np.arange(len(self.bout_s))[_overlapping(self.bout_s, t0, t1)]
+        if working is not None:
+            sel = sel[self.bout_working[sel] == working]
+        return [self._bout(i) for i in sel]
+
+    def _bout(self, i):
+        return {"start": int(self.bout_rows[i, 0]), "end": int(self.bout_rows[i, 1]),
+                "working": bool(self.bout_working[i]),
+                "start_s": float(self.bout_s[i, 0]), "end_s": float(self.bout_s[i, 1]),
+                "first_frame": int(self.bout_frames[i, 0]), "last_frame": int(self.bout_frames[i, 1])}
+
+    def tool_intervals(self, tool, t0=None, t1=None) -> np.ndarray:
+        spans = self._groups["tool"].get(tool, np.empty((0, 2)))
+        return spans[_overlapping(spans, t0, t1)]
+
+    def hand_gaps(self, hand="Both", t0=None, t1=None, min_s=0.0) -> np.ndarray:
+        """[n, 2] spans when *hand* ("Left", "Right" or "Both") was out of view."""
+        spans = self._groups["gap"].get(hand, np.empty((0, 2)))
+        spans = spans[_overlapping(spans, t0, t1)]
+        return spans[spans[:, 1] - spans[:, 0] >= min_s] if min_s > 0 else spans
+
+    def bouts_with(self, tool, working=True, t0=None, t1=None) -> list[dict]:
+        """Bouts during which *tool* was in view at some point."""
+        spans = self.tool_intervals(tool)
+        sel = np.arange(len(self.bout_s))[_overlapping(self.bout_s, t0, t1)]
+        if working is not None:
+            sel = sel[self.bout_working[sel] == working]
+        if not len(spans) or not len(sel):
+            return []
+        # First tool span ending after each bout starts; it overlaps if it starts before the bout ends
+        nxt = np.searchsorted(spans[:, 1], self.bout_s[sel, 0], side="right")
+        ok = nxt < len(spans)
+        ok[ok] = spans[nxt[ok], 0] < self.bout_s[sel[ok], 1]
+        return [self._bout(i) for i in sel[ok]]
+
+    def window(self, t0, t1) -> dict:
+        """What was happening between t0 and t1: seconds working, tools in view (seconds each),
+        the bouts touching the range and the hand gaps inside it."""
+        clip = lambda spans: float(np.clip(spans[:, 1], t0, t1).sum() - np.clip(spans[:, 0], t0, t1).sum())
+        bouts = self.bout_s[_overlapping(self.bout_s, t0, t1)]
+        working = self.bout_working[_overlapping(self.bout_s, t0, t1)]
+        tools = {tool: round(clip(self.tool_intervals(tool, t0, t1)), 1) for tool in self.tools}
+        return {
+            "t0": t0, "t1": t1,
+            "working_s": round(clip(bouts[working]), 1),
+            "idle_s": round(clip(bouts[~working]), 1),
+            "tools_s": {tool: s for tool, s in sorted(tools.items(), key=lambda kv: -kv[1]) if s > 0},
+            "bouts": self.bouts(t0, t1),
+            "hand_gaps": {name: self.hand_gaps(name, t0, t1).round(2).tolist() for name in self._groups["gap"]},
+        }
+
+
+def load_index(base_name, output_dir=OUTPUT_DIR, fresh_only=True) -> EventIndex | None:
+    """The video's event index, or None when it is missing or (with *fresh_only*) older
+    than its _data.csv (the metrics were rewritten by something that did not index)."""
+    path = events_path(base_name, output_dir)
+    if not os.path.exists(path):
+        return None
+    csv_path = os.path.join(output_dir, f"{base_name}_data.csv")
+    if fresh_only and (not os.path.exists(csv_path) or os.path.getmtime(path) < os.path.getmtime(csv_path)):
+        return None
+    with np.load(path) as data:
+        return EventIndex({name: data[name] for name in data.files})
+
+
+def ensure_index(base_name, output_dir=OUTPUT_DIR, fps=PROCESS_FPS) -> EventIndex | None:
+    """load_index, building the index from _data.csv first for outputs that predate it."""
+    index = load_index(base_name, output_dir)
+    csv_path = os.path.join(output_dir, f"{base_name}_data.csv")
+    if index is None and os.path.exists(csv_path):
+        df = pd.read_csv(csv_path, usecols=lambda c: c in ("frame", "weight", "is_working", "objects_list", "lw_x", "rw_x"))
+        save_index(df, base_name, output_dir, fps)
+        index = load_index(base_name, output_dir, fresh_only=False)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a video's event index (built from outputs/{video}_data.csv).")
+    parser.add_argument("video", help="Base name, e.g. VID_001")
+    parser.add_argument("--from", dest="t0", type=float, default=None, help="Range start (minutes)")
+    parser.add_argument("--to", dest="t1", type=float, default=None, help="Range end (minutes)")
+    parser.add_argument("--tool", help="Only bouts during which this YOLO class was in view")
+    parser.add_argument("--idle", action="store_true", help="With --tool: idle bouts instead of working ones")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(events_path(args.video)):
+        os.remove(events_path(args.video))
+    index = ensure_index(args.video)
+    if index is None:
+        logger.error(f"No per-frame data for {args.video} in {OUTPUT_DIR}")
+        return 1
+    t0 = args.t0 * 60 if args.t0 is not None else None
+    t1 = args.t1 * 60 if args.t1 is not None else None
+    if args.tool:
+        result = index.bouts_with(args.tool, working=not args.idle, t0=t0, t1=t1)
+    else:
+        result = index.window(t0 or 0.0, index.duration_s if t1 is None else t1)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
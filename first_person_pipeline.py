@@ -1,11 +1,29 @@
 import sys
+import json
+import time
+import argparse
+import shutil
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import cv2
 import numpy as np
 import pandas as pd
 import mediapipe as mp
-from ultralytics import YOLO
 import matplotlib.pyplot as plt
 from loguru import logger
+import timeline_pyramid
+import media_proxies
+import progress_events
+import contact_sheet
+import stage_timer
+import frame_records
+import adaptive_sampler
+import detection_reuse
+import yolo_engines
+import frame_prep
+import landmark_store
+import event_index
 
 # ---------------------------------------------------------
 # CONSTANTS & CONFIGURATION
@@ -18,12 +36,39 @@ import os
 if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
 
+# Per-stage timing + frame counters, written to outputs/{video}_timing.json and a
+# Prometheus textfile per video (pipeline_stages_{video}.prom) for node exporter, so
+# concurrent workers never overwrite each other. Set PIPELINE_STAGE_TIMING=0 to turn off.
+STAGE_TIMING = os.getenv("PIPELINE_STAGE_TIMING", "1") != "0"
+PROM_TEXTFILE_DIR = os.getenv("PIPELINE_PROM_TEXTFILE_DIR", OUTPUT_DIR)
+
 # Hackathon Demo Settings
 # Instead of cutting the video off, we downsample the framerate.
 # How many frames per second should the AI actually analyze?
 # Set to 5 FPS to make it 6x faster than a 30fps video while still capturing motion.
 PROCESS_FPS = 5
 
+# Segment-parallel mode for long recordings: one video is split into this many frame
+# ranges, each decoded and analyzed by its own worker process (--segments / PIPELINE_SEGMENTS)
+SEGMENTS = int(os.getenv("PIPELINE_SEGMENTS", "1"))
+SEGMENT_WORKERS = int(os.getenv("PIPELINE_SEGMENT_WORKERS", str(os.cpu_count() or 1)))
+SEGMENT_START_METHOD = os.getenv("PIPELINE_SEGMENT_START_METHOD", "spawn")
+MIN_SEGMENT_S = 300              # Never split into segments shorter than 5 minutes
+
+# Adaptive sampling (--adaptive / PIPELINE_ADAPTIVE=1): every PROCESS_FPS frame is a
+# candidate, but the models only run on it when the cheap motion score says the scene
+# is busy (see adaptive_sampler.py). Metrics are then weighted by the time each row covers.
+ADAPTIVE_SAMPLING = os.getenv("PIPELINE_ADAPTIVE", "0") == "1"
+
+# Detection reuse (--reuse-detections / YOLO_REUSE=1): sampled frames that only differ
+# from the last YOLO-inferred frame by camera shift inherit its (shifted) boxes.
+# Refresh rate and thresholds: YOLO_REFRESH_EVERY / YOLO_REUSE_MAX_DIFF (detection_reuse.py)
+DETECTION_REUSE = os.getenv("YOLO_REUSE", "0") == "1"
+
+# Working resolution for the models (--work-width / PIPELINE_WORK_WIDTH, 0 = source size):
+# each sampled frame is resized once into reused buffers that both YOLO and MediaPipe read
+WORK_WIDTH = frame_prep.WORK_WIDTH
+
 # Exertion Thresholds 
 ACTIVE_MOVEMENT_THRESHOLD = 5.0  # Min pixels moved per frame to count as "active"
 ROLLING_WINDOW_FRAMES = 30       # ~1 second of video at 30fps
@@ -31,29 +76,166 @@ ROLLING_WINDOW_FRAMES = 30       # ~1 second of video at 30fps
 # ---------------------------------------------------------
 # MODEL INITIALIZATION
 # ---------------------------------------------------------
-# 1. MediaPipe Hand Tracking 
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
-
-base_options = python.BaseOptions(model_asset_path='hand_landmarker.task')
-options = vision.HandLandmarkerOptions(base_options=base_options,
-                                       num_hands=2,
-                                       min_hand_detection_confidence=0.5,
-                                       min_tracking_confidence=0.5)
-detector = vision.HandLandmarker.create_from_options(options)
-
-# 2. YOLOv8 Object Detection (Custom Construction Model)
-# We swap the generic yolov8n for one trained on construction sites!
-try:
-    yolo_model = YOLO('yolov8n-construction.pt') 
-    logger.info("Loaded CUSTOM YOLOv8 Construction Object model.")
-except Exception as e:
-    logger.error(f"Failed to load YOLO model: {e}")
-    sys.exit(1)
-
-
-def process_video(input_video_path):
+# Models are loaded on first use (load_models) so tools such as
+# benchmark_pipeline.py can import the per-frame helpers below and swap in stub
+# backends without the model weights.
+HAND_MODEL_PATH = 'hand_landmarker.task'
+YOLO_WEIGHTS = 'yolov8n-construction.pt'
+# CPU inference engine for YOLO (--engine / YOLO_ENGINE): pytorch, onnx, openvino or
+# openvino-int8. Non-PyTorch engines are exported from YOLO_WEIGHTS once and cached (yolo_engines.py)
+YOLO_ENGINE = os.getenv("YOLO_ENGINE", "pytorch")
+
+detector = None     # 1. MediaPipe Hand Tracking
+yolo_model = None   # 2. YOLOv8 Object Detection (Custom Construction Model)
+
+
+def load_models():
+    global detector, yolo_model
+    if detector is None:
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+
+        base_options = python.BaseOptions(model_asset_path=HAND_MODEL_PATH)
+        options = vision.HandLandmarkerOptions(base_options=base_options,
+                                               num_hands=2,
+                                               min_hand_detection_confidence=0.5,
+                                               min_tracking_confidence=0.5)
+        detector = vision.HandLandmarker.create_from_options(options)
+
+    if yolo_model is None:
+        # We swap the generic yolov8n for one trained on construction sites!
+        try:
+            yolo_model = yolo_engines.load_engine(YOLO_WEIGHTS, YOLO_ENGINE)
+            logger.info(f"Loaded CUSTOM YOLOv8 Construction Object model ({YOLO_ENGINE} engine).")
+        except Exception as e:
+            logger.error(f"Failed to load YOLO model: {e}")
+            sys.exit(1)
+
+
+def new_frame_record(frame_idx):
+    return {
+        "frame": frame_idx, # We log the index of the analyzed frame (1, 2, 3...)
+        "lw_x": np.nan, "lw_y": np.nan,  # Left Wrist Position
+        "rw_x": np.nan, "rw_y": np.nan,  # Right Wrist Position
+        "objects_detected": 0,
+        "objects_list": "",              # What are they holding?
+        "class_ids": (),                 # ...as YOLO class ids
+        "landmarks": None                # All 21 landmarks per hand (landmark_store), once a hand is seen
+    }
+
+
+def detect_objects(frame, frame_data, timer=stage_timer.DISABLED, reuse=None, prep=None):
+    """YOLO pass: fills the object fields of *frame_data*, returns the frame with boxes drawn.
+    With a *reuse* layer, frames that barely changed since the last inferred one get its
+    boxes (shifted by the camera motion) instead of a new YOLO call. With *prep* (loaded
+    with this frame), YOLO sees the working-resolution buffer and boxes are drawn, in
+    source pixels, onto prep.annotated."""
+    model_input = frame if prep is None else prep.work
+    if reuse is not None:
+        with timer.stage("reuse_check"):
+            held = reuse.lookup(model_input)
+        if held is not None:
+            xyxy, class_ids = held
+            if reuse.audit_due():
+                # Accuracy audit: what would full inference have found on this frame?
+                with timer.stage("yolo_audit"):
+                    audit = yolo_model(model_input, verbose=False)[0]
+                reuse.audit(xyxy, class_ids, detection_reuse.to_numpy(audit.boxes.xyxy),
+                            detection_reuse.to_numpy(audit.boxes.cls).astype(int))
+            with timer.stage("yolo_plot"):
+                if prep is None:
+                    annotated_frame = detection_reuse.draw_held_boxes(frame, xyxy, class_ids, yolo_model.names)
+                else:
+                    annotated_frame = detection_reuse.draw_held_boxes(prep.annotated, prep.to_source(xyxy), class_ids,
+                                                                      yolo_model.names, copy=False)
+            _set_objects(frame_data, [int(c) for c in class_ids])
+            return annotated_frame
+
+    # Detect what is in the frame (tools, brick, etc)
+    # We run verbose=False to keep the console clean
+    with timer.stage("yolo"):
+        yolo_results = yolo_model(model_input, verbose=False)[0]
+    
+    # Log the specific classes detected (e.g., 'hard-hat', 'tool', etc)
+    class_ids = [int(cls) for cls in yolo_results.boxes.cls]
+    xyxy = detection_reuse.to_numpy(yolo_results.boxes.xyxy) if reuse is not None or prep is not None else None
+
+    # Draw bounding boxes
+    with timer.stage("yolo_plot"):
+        if prep is None:
+            annotated_frame = yolo_results.plot() 
+        else:
+            annotated_frame = frame_prep.draw_boxes(prep.annotated, prep.to_source(xyxy), class_ids, yolo_model.names)
+    
+    _set_objects(frame_data, class_ids)
+    if reuse is not None:
+        reuse.store(xyxy, class_ids)
+    return annotated_frame
+
+
+def _set_objects(frame_data, class_ids):
+    frame_data["objects_detected"] = len(class_ids)
+    frame_data["class_ids"] = class_ids
+    frame_data["objects_list"] = ", ".join(yolo_model.names[cls] for cls in class_ids)
+
+
+def track_hands(annotated_frame, frame_data, timer=stage_timer.DISABLED, prep=None):
+    """MediaPipe pass: draws hand landmarks onto *annotated_frame* and fills the wrist fields.
+    With *prep*, MediaPipe reads its RGB working buffer (landmarks are normalised, so they
+    map to source pixels the same way)."""
+    height, width = annotated_frame.shape[:2]
+    # Convert BGR to RGB for MediaPipe
+    with timer.stage("bgr_to_rgb"):
+        if prep is None:
+            rgb_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        else:
+            mp_image = prep.mp_image()
+    
+    with timer.stage("mediapipe"):
+        results = detector.detect(mp_image)
+    
+    with timer.stage("draw"):
+        _draw_hands(results, annotated_frame, frame_data, width, height)
+
+
+def _draw_hands(results, annotated_frame, frame_data, width, height):
+    if results.hand_landmarks:
+        for hand_idx, hand_landmarks in enumerate(results.hand_landmarks):
+            # Manually draw landmarks with OpenCV to avoid legacy framework import issues
+            for landmark in hand_landmarks:
+                x = int(landmark.x * width)
+                y = int(landmark.y * height)
+                cv2.circle(annotated_frame, (x, y), 3, (0, 255, 0), -1)
+            
+            # Determine handedness (Left/Right)
+            handedness = results.handedness[hand_idx][0].category_name
+            if frame_data.get("landmarks") is None:
+                frame_data["landmarks"] = landmark_store.empty_hands()
+            frame_data["landmarks"][landmark_store.hand_index(handedness)] = [(l.x, l.y, l.z) for l in hand_landmarks]
+            
+            # Extract Wrist coordinates (Landmark 0)
+            wrist = hand_landmarks[0]
+            px_x, px_y = int(wrist.x * width), int(wrist.y * height)
+            
+            if handedness == "Left":
+                frame_data["lw_x"] = px_x
+                frame_data["lw_y"] = px_y
+            else:
+                frame_data["rw_x"] = px_x
+                frame_data["rw_y"] = px_y
+
+
+def process_video(input_video_path, segments=None, adaptive=None, reuse_detections=None, work_width=None):
+    """Run Stage 1 on one video. With *segments* > 1 (default PIPELINE_SEGMENTS), long
+    videos are split into frame ranges processed in parallel worker processes. With
+    *adaptive* (default PIPELINE_ADAPTIVE), idle stretches get fewer model calls; with
+    *reuse_detections* (default YOLO_REUSE), unchanged frames skip YOLO. *work_width*
+    (default PIPELINE_WORK_WIDTH) sets the resolution the models run at."""
+    segments = SEGMENTS if segments is None else segments
+    adaptive = ADAPTIVE_SAMPLING if adaptive is None else adaptive
+    reuse_detections = DETECTION_REUSE if reuse_detections is None else reuse_detections
+    work_width = WORK_WIDTH if work_width is None else work_width
     video_filename = os.path.basename(input_video_path)
     base_name = os.path.splitext(video_filename)[0]
     
@@ -70,110 +252,374 @@ def process_video(input_video_path):
     fps = int(cap.get(cv2.CAP_PROP_FPS))
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
-    # Use 'avc1' (h264) so Streamlit/HTML5 can play the video natively!
-    fourcc = cv2.VideoWriter_fourcc(*'avc1')
-    
-    # We will write the output video at the *desired* process FPS 
-    # so the annotated playback looks normal (just choppy)
-    out = cv2.VideoWriter(output_video_path, fourcc, PROCESS_FPS, (width, height))
-
-    exertion_data = []
-    
     # Calculate how many frames to skip 
     frame_skip = max(1, int(fps / PROCESS_FPS))
     
     logger.info(f"Video is {fps} FPS. Running AI at {PROCESS_FPS} FPS (Skipping every {frame_skip} frames).")
     
-    frame_count = 0
-    analyzed_frames = 0
+    # Live progress for the dashboard (outputs/pipeline_events.jsonl). The running
+    # productivity is a cheap estimate: wrists moved and an object was in view.
+    progress = progress_events.ProgressReporter(base_name, total_frames, fps,
+                                                path=os.path.join(OUTPUT_DIR, 'pipeline_events.jsonl'))
+    progress.start()
+    
+    timer = stage_timer.StageTimer(enabled=STAGE_TIMING, counters=("decoded", "sampled", "skipped", "failed", "dropped"))
+    loop_started = time.perf_counter()
+    
+    sampler = adaptive_sampler.AdaptiveSampler() if adaptive else None
+    reuse = detection_reuse.DetectionReuser() if reuse_detections else None
+    ranges = plan_segments(total_frames, fps, frame_skip, segments)
+    if len(ranges) > 1:
+        cap.release()
+        # Export once here rather than racing in every worker
+        yolo_engines.ensure_engine(YOLO_WEIGHTS, YOLO_ENGINE)
+        exertion_data, frame_count = process_segments(input_video_path, output_video_path, ranges,
+                                                      frame_skip, (width, height), timer, progress, sampler, reuse,
+                                                      work_width)
+    else:
+        load_models()
+        # We will write the output video at the *desired* process FPS 
+        # so the annotated playback looks normal (just choppy)
+        out = open_writer(output_video_path, (width, height))
+        exertion_data, frame_count = process_frames(cap, out, base_name, frame_skip,
+                                                    timer=timer, progress=progress, sampler=sampler, reuse=reuse,
+                                                    prep=frame_prep.FramePrep(work_width) if work_width else None)
+        # Clean up
+        cap.release()
+        out.release()
+    
+    loop_s = time.perf_counter() - loop_started
+    return finish_video(input_video_path, output_video_path, exertion_data, frame_count, total_frames,
+                        loop_s, timer, progress, sampler, reuse, size=(width, height))
+
+
+def finish_video(input_video_path, output_video_path, exertion_data, frame_count, total_frames, loop_s,
+                 timer, progress, sampler=None, reuse=None, size=None):
+    """Everything after the frame loop: sampling/reuse reports, metrics + plot, web media,
+    contact sheet and timing. Returns the master row."""
+    base_name = os.path.splitext(os.path.basename(input_video_path))[0]
+    analyzed_frames = len(exertion_data)
+    if sampler is not None:
+        report = sampler.report(video=base_name)
+        adaptive_sampler.write_report(report, base_name, OUTPUT_DIR)
+        logger.info(f"Adaptive sampling: {report['model_calls']}/{report['candidates']} candidate frames "
+                    f"sent to the models ({report['saved_calls']} calls saved, {report['saved_pct']}%).")
+    if reuse is not None:
+        report = reuse.report(video=base_name)
+        detection_reuse.write_report(report, base_name, OUTPUT_DIR)
+        audit = report["audit"]
+        logger.info(f"Detection reuse: {report['reused_frames']}/{report['sampled_frames']} frames reused "
+                    f"({report['reuse_pct']}%); audit on {audit['frames']} frames: precision {audit['precision']}, "
+                    f"recall {audit['recall']}, mean IoU {audit['mean_iou']}.")
+    progress.update(frame_count, analyzed_frames, 0, force=True)
+    # Frames the container promised but the decoder never delivered (truncated/corrupt stream)
+    timer.count("dropped", max(total_frames - frame_count, 0))
+    
+    logger.success(f"Video processing complete. Saved to {output_video_path}")
+    
+    # --- 4. DATA ANALYSIS & VISUALIZATION ---
+    # Computed on the stitched records, so rolling windows span segment boundaries
+    with timer.stage("metrics_and_plot"):
+        metrics = calculate_and_plot_metrics(exertion_data, base_name, size)
+    # Recording date (file modification time) so the dashboard can filter by day
+    metrics["Date"] = pd.Timestamp(os.path.getmtime(input_video_path), unit="s").date().isoformat()
+    
+    progress.finish(metrics)
+    
+    # --- 5. WEB MEDIA ---
+    # Low-bitrate faststart proxy + per-bout highlight clips for the dashboard
+    try:
+        with timer.stage("media"):
+            media_proxies.build_media(base_name, OUTPUT_DIR, PROCESS_FPS)
+    except Exception as e:
+        logger.warning(f"Could not build proxy media for {base_name}: {e}")
+    with timer.stage("contact_sheet"):
+        contact_sheet.build_contact_sheet(base_name, OUTPUT_DIR, output_video_path, PROCESS_FPS)
+    
+    if timer.enabled:
+        write_timing(timer, base_name, loop_s, frame_count, analyzed_frames)
+    
+    return metrics
+
+
+def open_writer(path, size):
+    # Use 'avc1' (h264) so Streamlit/HTML5 can play the video natively!
+    fourcc = cv2.VideoWriter_fourcc(*'avc1')
+    return cv2.VideoWriter(path, fourcc, PROCESS_FPS, size)
+
+
+def progress_working(record, prev_wrists):
+    """Cheap running guess at whether a sampled frame is active work, for progress events
+    (the real is_working comes from compute_exertion_metrics). Returns (0 or 1, wrists to
+    compare the next record with)."""
+    wrists = np.array([record[k] for k in ("lw_x", "lw_y", "rw_x", "rw_y")], dtype=float)
+    working = 0
+    if prev_wrists is not None and record["objects_detected"] > 0:
+        moved = np.nansum(np.abs(wrists - prev_wrists))
+        working = int(moved > ACTIVE_MOVEMENT_THRESHOLD)
+    return working, np.where(np.isnan(wrists), prev_wrists if prev_wrists is not None else wrists, wrists)
+
+
+def process_frames(cap, out, base_name, frame_skip, start_frame=0, end_frame=None,
+                   timer=stage_timer.DISABLED, progress=None, sampler=None, reuse=None, prep=None):
+    """Decode source frames [start_frame, end_frame) from *cap* (already positioned at
+    start_frame), run the models on every frame_skip-th one and write it to *out*.
+    With a *sampler*, candidates it turns down are written unannotated and get no row.
+
+    Sampled frames are numbered globally (frame_count // frame_skip), so the records of
+    consecutive ranges concatenate into exactly what one pass over the video produces.
+    Returns (FrameRecordBuffer, source frames decoded up to)."""
+    # Typed column buffer instead of a list of per-frame dicts (see frame_records.py)
+    exertion_data = frame_records.FrameRecordBuffer()
+    frame_count = start_frame
+    running_working = 0
+    prev_wrists = None
     
-    while cap.isOpened():
-        ret, frame = cap.read()
+    while end_frame is None or frame_count < end_frame:
+        with timer.stage("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
             
         frame_count += 1
+        timer.count("decoded")
         
         # DOWN-SAMPLING LOGIC: Only run AI on the target frames
         if frame_count % frame_skip != 0:
             continue
             
-        analyzed_frames += 1
-        current_frame_data = {
-            "frame": analyzed_frames, # We log the index of the analyzed frame (1, 2, 3...)
-            "lw_x": np.nan, "lw_y": np.nan,  # Left Wrist Position
-            "rw_x": np.nan, "rw_y": np.nan,  # Right Wrist Position
-            "objects_detected": 0,
-            "objects_list": ""               # What are they holding?
-        }
-
-        # --- 1. YOLO INFERENCE (Object Detection) ---
-        # Detect what is in the frame (tools, brick, etc)
-        # We run verbose=False to keep the console clean
-        yolo_results = yolo_model(frame, verbose=False)[0]
-        
-        # Draw bounding boxes
-        annotated_frame = yolo_results.plot() 
-        current_frame_data["objects_detected"] = len(yolo_results.boxes)
-        
-        # Log the specific classes detected (e.g., 'hard-hat', 'tool', etc)
-        detected_classes = [yolo_model.names[int(cls)] for cls in yolo_results.boxes.cls]
-        current_frame_data["objects_list"] = ", ".join(detected_classes)
-
-        # --- 2. MEDIAPIPE INFERENCE (Hand Tracking) ---
-        # Convert BGR to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-        
-        results = detector.detect(mp_image)
-        
-        # --- 3. DATA EXTRACTION & ANNOTATION ---
-        if results.hand_landmarks:
-            for hand_idx, hand_landmarks in enumerate(results.hand_landmarks):
-                # Manually draw landmarks with OpenCV to avoid legacy framework import issues
-                for landmark in hand_landmarks:
-                    x = int(landmark.x * width)
-                    y = int(landmark.y * height)
-                    cv2.circle(annotated_frame, (x, y), 3, (0, 255, 0), -1)
-                
-                # Determine handedness (Left/Right)
-                handedness = results.handedness[hand_idx][0].category_name
-                
-                # Extract Wrist coordinates (Landmark 0)
-                wrist = hand_landmarks[0]
-                px_x, px_y = int(wrist.x * width), int(wrist.y * height)
-                
-                if handedness == "Left":
-                    current_frame_data["lw_x"] = px_x
-                    current_frame_data["lw_y"] = px_y
-                else:
-                    current_frame_data["rw_x"] = px_x
-                    current_frame_data["rw_y"] = px_y
+        analyzed_frames = frame_count // frame_skip
+        exertion_data.span_end = analyzed_frames
+        if sampler is not None:
+            with timer.stage("motion_score"):
+                run_models = sampler.should_process(frame)
+            if not run_models:
+                # Keep the annotated video on the PROCESS_FPS grid so its frame i is still slot i
+                timer.count("skipped")
+                with timer.stage("encode"):
+                    out.write(frame)
+                continue
+        timer.count("sampled")
+        current_frame_data = new_frame_record(analyzed_frames)
+
+        try:
+            # --- 0. SHARED PREPROCESSING (one resize into reused buffers) ---
+            if prep is not None:
+                with timer.stage("preprocess"):
+                    prep.load(frame)
+
+            # --- 1. YOLO INFERENCE (Object Detection) ---
+            annotated_frame = detect_objects(frame, current_frame_data, timer, reuse, prep)
+
+            # --- 2. MEDIAPIPE INFERENCE (Hand Tracking) ---
+            # --- 3. DATA EXTRACTION & ANNOTATION ---
+            track_hands(annotated_frame, current_frame_data, timer, prep)
+        except Exception as e:
+            # One bad frame should not cost the whole video: keep the row (no detections)
+            # so frame numbers stay aligned with the annotated video
+            timer.count("failed")
+            logger.warning(f"Frame {analyzed_frames} of {base_name} failed: {e}")
+            current_frame_data = new_frame_record(analyzed_frames)
+            annotated_frame = frame
                     
         exertion_data.append(current_frame_data)
-        out.write(annotated_frame)
+        with timer.stage("encode"):
+            out.write(annotated_frame)
+        
+        if progress is not None:
+            working, prev_wrists = progress_working(current_frame_data, prev_wrists)
+            running_working += working
+            progress.update(frame_count, len(exertion_data), running_working)
         
         # Progress indicator (Update every 100 analyzed frames)
-        if analyzed_frames % 100 == 0:
-            logger.info(f"Processed {analyzed_frames} sampled frames...")
+        if len(exertion_data) % 100 == 0:
+            logger.info(f"Processed {len(exertion_data)} sampled frames of {base_name} (up to frame {frame_count})...")
 
-    # Clean up
-    cap.release()
-    out.release()
-    
-    logger.success(f"Video processing complete. Saved to {output_video_path}")
-    
-    # --- 4. DATA ANALYSIS & VISUALIZATION ---
-    return calculate_and_plot_metrics(exertion_data, base_name)
+    return exertion_data, frame_count
+
+
+# ---------------------------------------------------------
+# SEGMENT-PARALLEL MODE
+# ---------------------------------------------------------
+def plan_segments(total_frames, fps, frame_skip, segments):
+    """Split [0, total_frames) into up to *segments* source-frame ranges whose boundaries
+    fall on multiples of frame_skip. The last range is open-ended (reads to EOF) since
+    CAP_PROP_FRAME_COUNT is only an estimate."""
+    if segments <= 1 or total_frames <= 0:
+        return [(0, None)]
+    min_frames = int(MIN_SEGMENT_S * max(fps, 1))
+    segments = max(1, min(segments, total_frames // max(min_frames, 1)))
+    if segments == 1:
+        return [(0, None)]
+    length = -(-total_frames // segments)
+    length = -(-length // frame_skip) * frame_skip
+    bounds = list(range(0, total_frames, length))
+    return [(start, end) for start, end in zip(bounds, bounds[1:] + [None])]
+
+
+def segment_dir(base_name):
+    """Where a video's segment parts are kept until they are stitched."""
+    return os.path.join(OUTPUT_DIR, ".segments", base_name)
+
+
+def _process_segment(task):
+    input_video_path, part_path, start, end, frame_skip, size, timing, adaptive, reuse_detections, work_width = task
+    load_models()
+    base_name = os.path.splitext(os.path.basename(input_video_path))[0]
+    cap = cv2.VideoCapture(input_video_path)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if position != start:
+            raise RuntimeError(f"Seek to frame {start} of {input_video_path} landed on {position}")
+    out = open_writer(part_path, size)
+    timer = stage_timer.StageTimer(enabled=timing)
+    # Each segment starts its own sampler, so the first candidate of a segment is always analyzed
+    sampler = adaptive_sampler.AdaptiveSampler() if adaptive else None
+    reuse = detection_reuse.DetectionReuser() if reuse_detections else None
+    prep = frame_prep.FramePrep(work_width) if work_width else None
+    try:
+        records, frame_count = process_frames(cap, out, base_name, frame_skip, start, end, timer,
+                                              sampler=sampler, reuse=reuse, prep=prep)
+    finally:
+        cap.release()
+        out.release()
+    return (records, frame_count - start, timer.stages, timer.counters,
+            sampler.report() if sampler else None, reuse.stats if reuse else None)
+
+
+def process_segments(input_video_path, output_video_path, ranges, frame_skip, size, timer, progress,
+                     sampler=None, reuse=None, work_width=0):
+    base_name = os.path.splitext(os.path.basename(input_video_path))[0]
+    parts_dir = segment_dir(base_name)
+    os.makedirs(parts_dir, exist_ok=True)
+    tasks = [(input_video_path, os.path.join(parts_dir, f"part_{i:03d}.mp4"), start, end, frame_skip, size,
+              timer.enabled, sampler is not None, reuse is not None, work_width)
+             for i, (start, end) in enumerate(ranges)]
+    logger.info(f"Processing {base_name} as {len(ranges)} parallel segments.")
+
+    # Fresh interpreters: MediaPipe / torch state does not survive fork() reliably
+    context = multiprocessing.get_context(SEGMENT_START_METHOD)
+    results = [None] * len(tasks)
+    decoded = 0
+    with ProcessPoolExecutor(max_workers=min(len(tasks), SEGMENT_WORKERS), mp_context=context) as pool:
+        futures = {pool.submit(_process_segment, task): i for i, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            decoded += results[i][1]
+            progress.update(decoded, sum(len(r[0]) for r in results if r), 0, force=True)
+
+    exertion_data = stitch_segments(results, base_name, timer, sampler, reuse)
+    with timer.stage("concat"):
+        concat_videos([task[1] for task in tasks], output_video_path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    return exertion_data, decoded
 
 
-def calculate_and_plot_metrics(data, base_name):
+def stitch_segments(results, base_name, timer, sampler=None, reuse=None):
+    """Concatenate _process_segment results (in source order) into one record buffer and
+    fold their timings and sampling / reuse statistics into *timer*, *sampler*, *reuse*."""
+    exertion_data = frame_records.FrameRecordBuffer()
+    for records, _, stages, counters, sampling, reuse_stats in results:
+        exertion_data.extend(records)
+        timer.merge(stages, counters)
+        if sampler is not None:
+            sampler.merge(sampling)
+        if reuse is not None:
+            reuse.merge(reuse_stats)
+    frames = exertion_data.columns["frame"].view()
+    if len(frames) and sampler is None and not (np.diff(frames) == 1).all():
+        logger.warning(f"{base_name}: stitched frame numbers are not contiguous; check seeking for this codec.")
+    return exertion_data
+
+
+def concat_videos(parts, out_path):
+    if shutil.which("ffmpeg"):
+        list_path = f"{out_path}.parts.txt"
+        with open(list_path, "w") as f:
+            f.writelines(f"file '{os.path.abspath(p)}'\n" for p in parts)
+        try:
+            subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                            "-c", "copy", out_path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            return
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"ffmpeg concat failed ({e.stderr.decode(errors='replace').strip()}); re-encoding with OpenCV.")
+        finally:
+            os.remove(list_path)
+    out = None
+    for part in parts:
+        cap = cv2.VideoCapture(part)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if out is None:
+                out = open_writer(out_path, (frame.shape[1], frame.shape[0]))
+            out.write(frame)
+        cap.release()
+    if out is not None:
+        out.release()
+
+
+def write_timing(timer, base_name, loop_s, frame_count, analyzed_frames):
+    decode_fps = round(frame_count / loop_s, 2) if loop_s else 0.0
+    sampled_fps = round(analyzed_frames / loop_s, 2) if loop_s else 0.0
+    timing_path = os.path.join(OUTPUT_DIR, f"{base_name}_timing.json")
+    timer.write_json(timing_path, video=base_name, frame_loop_s=round(loop_s, 3),
+                     decode_fps=decode_fps, sampled_fps=sampled_fps)
+    prom_path = os.path.join(PROM_TEXTFILE_DIR, f"pipeline_stages_{base_name}.prom")
+    try:
+        timer.write_prometheus(prom_path, {"video": base_name},
+                               {"decode_fps": decode_fps, "sampled_fps": sampled_fps,
+                                "frame_loop_seconds": round(loop_s, 3),
+                                "last_run_timestamp_seconds": int(time.time())})
+    except OSError as e:
+        logger.warning(f"Could not write Prometheus textfile {prom_path}: {e}")
+    slowest = sorted(timer.stages.items(), key=lambda kv: kv[1]["sum"], reverse=True)[:3]
+    logger.info(f"Stage timing saved to {timing_path} ({sampled_fps} sampled fps; slowest: "
+                + ", ".join(f"{name} {s['sum']:.1f}s" for name, s in slowest) + ")")
+
+
+def calculate_and_plot_metrics(data, base_name, size=None):
     csv_output_path = os.path.join(OUTPUT_DIR, f"{base_name}_data.csv")
     plot_output_path = os.path.join(OUTPUT_DIR, f"{base_name}_plot.png")
     
     logger.info("Calculating exertion metrics...")
+    df, dominant_task = compute_exertion_metrics(data)
+    
+    # Save raw data
+    df.to_csv(csv_output_path, index=False)
+    logger.success(f"Metrics saved to {csv_output_path}")
+    timeline_pyramid.save_pyramid(df, base_name, OUTPUT_DIR, PROCESS_FPS)
+    if isinstance(data, frame_records.FrameRecordBuffer) and data.landmarks is not None:
+        path = landmark_store.save(data.landmarks.view(), base_name, OUTPUT_DIR, PROCESS_FPS, size)
+        logger.info(f"Hand landmarks saved to {path}")
+    event_index.save_index(df, base_name, OUTPUT_DIR, PROCESS_FPS)
+    
+    plot_exertion(df, base_name, plot_output_path)
+    logger.success(f"Dashboard plot saved to {plot_output_path}")
+    
+    return summarize_metrics(df, base_name, dominant_task)
+
+
+def compute_exertion_metrics(data):
+    """Per-frame records (FrameRecordBuffer or list of dicts) -> (DataFrame with
+    exertion/activity columns, dominant task)."""
+    span_end = None
+    if isinstance(data, frame_records.FrameRecordBuffer):
+        df = data.to_frame()
+        span_end = data.span_end
+    else:
+        df = pd.DataFrame(data).drop(columns=["class_ids", "landmarks"], errors="ignore")
     
-    df = pd.DataFrame(data)
+    # Adaptive sampling leaves gaps in `frame`: each row then stands for the grid slots
+    # up to the next row (`weight`), and movement is normalized back to per-slot pixels
+    frames = df['frame'].astype(np.int64)
+    gaps = frames.diff().fillna(1)
+    weighted = bool((gaps > 1).any()) or (span_end is not None and len(df) and span_end > frames.iloc[-1])
+    if weighted:
+        df['weight'] = (frames.shift(-1) - frames).fillna((span_end or frames.iloc[-1]) - frames.iloc[-1] + 1).astype(int)
     
     # 1. Calculate Pixel Distance Traveled (Euclidean)
     # Forward fill NaNs so distance is 0 when hands briefly disappear
@@ -184,13 +630,19 @@ def calculate_and_plot_metrics(data, base_name):
     
     df['lw_dist'] = np.sqrt(df['lw_x'].diff()**2 + df['lw_y'].diff()**2).fillna(0)
     df['rw_dist'] = np.sqrt(df['rw_x'].diff()**2 + df['rw_y'].diff()**2).fillna(0)
+    if weighted:
+        df['lw_dist'] /= gaps
+        df['rw_dist'] /= gaps
     
     # 2. Raw Movement = Total physical hand displacement
     df['raw_movement'] = df['lw_dist'] + df['rw_dist']
     
     # 3. Smooth the data (Rolling Average) to remove micro-jitters
     # Since we are downsampling (e.g., 5 fps), 1 second is only 5 frames!
-    df['smoothed_exertion'] = df['raw_movement'].rolling(window=PROCESS_FPS, min_periods=1).mean()
+    if weighted:
+        df['smoothed_exertion'] = adaptive_sampler.rolling_seconds(df['raw_movement'], frames, 1, PROCESS_FPS).mean().to_numpy()
+    else:
+        df['smoothed_exertion'] = df['raw_movement'].rolling(window=PROCESS_FPS, min_periods=1).mean()
     
     # 4. Activity Classification
     # Worker is 'active' if hands are moving AND they are interacting with an object
@@ -206,12 +658,10 @@ def calculate_and_plot_metrics(data, base_name):
         # Find the most common tool class
         from collections import Counter
         dominant_task = f"Handling {Counter(all_active_tools).most_common(1)[0][0]}"
-    
-    # Save raw data
-    df.to_csv(csv_output_path, index=False)
-    logger.success(f"Metrics saved to {csv_output_path}")
-    
-    # --- PLOT GENERATION ---
+    return df, dominant_task
+
+
+def plot_exertion(df, base_name, plot_output_path):
     plt.style.use('dark_background')
     fig, ax = plt.subplots(figsize=(12, 6))
     
@@ -220,8 +670,6 @@ def calculate_and_plot_metrics(data, base_name):
     
     # Highlight areas where the worker is actively 'working'
     # Find contiguous blocks of 'is_working' == True
-    active_frames = df[df['is_working']]['frame']
-    
     # Instead of plotting individual dots, let's shade the regions
     in_active_block = False
     start_frame = 0
@@ -251,12 +699,15 @@ def calculate_and_plot_metrics(data, base_name):
     
     plt.tight_layout()
     plt.savefig(plot_output_path, dpi=300)
-    logger.success(f"Dashboard plot saved to {plot_output_path}")
     plt.close() # Important to avoid memory leaks across multiple videos
-    
+
+
+def summarize_metrics(df, base_name, dominant_task):
     # Print Final Summary
-    total_frames = len(df)
-    working_frames = df['is_working'].sum()
+    # Frame counts are in sampling-grid slots, so adaptive runs stay comparable
+    weight = df['weight'] if 'weight' in df else 1
+    total_frames = int(np.sum(weight)) if 'weight' in df else len(df)
+    working_frames = (df['is_working'] * weight).sum()
     productivity_pct = (working_frames / total_frames) * 100 if total_frames > 0 else 0
     peak_intensity = df['smoothed_exertion'].max()
     
@@ -271,7 +722,41 @@ def calculate_and_plot_metrics(data, base_name):
     }
 
 
+def print_sampling_summary(base_names):
+    reports = []
+    for name in base_names:
+        path = adaptive_sampler.report_path(name, OUTPUT_DIR)
+        if os.path.exists(path):
+            with open(path) as f:
+                reports.append(json.load(f))
+    if not reports:
+        return
+    print(f"\n{'video':<40}{'candidates':>12}{'model calls':>13}{'saved':>8}")
+    for r in reports:
+        print(f"{r['video']:<40}{r['candidates']:>12}{r['model_calls']:>13}{r['saved_pct']:>7.1f}%")
+    candidates = sum(r["candidates"] for r in reports)
+    calls = sum(r["model_calls"] for r in reports)
+    saved_pct = 100.0 * (candidates - calls) / candidates if candidates else 0.0
+    print(f"{'TOTAL':<40}{candidates:>12}{calls:>13}{saved_pct:>7.1f}%")
+
+
 def main():
+    global YOLO_ENGINE
+    parser = argparse.ArgumentParser(description="Stage 1: hand tracking + object detection over every video in INPUT_DIR.")
+    parser.add_argument("--segments", type=int, default=SEGMENTS,
+                        help="Split each long video into N frame ranges processed in parallel")
+    parser.add_argument("--adaptive", action="store_true", default=ADAPTIVE_SAMPLING,
+                        help="Run the models less often on idle stretches (motion-driven sampling)")
+    parser.add_argument("--reuse-detections", action="store_true", default=DETECTION_REUSE,
+                        help="Carry YOLO boxes over between near-identical frames (refresh every YOLO_REFRESH_EVERY)")
+    parser.add_argument("--engine", choices=list(yolo_engines.ENGINES), default=YOLO_ENGINE,
+                        help="CPU inference engine for the YOLO model")
+    parser.add_argument("--work-width", type=int, default=WORK_WIDTH,
+                        help="Resize sampled frames once to this width for both models (0 = source size)")
+    args = parser.parse_args()
+    # Via the environment too, so spawned segment workers load the same engine
+    YOLO_ENGINE = os.environ["YOLO_ENGINE"] = args.engine
+
     logger.info(f"Starting Multi-Video Batch Processing in {INPUT_DIR}")
     
     # Find all mp4 files
@@ -292,7 +777,12 @@ def main():
         logger.info(f"--- Processing Video {idx+1}/{len(mp4_files)}: {filename} ---")
         filepath = os.path.join(INPUT_DIR, filename)
         
-        metrics = process_video(filepath)
+        try:
+            metrics = process_video(filepath, segments=args.segments, adaptive=args.adaptive,
+                                    reuse_detections=args.reuse_detections, work_width=args.work_width)
+        except Exception as e:
+            progress_events.ProgressReporter(os.path.splitext(filename)[0], 0, 0).fail(e)
+            raise
         if metrics:
             all_metrics.append(metrics)
             
@@ -300,7 +790,10 @@ def main():
             pd.DataFrame(all_metrics).to_csv(MASTER_CSV, index=False)
             logger.info(f"Updated {MASTER_CSV}")
 
-    detector.close()
+    if detector is not None:
+        detector.close()
+    if args.adaptive:
+        print_sampling_summary([os.path.splitext(f)[0] for f in mp4_files])
     logger.success(f"Batch processing complete! All 14 videos analyzed. Master dashboard ready at {MASTER_CSV}")
 
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+import pandas as pd
+from loguru import logger
+import first_person_pipeline as fpp
+import apply_global_motion
+import frame_records
+import frame_prep
+import progress_events
+import stage_timer
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# One decode of a video feeds every per-frame analysis. Each analyzer gets the same
+# sampled frames on the PROCESS_FPS grid and returns its columns for each frame.
+# All columns are written to one `{video}_signals.csv`, one row per sampled frame,
+# keyed by `frame` (as in _data.csv) and `t_s`. A new signal costs only its own compute.
+INPUT_DIR = fpp.INPUT_DIR
+OUTPUT_DIR = fpp.OUTPUT_DIR
+PROCESS_FPS = fpp.PROCESS_FPS
+DEFAULT_ANALYZERS = os.getenv("ANALYZERS", "fpp,motion").split(",")
+POSE_WEIGHTS = os.getenv("POSE_WEIGHTS", "yolov8n-pose.pt")
+POSE_WRISTS = (9, 10)              # COCO keypoints: left / right wrist
+
+ANALYZERS = {}                     # name -> Analyzer subclass, see register()
+
+
+def register(cls):
+    ANALYZERS[cls.name] = cls
+    return cls
+
+
+def signals_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_signals.csv")
+
+
+class VideoStream:
+    """What analyzers know about the video being decoded (filled before setup())."""
+
+    def __init__(self, video_path, fps, frame_skip, size, total_frames, timer):
+        self.video_path = video_path
+        self.base_name = os.path.splitext(os.path.basename(video_path))[0]
+        self.fps = fps
+        self.frame_skip = frame_skip
+        self.size = size
+        self.total_frames = total_frames
+        self.timer = timer
+        self.frame_count = 0        # Source frames decoded so far
+        self.loop_s = 0.0           # Wall time of the decode loop, set before finalize()
+
+
+class FrameContext:
+    """One sampled frame. Derived images are computed on first use and shared, so two
+    analyzers that need the same grayscale or resized buffer pay for it once."""
+
+    def __init__(self, frame, index, source_frame, stream, prep=None):
+        self.frame = frame
+        self.index = index                  # Sampled frame number (1-based), the `frame` column
+        self.source_frame = source_frame
+        self.t_s = (source_frame - 1) / stream.fps if stream.fps else 0.0
+        self.stream = stream
+        self.timer = stream.timer
+        self._prep = prep
+        self._prep_loaded = False
+        self._gray = None
+
+    @property
+    def prep(self):
+        """The stream's FramePrep loaded with this frame, or None without a work width."""
+        if self._prep is not None and not self._prep_loaded:
+            with self.timer.stage("preprocess"):
+                self._prep.load(self.frame)
+            self._prep_loaded = True
+        return self._prep
+
+    @property
+    def blurred_gray(self):
+        if self._gray is None:
+            self._gray = apply_global_motion.blurred_gray(self.frame)
+        return self._gray
+
+
+class Analyzer:
+    """Base class. `columns` maps each output column to its dtype; `on_frame` returns a
+    dict with (some of) them, missing values become NaN / 0 / "". `finalize` runs after
+    the last frame with the aligned table (it may add columns) and returns its result."""
+    name = None
+    columns = {}
+
+    def setup(self, stream):
+        pass
+
+    def on_frame(self, ctx):
+        raise NotImplementedError
+
+    def on_error(self, ctx, error):
+        """Called instead of a row when on_frame raised; the row gets the missing values."""
+
+    def finalize(self, stream, table):
+        return None
+
+
+@register
+class ObjectsHandsAnalyzer(Analyzer):
+    """Stage 1 per frame: YOLO objects + MediaPipe hands, the annotated video and, in
+    finalize, everything process_video writes after its frame loop (returns the master row)."""
+    name = "fpp"
+    columns = {"lw_x": np.float64, "lw_y": np.float64, "rw_x": np.float64, "rw_y": np.float64,
+               "objects_detected": np.int16, "objects_list": object}
+
+    def setup(self, stream):
+        fpp.load_models()
+        self.records = frame_records.FrameRecordBuffer()
+        self.output_video_path = os.path.join(OUTPUT_DIR, f"{stream.base_name}_annotated.mp4")
+        self.out = fpp.open_writer(self.output_video_path, stream.size)
+        self.progress = progress_events.ProgressReporter(stream.base_name, stream.total_frames, stream.fps,
+                                                         path=os.path.join(OUTPUT_DIR, 'pipeline_events.jsonl'))
+        self.progress.start()
+        self.running_working = 0
+        self.prev_wrists = None
+
+    def on_frame(self, ctx):
+        record = fpp.new_frame_record(ctx.index)
+        annotated = fpp.detect_objects(ctx.frame, record, ctx.timer, prep=ctx.prep)
+        fpp.track_hands(annotated, record, ctx.timer, ctx.prep)
+        self._keep(ctx, record, annotated)
+        return record
+
+    def on_error(self, ctx, error):
+        # As in process_frames: keep a row without detections so the video stays aligned
+        self._keep(ctx, fpp.new_frame_record(ctx.index), ctx.frame)
+
+    def _keep(self, ctx, record, annotated):
+        self.records.append(record)
+        self.records.span_end = ctx.index
+        with ctx.timer.stage("encode"):
+            self.out.write(annotated)
+        working, self.prev_wrists = fpp.progress_working(record, self.prev_wrists)
+        self.running_working += working
+        self.progress.update(ctx.source_frame, len(self.records), self.running_working)
+
+    def finalize(self, stream, table):
+        self.out.release()
+        return fpp.finish_video(stream.video_path, self.output_video_path, self.records, stream.frame_count,
+                                stream.total_frames, stream.loop_s, stream.timer, self.progress, size=stream.size)
+
+
+@register
+class GlobalMotionAnalyzer(Analyzer):
+    """Camera-shake score (apply_global_motion.py) per frame. With *apply*, finalize
+    rewrites _data.csv with it as apply_global_motion does (run after "fpp")."""
+    name = "motion"
+    columns = {"motion_score": np.float64}
+
+    def __init__(self, apply=False):
+        self.apply = apply
+
+    def setup(self, stream):
+        self.prev = None
+
+    def on_frame(self, ctx):
+        gray = ctx.blurred_gray
+        score = apply_global_motion.motion_score(self.prev, gray)
+        self.prev = gray
+        return {"motion_score": score}
+
+    def on_error(self, ctx, error):
+        self.prev = None
+
+    def finalize(self, stream, table):
+        if not self.apply:
+            return None
+        scores = pd.Series(table["motion_score"].to_numpy(), index=table["frame"].to_numpy())
+        return apply_global_motion.apply_motion_scores(stream.base_name, scores.dropna())
+
+
+@register
+class PoseAnalyzer(Analyzer):
+    """YOLOv8-pose wrists of the most confident person (excertion.py / test.py), NaN when a
+    wrist is not found. finalize adds `pose_exertion`: wrist travel per frame, 1 s mean."""
+    name = "pose"
+    columns = {"pose_lw_x": np.float64, "pose_lw_y": np.float64, "pose_rw_x": np.float64, "pose_rw_y": np.float64}
+
+    def setup(self, stream):
+        from ultralytics import YOLO
+        self.model = YOLO(POSE_WEIGHTS)
+
+    def on_frame(self, ctx):
+        with ctx.timer.stage("pose"):
+            results = self.model(ctx.frame, verbose=False)[0]
+        if results.keypoints is None or len(results.keypoints) == 0:
+            return None
+        keypoints = results.keypoints.xy[0].cpu().numpy()
+        row = {}
+        for side, kp in zip(("lw", "rw"), POSE_WRISTS):
+            # YOLO returns [0, 0] for keypoints it could not place
+            if len(keypoints) > kp and keypoints[kp][0] != 0.0:
+                row[f"pose_{side}_x"], row[f"pose_{side}_y"] = float(keypoints[kp][0]), float(keypoints[kp][1])
+        return row
+
+    def finalize(self, stream, table):
+        travel = sum(np.hypot(table[f"pose_{s}_x"].diff(), table[f"pose_{s}_y"].diff()).fillna(0) for s in ("lw", "rw"))
+        table["pose_exertion"] = travel.rolling(window=PROCESS_FPS, min_periods=1).mean()
+        return None
+
+
+def _missing(dtype):
+    if dtype is object:
+        return ""
+    return np.nan if np.issubdtype(np.dtype(dtype), np.floating) else 0
+
+
+def run_analyzers(video_path, analyzers, work_width=None):
+    """Decode *video_path* once and run every analyzer on its sampled frames. Returns
+    (table, {analyzer name: finalize result}); the table is saved as {video}_signals.csv."""
+    owners = {}
+    for a in analyzers:
+        for col in a.columns:
+            if col in owners or col in ("frame", "source_frame", "t_s"):
+                raise ValueError(f"Column {col} of analyzer {a.name} is already produced by {owners.get(col, 'the stream')}")
+            owners[col] = a.name
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Cannot open video: {video_path}")
+        return None, {}
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    frame_skip = max(1, int(fps / PROCESS_FPS))
+    timer = stage_timer.StageTimer(enabled=fpp.STAGE_TIMING, counters=("decoded", "sampled", "failed", "dropped"))
+    stream = VideoStream(video_path, fps, frame_skip, size, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), timer)
+    for a in analyzers:
+        a.setup(stream)
+    work_width = fpp.WORK_WIDTH if work_width is None else work_width
+    prep = frame_prep.FramePrep(work_width) if work_width else None
+
+    base = {"frame": np.int32, "source_frame": np.int64, "t_s": np.float64}
+    cols = {name: frame_records._Growable(dtype) for name, dtype in {**base, **{c: d for a in analyzers for c, d in a.columns.items()}}.items()}
+    defaults = {a.name: {c: _missing(d) for c, d in a.columns.items()} for a in analyzers}
+    names = ", ".join(a.name for a in analyzers)
+    logger.info(f"{stream.base_name}: one pass at {PROCESS_FPS} fps (every {frame_skip} frames) for {names}")
+
+    started = time.perf_counter()
+    frame_count = 0
+    while True:
+        with timer.stage("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        stream.frame_count = frame_count
+        timer.count("decoded")
+        if frame_count % frame_skip != 0:
+            continue
+        timer.count("sampled")
+        ctx = FrameContext(frame, frame_count // frame_skip, frame_count, stream, prep)
+        cols["frame"].append(ctx.index)
+        cols["source_frame"].append(frame_count)
+        cols["t_s"].append(ctx.t_s)
+        for a in analyzers:
+            try:
+                with timer.stage(f"analyzer_{a.name}"):
+                    row = a.on_frame(ctx) or {}
+            except Exception as e:
+                timer.count("failed")
+                logger.warning(f"{a.name} failed on frame {ctx.index} of {stream.base_name}: {e}")
+                a.on_error(ctx, e)
+                row = {}
+            for col, missing in defaults[a.name].items():
+                value = row.get(col, missing)
+                cols[col].append(missing if value is None else value)
+        if ctx.index % 500 == 0:
+            logger.info(f"Analyzed {ctx.index} sampled frames of {stream.base_name} (up to frame {frame_count})...")
+    cap.release()
+    stream.loop_s = time.perf_counter() - started
+    timer.count("dropped", max(stream.total_frames - frame_count, 0))
+
+    table = pd.DataFrame({name: col.view() for name, col in cols.items()})
+    results = {a.name: a.finalize(stream, table) for a in analyzers}
+    path = signals_path(stream.base_name)
+    table.to_csv(path, index=False)
+    logger.success(f"{len(table)} aligned rows x {len(table.columns)} columns saved to {path} "
+                   f"({stream.loop_s:.1f} s decode + analysis)")
+    return table, results
+
+
+def build_analyzers(names, apply_motion=False):
+    unknown = [n for n in names if n not in ANALYZERS]
+    if unknown:
+        raise ValueError(f"Unknown analyzers {unknown}; available: {sorted(ANALYZERS)}")
+    return [ANALYZERS[n](apply=apply_motion) if n == "motion" else ANALYZERS[n]() for n in names]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several per-frame analyses over one decode of each video.")
+    parser.add_argument("videos", nargs="*", help=f"Video files (default: every .mp4 in {INPUT_DIR})")
+    parser.add_argument("--analyzers", default=",".join(DEFAULT_ANALYZERS),
+                        help=f"Comma-separated, in finalize order (available: {', '.join(ANALYZERS)})")
+    parser.add_argument("--apply-motion", action="store_true",
+                        help="Use the motion score as the exertion signal of _data.csv (apply_global_motion.py)")
+    parser.add_argument("--work-width", type=int, default=None)
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.analyzers.split(",") if n.strip()]
+    if args.apply_motion and ("motion" not in names or "fpp" in names and names.index("fpp") > names.index("motion")):
+        parser.error("--apply-motion needs the motion analyzer, after fpp when both run")
+    videos = args.videos or [os.path.join(INPUT_DIR, f) for f in sorted(os.listdir(INPUT_DIR)) if f.endswith(".mp4")]
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    rows = []
+    for video in videos:
+        _, results = run_analyzers(video, build_analyzers(names, args.apply_motion), args.work_width)
+        # Master rows in finalize order, later ones overriding (motion rewrites fpp's metrics)
+        row = {}
+        for name in names:
+            row.update(results.get(name) or {})
+        if row:
+            rows.append(row)
+    if rows:
+        pd.DataFrame(rows).to_csv(fpp.MASTER_CSV, index=False)
+        logger.success(f"Master table saved to {fpp.MASTER_CSV}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import os
+import cv2
+import numpy as np
+import mediapipe as mp
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# One resize per sampled frame, shared by YOLO and MediaPipe. The models see a
+# working-resolution copy of the frame; detections are mapped back to source pixels
+# and drawn onto a reused full-size annotation buffer.
+# 0 = off: the models see the source frame, as before. 640 matches YOLO_IMGSZ, so
+# ultralytics' letterbox only pads instead of resizing a second time.
+WORK_WIDTH = int(os.getenv("PIPELINE_WORK_WIDTH", "0"))
+BOX_COLOR = (255, 128, 0)
+
+
+class FramePrep:
+    """Preallocated buffers for one stream of same-sized frames.
+
+    - `work`: BGR at the working resolution (YOLO input)
+    - `rgb`: the same pixels as RGB (MediaPipe input)
+    - `annotated`: source-resolution copy of the frame that gets drawn on
+
+    The buffers are allocated on the first frame and again only if the frame size
+    changes. Arrays handed out are overwritten by the next `load()`."""
+
+    def __init__(self, work_width=WORK_WIDTH):
+        self.work_width = work_width
+        self.source_size = None
+        self.work = self.rgb = self.annotated = None
+        self.scale = np.ones(4, dtype=np.float32)   # Working -> source, per xyxy coordinate
+
+    def _allocate(self, frame):
+        h, w = frame.shape[:2]
+        self.source_size = (w, h)
+        work_w = min(self.work_width, w) if self.work_width > 0 else w
+        work_h = max(2, int(round(h * work_w / w / 2)) * 2)
+        self.resize = (work_w, work_h) != (w, h)
+        self.work = np.empty((work_h, work_w, 3), dtype=np.uint8) if self.resize else None
+        self.rgb = np.empty((work_h, work_w, 3), dtype=np.uint8)
+        self.annotated = np.empty_like(frame)
+        self.scale = np.float32([w / work_w, h / work_h, w / work_w, h / work_h])
+
+    def load(self, frame):
+        if self.source_size != (frame.shape[1], frame.shape[0]):
+            self._allocate(frame)
+        np.copyto(self.annotated, frame)
+        if self.resize:
+            cv2.resize(frame, (self.work.shape[1], self.work.shape[0]), dst=self.work, interpolation=cv2.INTER_AREA)
+        else:
+            self.work = frame
+        cv2.cvtColor(self.work, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        return self
+
+    def mp_image(self):
+        # mp.Image copies its input; at the working resolution that copy is small
+        return mp.Image(image_format=mp.ImageFormat.SRGB, data=self.rgb)
+
+    def to_source(self, xyxy):
+        """Working-resolution boxes -> source pixels."""
+        return np.asarray(xyxy, dtype=np.float32).reshape(-1, 4) * self.scale
+
+
+def draw_boxes(frame, xyxy, class_ids, names, color=BOX_COLOR, thickness=2, suffix=""):
+    """Labelled boxes drawn in place (YOLO's own plot() would copy the frame)."""
+    for (x1, y1, x2, y2), c in zip(np.asarray(xyxy).astype(int), class_ids):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+        cv2.putText(frame, f"{names[int(c)]}{suffix}", (x1, max(y1 - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, thickness)
+    return frame
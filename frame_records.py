@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import landmark_store
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Column-oriented, NumPy-backed per-frame records for process_video. A 10-hour
+# shift at 5 fps is ~180k rows; as dicts that is ~10x the memory the data needs.
+CHUNK_ROWS = 4096
+GROWTH = 1.5           # Capacity grows by this factor, rounded up to whole chunks
+
+COLUMNS = {
+    "frame": np.int32,
+    "lw_x": np.float64, "lw_y": np.float64,   # Wrist pixels, NaN when the hand is not seen
+    "rw_x": np.float64, "rw_y": np.float64,
+    "objects_detected": np.int16,
+}
+
+
+class _Growable:
+    """1-D typed array with amortised chunked growth; `view()` is the filled prefix."""
+
+    def __init__(self, dtype, chunk_rows=CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self.data = np.empty(chunk_rows, dtype=dtype)
+        self.n = 0
+
+    def _reserve(self, extra):
+        needed = self.n + extra
+        if needed <= len(self.data):
+            return
+        capacity = max(needed, int(len(self.data) * GROWTH))
+        capacity = -(-capacity // self.chunk_rows) * self.chunk_rows
+        grown = np.empty(capacity, dtype=self.data.dtype)
+        grown[:self.n] = self.data[:self.n]
+        self.data = grown
+
+    def append(self, value):
+        if self.n == len(self.data):
+            self._reserve(1)
+        self.data[self.n] = value
+        self.n += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        self._reserve(len(values))
+        self.data[self.n:self.n + len(values)] = values
+        self.n += len(values)
+
+    def view(self):
+        return self.data[:self.n]
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+
+class FrameRecordBuffer:
+    """Typed per-frame columns plus ragged YOLO class ids (flat ids + row offsets).
+
+    `append()` takes the record dict filled by detect_objects/track_hands, so the
+    per-frame helpers stay unchanged and the dict is dropped right after. The
+    `objects_list` strings are interned as categories rather than stored per row."""
+
+    def __init__(self, chunk_rows=CHUNK_ROWS, landmarks=landmark_store.STORE_LANDMARKS):
+        self.columns = {name: _Growable(dtype, chunk_rows) for name, dtype in COLUMNS.items()}
+        # All hand landmarks per row (landmark_store.ROW_DTYPE), saved beside _data.csv
+        self.landmarks = _Growable(landmark_store.ROW_DTYPE, chunk_rows) if landmarks else None
+        self.class_ids = _Growable(np.int16, chunk_rows)
+        self.class_offsets = _Growable(np.int64, chunk_rows)
+        self.class_offsets.append(0)
+        self.objects_code = _Growable(np.int32, chunk_rows)
+        self.categories = {}   # objects_list string -> code
+        self.span_end = None   # Last sampling-grid frame covered (>= last row's frame when rows were skipped)
+
+    def __len__(self):
+        return self.columns["frame"].n
+
+    def append(self, record):
+        for name, col in self.columns.items():
+            col.append(record[name])
+        ids = record.get("class_ids", ())
+        if len(ids):
+            self.class_ids.extend(ids)
+        self.class_offsets.append(self.class_ids.n)
+        label = record.get("objects_list", "")
+        code = self.categories.get(label)
+        if code is None:
+            code = self.categories[label] = len(self.categories)
+        self.objects_code.append(code)
+        if self.landmarks is not None:
+            self.landmarks.append(landmark_store.to_row(record))
+
+    def extend(self, other):
+        """Append all rows of another buffer (e.g. a segment processed elsewhere)."""
+        for name, col in self.columns.items():
+            col.extend(other.columns[name].view())
+        self.class_offsets.extend(other.class_offsets.view()[1:] + self.class_ids.n)
+        self.class_ids.extend(other.class_ids.view())
+        remap = np.empty(max(len(other.categories), 1), dtype=np.int32)
+        for label, code in other.categories.items():
+            remap[code] = self.categories.setdefault(label, len(self.categories))
+        self.objects_code.extend(remap[other.objects_code.view()])
+        if self.landmarks is not None:
+            if other.landmarks is None:
+                self.landmarks = None   # Rows would no longer line up
+            else:
+                self.landmarks.extend(other.landmarks.view())
+        if other.span_end is not None:
+            self.span_end = other.span_end
+
+    def classes_of(self, row):
+        offsets = self.class_offsets.view()
+        return self.class_ids.view()[offsets[row]:offsets[row + 1]]
+
+    def to_frame(self):
+        """DataFrame in the `_data.csv` column order. Numeric columns are views of the
+        buffer (no copy), so don't append to the buffer while the frame is in use."""
+        data = {name: col.view() for name, col in self.columns.items()}
+        labels = sorted(self.categories, key=self.categories.get)
+        data["objects_list"] = pd.Categorical.from_codes(self.objects_code.view(), categories=labels)
+        return pd.DataFrame(data, copy=False)
+
+    @property
+    def nbytes(self):
+        arrays = [*self.columns.values(), self.class_ids, self.class_offsets, self.objects_code]
+        if self.landmarks is not None:
+            arrays.append(self.landmarks)
+        return sum(a.nbytes for a in arrays) + sum(len(label) for label in self.categories)
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from loguru import logger
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# All 21 MediaPipe landmarks of both hands for every sampled frame, stored next to
+# _data.csv as `{video}_landmarks.npy`, one row per _data.csv row. It is a structured
+# array that np.load(..., mmap_mode="r") maps without reading. Coordinates are
+# MediaPipe's normalised ones (x, y as a fraction of the source frame, z relative depth
+# on about the scale of x) in float16. A hand that was not seen is NaN with present = False.
+OUTPUT_DIR = 'outputs/'
+STORE_LANDMARKS = os.getenv("PIPELINE_LANDMARKS", "1") != "0"
+HANDS = ("Left", "Right")     # Index 0 / 1, the same hands as lw_* / rw_* in _data.csv
+N_LANDMARKS = 21
+WRIST, THUMB_TIP, INDEX_TIP, MIDDLE_TIP, RING_TIP, PINKY_TIP = 0, 4, 8, 12, 16, 20
+FINGERTIPS = (THUMB_TIP, INDEX_TIP, MIDDLE_TIP, RING_TIP, PINKY_TIP)
+
+ROW_DTYPE = np.dtype([("frame", "<i4"), ("present", "?", (2,)), ("xyz", "<f2", (2, N_LANDMARKS, 3))])
+_NO_HANDS = np.full((2, N_LANDMARKS, 3), np.nan, dtype=np.float16)
+
+
+def empty_hands():
+    """Per-frame landmark slot filled in by the hand pass: [hand, landmark, xyz], NaN = unseen."""
+    return np.full((2, N_LANDMARKS, 3), np.nan, dtype=np.float32)
+
+
+def hand_index(label):
+    return 0 if label == HANDS[0] else 1
+
+
+def to_row(record):
+    xyz = record.get("landmarks")
+    if xyz is None:
+        return record["frame"], (False, False), _NO_HANDS
+    return record["frame"], ~np.isnan(xyz[:, WRIST, 0]), xyz
+
+
+def landmarks_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_landmarks.npy")
+
+
+def meta_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_landmarks.json")
+
+
+def save(rows, base_name, output_dir=OUTPUT_DIR, fps=5, size=None):
+    """Write the rows (ROW_DTYPE) and a small JSON sidecar with fps and source frame size."""
+    path = landmarks_path(base_name, output_dir)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(rows, dtype=ROW_DTYPE))
+    os.replace(tmp, path)
+    present = rows["present"]
+    meta = {"video": base_name, "rows": len(rows), "fps": fps,
+            "width": size[0] if size else None, "height": size[1] if size else None,
+            "hands": list(HANDS), "landmarks": N_LANDMARKS, "coords": "normalized",
+            "present_pct": [round(100.0 * float(present[:, h].mean()), 1) if len(rows) else 0.0 for h in range(2)]}
+    with open(meta_path(base_name, output_dir), "w") as f:
+        json.dump(meta, f, indent=4)
+    return path
+
+
+class HandLandmarks:
+    """A video's landmark rows (memory-mapped by default) with time and scale.
+
+    `frame`, `present` and `xyz` are views of the file; `positions()` and `kinematics()`
+    return float32 arrays shaped [frames, hand, joint, xyz], NaN where the hand is unseen."""
+
+    def __init__(self, rows, fps=5, size=None):
+        self.rows = rows
+        self.frame = rows["frame"]
+        self.present = rows["present"]
+        self.xyz = rows["xyz"]
+        self.fps = fps
+        self.size = size
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def t(self):
+        """Seconds from the start of the video (sampling-grid time, gaps included)."""
+        return (self.frame.astype(np.float64) - 1) / self.fps
+
+    def positions(self, joints=None, pixels=True):
+        """Landmarks as float32; in source pixels when the frame size is known (z uses the width)."""
+        xyz = self.xyz if joints is None else self.xyz[:, :, list(joints)]
+        out = xyz.astype(np.float32)
+        if pixels and self.size:
+            out *= np.float32([self.size[0], self.size[1], self.size[0]])
+        return out
+
+    def kinematics(self, joints=None, pixels=True):
+        pos = self.positions(joints, pixels)
+        velocity, acceleration, jerk = derivatives(pos, self.t)
+        return {"position": pos, "velocity": velocity, "acceleration": acceleration, "jerk": jerk}
+
+
+def load(base_name, output_dir=OUTPUT_DIR, mmap=True):
+    path = landmarks_path(base_name, output_dir)
+    if not os.path.exists(path):
+        return None
+    rows = np.load(path, mmap_mode="r" if mmap else None)
+    meta = {}
+    if os.path.exists(meta_path(base_name, output_dir)):
+        with open(meta_path(base_name, output_dir)) as f:
+            meta = json.load(f)
+    size = (meta["width"], meta["height"]) if meta.get("width") else None
+    return HandLandmarks(rows, meta.get("fps", 5), size)
+
+
+def derivatives(positions, t, order=3):
+    """Velocity, acceleration, jerk, ... (up to *order*) of *positions* [frames, ...] over
+    the sample times *t*, by repeated central differences along the time axis. Uneven
+    spacing (adaptive sampling) is handled; NaN (hand unseen) spreads only to neighbours."""
+    out = []
+    current = positions
+    for _ in range(order):
+        if len(current) < 2:
+            current = np.full_like(current, np.nan)
+        else:
+            current = np.gradient(current, t, axis=0).astype(np.float32, copy=False)
+        out.append(current)
+    return out
+
+
+def speed(vectors):
+    """Image-plane magnitude of velocity-like arrays [..., xyz] -> [...]."""
+    return np.hypot(vectors[..., 0], vectors[..., 1])
+
+
+def summarize(hands, joints=(WRIST,) + FINGERTIPS):
+    """Per hand and joint: visible share, median speed, p95 acceleration and RMS jerk."""
+    k = hands.kinematics(joints)
+    unit = "px" if hands.size else "norm"
+    summary = {}
+    for h, hand in enumerate(HANDS):
+        rows = {}
+        for j, joint in enumerate(joints):
+            v, a, jk = (speed(k[name][:, h, j]) for name in ("velocity", "acceleration", "jerk"))
+            rows[int(joint)] = {
+                f"median_speed_{unit}_s": _stat(np.nanmedian, v),
+                f"p95_accel_{unit}_s2": _stat(lambda x: np.nanpercentile(x, 95), a),
+                f"rms_jerk_{unit}_s3": _stat(lambda x: np.sqrt(np.nanmean(x ** 2)), jk),
+            }
+        summary[hand] = {"present_pct": round(100.0 * float(np.mean(hands.present[:, h])), 1) if len(hands) else 0.0,
+                         "joints": rows}
+    return summary
+
+
+def _stat(fn, values):
+    return round(float(fn(values)), 2) if np.isfinite(values).any() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-joint hand kinematics from a video's stored landmarks.")
+    parser.add_argument("videos", nargs="+", help="Base names (outputs/{video}_landmarks.npy)")
+    parser.add_argument("--joints", type=int, nargs="+", default=[WRIST, *FINGERTIPS],
+                        help="MediaPipe landmark ids (0 wrist, 4/8/12/16/20 fingertips)")
+    args = parser.parse_args()
+    for video in args.videos:
+        hands = load(video)
+        if hands is None:
+            logger.error(f"No landmarks for {video} at {landmarks_path(video)} (rerun Stage 1 with PIPELINE_LANDMARKS=1)")
+            return 1
+        started = time.perf_counter()
+        summary = summarize(hands, args.joints)
+        logger.info(f"{video}: {len(hands)} frames, kinematics in {(time.perf_counter() - started) * 1000:.1f} ms")
+        print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,437 @@
+import os
+import re
+import sys
+import json
+import stat
+import time
+import argparse
+import threading
+import collections
+import multiprocessing
+import cv2
+import numpy as np
+from loguru import logger
+import first_person_pipeline as fpp
+import frame_records
+import progress_events
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Live mode: body-cam feeds are analyzed while the shift is still being recorded.
+# One reader thread per stream samples frames onto the PROCESS_FPS grid into a
+# bounded per-stream queue; a scheduler hands queued frames round-robin to a shared
+# pool of detector processes (each with its own YOLO + MediaPipe instances).
+POLICIES = ("drop-oldest", "lower-rate")
+POLICY = os.getenv("LIVE_POLICY", "drop-oldest")
+QUEUE_DEPTH = int(os.getenv("LIVE_QUEUE_DEPTH", "10"))               # Sampled frames buffered per stream (2 s at 5 fps)
+DETECTOR_WORKERS = int(os.getenv("LIVE_DETECTOR_WORKERS", "2"))
+IN_FLIGHT_PER_WORKER = 2                                             # Frames handed to the pool ahead of time
+WORK_WIDTH = int(os.getenv("LIVE_WORK_WIDTH", "640"))                # Readers downscale before IPC (0 = source size)
+START_METHOD = os.getenv("LIVE_START_METHOD", "spawn")
+
+MIN_FPS = 1.0                 # lower-rate never samples a stream below this
+RATE_STEP_S = 2.0             # Min time between rate changes of one stream
+IDLE_TIMEOUT_S = float(os.getenv("LIVE_IDLE_TIMEOUT_S", "30"))      # No new frame for this long = stream ended
+POLL_S = 0.5                  # Growing file: wait at EOF before looking for more
+RECONNECT_S = 2.0             # Network stream: wait before reconnecting
+SEEK_BACK_S = 2.0             # Growing file: reopen this far before the last frame, then skip forward
+STATUS_EVERY_S = 10.0
+
+NETWORK_SCHEMES = ("rtsp://", "rtmp://", "http://", "https://", "udp://", "tcp://", "srt://")
+
+
+# ---------------------------------------------------------
+# STREAM SOURCES
+# ---------------------------------------------------------
+def parse_source(spec):
+    """'name=source' or just 'source' -> (name, source, kind). kind is network, pipe or file."""
+    name, source = None, spec
+    match = re.match(r"^(\w[\w.-]*)=(.+)$", spec)
+    if match and not spec.startswith(NETWORK_SCHEMES):
+        name, source = match.groups()
+    if source.startswith(NETWORK_SCHEMES):
+        kind = "network"
+    elif os.path.exists(source) and stat.S_ISFIFO(os.stat(source).st_mode):
+        kind = "pipe"
+    else:
+        kind = "file"
+    if name is None:
+        name = re.sub(r"\W+", "_", os.path.splitext(os.path.basename(source.rstrip("/")))[0]) or "stream"
+    return name, source, kind
+
+
+class Stream:
+    """Per-stream queue, sampling rate and counters. Guarded by the Scheduler's lock."""
+
+    def __init__(self, name, source, kind):
+        self.name = name
+        self.source = source
+        self.kind = kind
+        self.queue = collections.deque()
+        self.rate = float(fpp.PROCESS_FPS)
+        self.last_rate_change = 0.0
+        self.reading = True
+        self.in_flight = 0
+        self.finalized = False
+        self.decoded = self.sampled = self.dropped = self.failed = self.rate_changes = 0
+        self.last_slot = 0
+        self.records = []
+        self.lags = []
+        self.working = 0
+        self.prev_wrists = None
+        self.size = None   # Source frame size, for the landmark store
+        self.started = time.time()
+        self.progress = progress_events.ProgressReporter(name, 0, None)
+
+    @property
+    def done(self):
+        return not self.reading and not self.queue and not self.in_flight
+
+    def lag_summary(self, last=None):
+        lags = np.array(self.lags[-last:] if last else self.lags)
+        if not len(lags):
+            return {"p50": None, "p95": None, "max": None, "mean": None}
+        return {"p50": round(float(np.percentile(lags, 50)), 3), "p95": round(float(np.percentile(lags, 95)), 3),
+                "max": round(float(lags.max()), 3), "mean": round(float(lags.mean()), 3)}
+
+
+class StreamReader(threading.Thread):
+    """Decodes one source, samples it at the stream's current rate and submits frames.
+
+    - file: a file still being written (MPEG-TS/MKV; an .mp4 is unreadable until its
+      moov atom is written). At EOF it waits and reopens past the last frame. A frame
+      is only submitted once the next one decodes, since the newest can be half-written.
+    - pipe: a named pipe (e.g. ffmpeg -f mpegts into a mkfifo). EOF ends the stream.
+    - network: RTSP/UDP/HTTP. Dropped connections are retried until IDLE_TIMEOUT_S.
+    With *pace*, a finished file is read at its own frame rate, as a camera would deliver it."""
+
+    def __init__(self, stream, scheduler, pace=False, work_width=WORK_WIDTH):
+        super().__init__(name=f"reader-{stream.name}", daemon=True)
+        self.stream = stream
+        self.scheduler = scheduler
+        self.pace = pace
+        self.work_width = work_width
+        self.next_due = 0.0
+        self.last_t = -1.0
+
+    def _open(self, seek_s=None):
+        cap = cv2.VideoCapture(self.stream.source)
+        if seek_s is not None and seek_s > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, seek_s * 1000)
+        return cap
+
+    def run(self):
+        stream = self.stream
+        cap = self._open()
+        started = time.monotonic()
+        last_frame_at = time.monotonic()
+        pending = None   # file: newest frame, held back until the next one decodes
+        newest_t = -1.0
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    if stream.kind == "pipe" or (stream.kind == "file" and self.pace):
+                        break
+                    if time.monotonic() - last_frame_at > IDLE_TIMEOUT_S:
+                        break
+                    cap.release()
+                    time.sleep(POLL_S if stream.kind == "file" else RECONNECT_S)
+                    cap = self._open(self.last_t - SEEK_BACK_S if stream.kind == "file" else None)
+                    pending = None
+                    continue
+                if stream.kind == "network":
+                    t = time.monotonic() - started
+                else:
+                    t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    if t <= self.last_t:   # Re-read after reopening a growing file
+                        continue
+                if t > newest_t:
+                    newest_t = t
+                    last_frame_at = time.monotonic()
+                if stream.kind == "file" and not self.pace:
+                    held, pending = pending, (t, frame)
+                    if held is None:
+                        continue
+                    t, frame = held
+                self.last_t = t
+                if self.pace:
+                    time.sleep(max(0.0, started + t - time.monotonic()))
+                self._sample(t, frame)
+            if pending is not None:
+                self.last_t = pending[0]
+                self._sample(*pending)
+        except Exception as e:
+            logger.error(f"Stream {stream.name} reader failed: {e}")
+        finally:
+            cap.release()
+            self.scheduler.reader_done(stream)
+
+    def _sample(self, t, frame):
+        stream = self.stream
+        stream.decoded += 1
+        if t < self.next_due:
+            return
+        self.next_due += 1.0 / stream.rate
+        if self.next_due <= t:   # After a stall, restart the grid here instead of bursting
+            self.next_due = t + 1.0 / stream.rate
+        h, w = frame.shape[:2]
+        stream.size = (w, h)
+        scale = (1.0, 1.0)
+        if self.work_width and w > self.work_width:
+            small = (self.work_width, max(2, int(round(h * self.work_width / w / 2)) * 2))
+            scale = (w / small[0], h / small[1])
+            frame = cv2.resize(frame, small, interpolation=cv2.INTER_AREA)
+        slot = int(t * fpp.PROCESS_FPS) + 1   # Sampling-grid frame number, as in process_frames
+        self.scheduler.submit(stream, (slot, time.time(), frame, scale))
+
+
+# ---------------------------------------------------------
+# DETECTOR POOL
+# ---------------------------------------------------------
+def _detector_worker(tasks, results):
+    fpp.load_models()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        name, slot, captured, frame, (sx, sy) = task
+        record = fpp.new_frame_record(slot)
+        ok = True
+        try:
+            annotated = fpp.detect_objects(frame, record)
+            fpp.track_hands(annotated, record)
+        except Exception as e:
+            logger.warning(f"Frame {slot} of {name} failed: {e}")
+            record = fpp.new_frame_record(slot)
+            ok = False
+        # Back to source pixels when the reader downscaled
+        for key, s in (("lw_x", sx), ("lw_y", sy), ("rw_x", sx), ("rw_y", sy)):
+            if not np.isnan(record[key]):
+                record[key] = int(round(record[key] * s))
+        record["class_ids"] = list(record["class_ids"])
+        results.put((name, slot, captured, record, ok))
+
+
+class Scheduler:
+    """Bounded per-stream queues with the drop policy, fair round-robin dispatch to the
+    detector pool and result collection. Lag is capture-to-result wall time."""
+
+    def __init__(self, streams, workers=DETECTOR_WORKERS, policy=POLICY, queue_depth=QUEUE_DEPTH,
+                 start_method=START_METHOD):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}' (choose from {', '.join(POLICIES)})")
+        self.streams = {s.name: s for s in streams}
+        self.policy = policy
+        self.queue_depth = queue_depth
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.max_in_flight = workers * IN_FLIGHT_PER_WORKER
+        ctx = multiprocessing.get_context(start_method)
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.workers = [ctx.Process(target=_detector_worker, args=(self.tasks, self.results), daemon=True)
+                        for _ in range(workers)]
+        self._order = list(self.streams)
+        self._next = 0
+        self._stopping = False
+
+    # --- called by readers ---
+    def submit(self, stream, item):
+        with self.cond:
+            stream.sampled += 1
+            stream.last_slot = item[0]
+            if len(stream.queue) >= self.queue_depth:
+                stream.queue.popleft()
+                stream.dropped += 1
+            stream.queue.append(item)
+            if self.policy == "lower-rate":
+                self._adjust_rate(stream)
+            self.cond.notify_all()
+
+    def _adjust_rate(self, stream):
+        # Halve the sampling rate when the queue is half full, creep back up once it has drained
+        now = time.monotonic()
+        if now - stream.last_rate_change < RATE_STEP_S:
+            return
+        target = float(fpp.PROCESS_FPS)
+        if len(stream.queue) >= self.queue_depth // 2 and stream.rate > MIN_FPS:
+            stream.rate = max(MIN_FPS, stream.rate / 2)
+        elif len(stream.queue) <= 1 and stream.rate < target:
+            stream.rate = min(target, stream.rate * 1.5)
+        else:
+            return
+        stream.last_rate_change = now
+        stream.rate_changes += 1
+
+    def reader_done(self, stream):
+        with self.cond:
+            stream.reading = False
+            self.cond.notify_all()
+
+    # --- dispatch / collect ---
+    def _pick(self):
+        for i in range(len(self._order)):
+            stream = self.streams[self._order[(self._next + i) % len(self._order)]]
+            if stream.queue:
+                self._next = (self._next + i + 1) % len(self._order)
+                return stream
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                stream = None
+                while not self._stopping and (self.in_flight >= self.max_in_flight or (stream := self._pick()) is None):
+                    self.cond.wait()
+                if self._stopping:
+                    return
+                item = stream.queue.popleft()
+                stream.in_flight += 1
+                self.in_flight += 1
+            self.tasks.put((stream.name, *item))
+
+    def _collect(self):
+        while True:
+            result = self.results.get()
+            if result is None:
+                return
+            name, slot, captured, record, ok = result
+            lag = time.time() - captured
+            with self.cond:
+                stream = self.streams[name]
+                stream.in_flight -= 1
+                self.in_flight -= 1
+                stream.records.append(record)
+                stream.lags.append(lag)
+                stream.failed += int(not ok)
+                working, stream.prev_wrists = fpp.progress_working(record, stream.prev_wrists)
+                stream.working += working
+                self.cond.notify_all()
+            stream.progress.update(stream.decoded, len(stream.records), stream.working,
+                                   lag_s=round(lag, 3), dropped=stream.dropped)
+
+    def start(self):
+        for w in self.workers:
+            w.start()
+        self._threads = [threading.Thread(target=self._dispatch, daemon=True),
+                         threading.Thread(target=self._collect, daemon=True)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        with self.cond:
+            self._stopping = True
+            self.cond.notify_all()
+        for _ in self.workers:
+            self.tasks.put(None)
+        for w in self.workers:
+            w.join()
+        self.results.put(None)
+        for t in self._threads:
+            t.join()
+
+
+# ---------------------------------------------------------
+# PER-STREAM OUTPUT
+# ---------------------------------------------------------
+def finalize(stream, policy):
+    """Metrics for a finished stream, like a processed video, plus `<stream>_live.json`."""
+    records = sorted(stream.records, key=lambda r: r["frame"])
+    data = frame_records.FrameRecordBuffer()
+    seen = set()
+    for r in records:
+        if r["frame"] not in seen:
+            seen.add(r["frame"])
+            data.append(r)
+    data.span_end = stream.last_slot
+    metrics = fpp.calculate_and_plot_metrics(data, stream.name, stream.size) if len(data) else None
+    report = {
+        "stream": stream.name, "source": stream.source, "kind": stream.kind, "policy": policy,
+        "duration_s": round(time.time() - stream.started, 1),
+        "decoded_frames": stream.decoded, "sampled_frames": stream.sampled,
+        "processed_frames": len(stream.records), "dropped_frames": stream.dropped,
+        "failed_frames": stream.failed, "rate_changes": stream.rate_changes,
+        "final_rate_fps": stream.rate,
+        "lag_s": stream.lag_summary(),
+    }
+    with open(os.path.join(fpp.OUTPUT_DIR, f"{stream.name}_live.json"), "w") as f:
+        json.dump(report, f, indent=4)
+    stream.progress.finish(metrics)
+    return report, metrics
+
+
+def log_status(streams, queue_depth):
+    for s in streams:
+        lag = s.lag_summary(last=100)
+        logger.info(f"{s.name}: lag p50 {lag['p50']}s / p95 {lag['p95']}s, queue {len(s.queue)}/{queue_depth}, "
+                    f"{s.rate:.1f} fps, processed {len(s.records)}, dropped {s.dropped}")
+
+
+def run_live(specs, workers=DETECTOR_WORKERS, policy=POLICY, queue_depth=QUEUE_DEPTH, pace=False,
+             work_width=WORK_WIDTH, start_method=START_METHOD):
+    streams = [Stream(*parse_source(spec)) for spec in specs]
+    names = [s.name for s in streams]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Stream names must be unique: {names} (use name=source)")
+    scheduler = Scheduler(streams, workers, policy, queue_depth, start_method)
+    scheduler.start()
+    for s in streams:
+        s.progress.start()
+        logger.info(f"Live stream {s.name}: {s.kind} source {s.source}")
+    readers = [StreamReader(s, scheduler, pace, work_width) for s in streams]
+    for r in readers:
+        r.start()
+
+    reports, all_metrics = [], []
+    last_status = time.monotonic()
+    try:
+        while len(reports) < len(streams):
+            with scheduler.cond:
+                scheduler.cond.wait(timeout=1.0)
+                finished = [s for s in streams if s.done and not s.finalized]
+                for s in finished:
+                    s.finalized = True
+            for s in finished:
+                report, metrics = finalize(s, policy)
+                reports.append(report)
+                if metrics:
+                    all_metrics.append(metrics)
+                logger.success(f"Stream {s.name} ended: {report['processed_frames']} frames analyzed, "
+                               f"{report['dropped_frames']} dropped, lag p50 {report['lag_s']['p50']}s")
+            if not all(w.is_alive() for w in scheduler.workers):
+                raise RuntimeError("A detector worker exited; see its log above")
+            if time.monotonic() - last_status >= STATUS_EVERY_S:
+                log_status([s for s in streams if not s.finalized], queue_depth)
+                last_status = time.monotonic()
+    finally:
+        scheduler.stop()
+    return reports, all_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live mode: analyze several body-cam streams while they are recorded.")
+    parser.add_argument("sources", nargs="+",
+                        help="[name=]source: growing .ts/.mkv file, named pipe, or rtsp:// / udp:// / http:// URL")
+    parser.add_argument("--policy", choices=POLICIES, default=POLICY,
+                        help="When inference falls behind: drop the oldest queued frames, or sample that stream less often")
+    parser.add_argument("--workers", type=int, default=DETECTOR_WORKERS, help="Detector processes shared by all streams")
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH, help="Sampled frames buffered per stream")
+    parser.add_argument("--work-width", type=int, default=WORK_WIDTH, help="Downscale frames to this width (0 = source)")
+    parser.add_argument("--pace", action="store_true", help="Read finished files at their frame rate (simulated camera)")
+    args = parser.parse_args()
+
+    reports, all_metrics = run_live(args.sources, args.workers, args.policy, args.queue_depth, args.pace,
+                                    args.work_width)
+    print(f"\n{'stream':<20}{'analyzed':>10}{'dropped':>9}{'lag p50 s':>11}{'lag p95 s':>11}{'lag max s':>11}")
+    for r in reports:
+        lag = r["lag_s"]
+        fmt = lambda v: f"{v:.2f}" if v is not None else "-"
+        print(f"{r['stream']:<20}{r['processed_frames']:>10}{r['dropped_frames']:>9}"
+              f"{fmt(lag['p50']):>11}{fmt(lag['p95']):>11}{fmt(lag['max']):>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from loguru import logger
+
+import agent_video_analyzer
+from mock_ollama_server import start_mock_server
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Drives agent_video_analyzer's request path (ollama_generate → parse_json_from_response)
+# against a local mock Ollama at increasing concurrency levels, so client-side
+# changes can be measured offline.
+DEFAULT_CONCURRENCY = "1,2,4,8"
+DEFAULT_REQUESTS = 32
+SYNTHETIC_IMAGE_KB = 60  # Roughly the size of one ffmpeg-extracted PNG frame
+
+
+def synthetic_images(num_frames, size_kb=SYNTHETIC_IMAGE_KB, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        base64.b64encode(rng.bytes(size_kb * 1024)).decode("utf-8")
+        for _ in range(num_frames)
+    ]
+
+
+def video_images(video_path, num_frames):
+    frames = agent_video_analyzer.extract_frames(video_path, num_frames=num_frames)
+    try:
+        return [agent_video_analyzer.encode_image_b64(f) for f in frames]
+    finally:
+        for f in frames:
+            os.remove(f)
+        if frames:
+            os.rmdir(os.path.dirname(f))
+
+
+def one_request(images_b64, stream):
+    stats = {}
+    started = time.perf_counter()
+    ok = True
+    try:
+        raw = agent_video_analyzer.ollama_generate("Describe the work.", images_b64, stream=stream, stats=stats)
+        agent_video_analyzer.parse_json_from_response(raw)
+    except Exception as e:
+        logger.debug(f"Request failed: {e}")
+        ok = False
+    stats["latency_s"] = time.perf_counter() - started
+    stats["ok"] = ok
+    return stats
+
+
+def run_level(concurrency, num_requests, images_b64, stream):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(images_b64, stream), range(num_requests)))
+    wall = time.perf_counter() - started
+
+    latencies = np.array([r["latency_s"] for r in results if r["ok"]])
+    succeeded = len(latencies)
+    row = {
+        "concurrency": concurrency,
+        "requests": num_requests,
+        "succeeded": succeeded,
+        "failed": num_requests - succeeded,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(succeeded / wall, 3) if wall > 0 else 0.0,
+        "retries": sum(r["retries"] for r in results),
+        "requests_retried": sum(1 for r in results if r["retries"] > 0),
+        "failovers": sum(r["failovers"] for r in results),
+    }
+    for p in (50, 95, 99):
+        row[f"p{p}_s"] = round(float(np.percentile(latencies, p)), 3) if succeeded else None
+    if stream:
+        ttft = [r["first_token_s"] for r in results if "first_token_s" in r]
+        row["p50_first_token_s"] = round(float(np.percentile(ttft, 50)), 3) if ttft else None
+    return row
+
+
+def print_report(rows):
+    columns = ["concurrency", "succeeded", "failed", "throughput_rps", "p50_s", "p95_s", "p99_s", "retries", "failovers"]
+    print("\n" + "=" * 100)
+    print("AGENT LOAD TEST")
+    print("=" * 100)
+    print("  ".join(f"{c:>16}" for c in columns))
+    for row in rows:
+        print("  ".join(f"{str(row.get(c)):>16}" for c in columns))
+    print("=" * 100 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Ollama vision agent against a local mock server.")
+    parser.add_argument("--url", help="Use already running server(s) instead of mocks (comma-separated)")
+    parser.add_argument("--backends", type=int, default=1, help="Number of mock servers to start")
+    parser.add_argument("--dead-backends", type=int, default=0, help="Extra backend URLs that refuse connections")
+    parser.add_argument("--backend-concurrency", type=int, default=agent_video_analyzer.BACKEND_MAX_CONCURRENCY,
+                        help="Client-side in-flight limit per backend")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Requests per concurrency level")
+    parser.add_argument("--frames", type=int, default=16, help="Images attached to each request")
+    parser.add_argument("--video", help="Extract real frames from this video instead of synthetic images")
+    parser.add_argument("--stream", action="store_true", help="Use Ollama's streaming responses")
+    parser.add_argument("--retries", type=int, default=agent_video_analyzer.MAX_RETRIES)
+    parser.add_argument("--backoff", type=float, default=0.1, help="Retry backoff base in seconds")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    # Mock server behaviour
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--server-concurrency", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    servers = []
+    if args.url:
+        urls = [u.strip() for u in args.url.split(",") if u.strip()]
+    else:
+        for i in range(args.backends):
+            servers.append(start_mock_server(
+                latency_s=args.latency,
+                jitter_s=args.jitter,
+                max_concurrency=args.server_concurrency,
+                max_queue=args.max_queue,
+                error_rate=args.error_rate,
+                malformed_rate=args.malformed_rate,
+                tokens_per_s=500.0,
+                seed=args.seed + i,
+            ))
+        urls = [s.url for s in servers]
+    # Nothing listens on port 9 (discard) locally, so these fail fast with a connection error
+    urls += [f"http://127.0.0.1:9/dead{i}" for i in range(args.dead_backends)]
+    agent_video_analyzer.configure_backends(urls, args.backend_concurrency)
+    agent_video_analyzer.MAX_RETRIES = args.retries
+    agent_video_analyzer.RETRY_BACKOFF_S = args.backoff
+
+    # Keep the console readable: per-request logs from the agent are noise here
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    images_b64 = video_images(args.video, args.frames) if args.video else synthetic_images(args.frames)
+
+    rows = []
+    try:
+        for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+            rows.append(run_level(level, args.requests, images_b64, args.stream))
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    print_report(rows)
+    agent_video_analyzer.print_backend_summary()
+    for server in servers:
+        print(f"Mock server {server.url} stats: {server.stats}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "config": vars(args),
+                "results": rows,
+                "backends": agent_video_analyzer.get_backend_pool().summary(),
+            }, f, indent=4)
+        print(f"Saved → {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
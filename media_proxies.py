@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+from loguru import logger
+import work_bouts
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Small, web-friendly renditions of the annotated video so the dashboard never
+# has to ship the full `<video>_annotated.mp4` before playback can start.
+OUTPUT_DIR = 'outputs/'
+PROCESS_FPS = 5          # The annotated video has one frame per sampled frame
+
+PROXY_HEIGHT = 360
+PROXY_CRF = 32
+PROXY_MAXRATE = "400k"
+
+CLIP_MIN_BOUT_S = 3      # Ignore bouts shorter than this
+CLIP_MAX_S = 20          # Highlight clips are capped to this length (centred on the bout)
+MAX_CLIPS = 12           # Longest working bouts first, then longest idle bouts
+
+
+def proxy_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_proxy.mp4")
+
+
+def clips_dir(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, "clips", base_name)
+
+
+def clips_index_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_clips.json")
+
+
+def _encode_args():
+    # H.264 + faststart (moov atom first) so playback starts after the first few KB
+    return [
+        "-vf", f"scale=-2:{PROXY_HEIGHT}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-crf", str(PROXY_CRF), "-maxrate", PROXY_MAXRATE, "-bufsize", "800k",
+        "-movflags", "+faststart", "-an",
+    ]
+
+
+def _ffmpeg(args):
+    subprocess.run(["ffmpeg", "-y", "-v", "error", *args], check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def make_proxy(source_path, out_path):
+    _ffmpeg(["-i", source_path, *_encode_args(), out_path])
+    logger.info(f"Proxy {out_path}: {os.path.getsize(out_path) / 1e6:.1f} MB "
+                f"(source {os.path.getsize(source_path) / 1e6:.1f} MB)")
+
+
+def pick_highlight_bouts(bouts, max_clips=MAX_CLIPS, min_bout_s=CLIP_MIN_BOUT_S):
+    long_enough = [b for b in bouts if b["end_s"] - b["start_s"] >= min_bout_s]
+    by_length = lambda b: b["end_s"] - b["start_s"]
+    working = sorted((b for b in long_enough if b["working"]), key=by_length, reverse=True)
+    idle = sorted((b for b in long_enough if not b["working"]), key=by_length, reverse=True)
+    picked = (working + idle)[:max_clips]
+    return sorted(picked, key=lambda b: b["start_s"])
+
+
+def make_bout_clips(source_path, bouts, out_dir, clip_max_s=CLIP_MAX_S):
+    os.makedirs(out_dir, exist_ok=True)
+    clips = []
+    for b in bouts:
+        length = b["end_s"] - b["start_s"]
+        start = b["start_s"] + max(0.0, (length - clip_max_s) / 2)
+        duration = min(length, clip_max_s)
+        name = f"{'work' if b['working'] else 'idle'}_{int(b['start_s']):06d}.mp4"
+        _ffmpeg(["-ss", f"{start:.2f}", "-t", f"{duration:.2f}", "-i", source_path, *_encode_args(),
+                 os.path.join(out_dir, name)])
+        clips.append({
+            "file": name,
+            "working": b["working"],
+            "bout_start_s": b["start_s"],
+            "bout_end_s": b["end_s"],
+            "clip_start_s": round(start, 2),
+            "clip_end_s": round(start + duration, 2),
+        })
+    return clips
+
+
+def build_media(base_name, output_dir=OUTPUT_DIR, fps=PROCESS_FPS):
+    """Proxy rendition plus per-bout highlight clips for one processed video.
+    Returns the clip index (also written to `<video>_clips.json`), or None if skipped."""
+    source = os.path.join(output_dir, f"{base_name}_annotated.mp4")
+    if not os.path.exists(source):
+        logger.warning(f"No annotated video for {base_name}; skipping proxies.")
+        return None
+    if shutil.which("ffmpeg") is None:
+        logger.warning("ffmpeg not found; skipping proxy and highlight clips.")
+        return None
+
+    make_proxy(source, proxy_path(base_name, output_dir))
+
+    bouts = work_bouts.load_bouts(base_name, output_dir, fps) or []
+    out_dir = clips_dir(base_name, output_dir)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)  # Bouts change when metrics are recalculated
+    clips = make_bout_clips(source, pick_highlight_bouts(bouts), out_dir)
+
+    index = {"video": base_name, "proxy": os.path.basename(proxy_path(base_name, output_dir)),
+             "clips_dir": os.path.relpath(out_dir, output_dir), "clips": clips}
+    with open(clips_index_path(base_name, output_dir), "w") as f:
+        json.dump(index, f, indent=4)
+    logger.success(f"Built proxy and {len(clips)} highlight clips for {base_name}")
+    return index
+
+
+def main():
+    # Back-fill proxies for videos that were processed before this existed
+    names = sys.argv[1:] or sorted(
+        f.replace("_annotated.mp4", "") for f in os.listdir(OUTPUT_DIR) if f.endswith("_annotated.mp4")
+    )
+    for name in names:
+        try:
+            build_media(name)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"ffmpeg failed for {name}: {e.stderr.decode(errors='replace').strip()}")
+
+
+if __name__ == "__main__":
+    main()
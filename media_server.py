@@ -0,0 +1,146 @@
+import os
+import re
+import sys
+import argparse
+import mimetypes
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from loguru import logger
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Serves proxy renditions and highlight clips from outputs/ with HTTP Range
+# support, so the browser fetches only the bytes it is about to play.
+OUTPUT_DIR = 'outputs/'
+MEDIA_PORT = int(os.getenv("MEDIA_SERVER_PORT", "8502"))
+# Loopback only by default: there is no auth. Set MEDIA_SERVER_HOST=0.0.0.0 (or pass
+# --host) to serve other machines, e.g. when browsers do not run on the dashboard host.
+MEDIA_HOST = os.getenv("MEDIA_SERVER_HOST", "127.0.0.1")
+ALLOWED_EXTENSIONS = {".mp4", ".jpg", ".jpeg", ".png", ".webp"}
+CHUNK_SIZE = 256 * 1024
+
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    root = os.path.abspath(OUTPUT_DIR)
+
+    def log_message(self, format, *args):
+        logger.debug(f"media {self.address_string()} {format % args}")
+
+    def _resolve(self):
+        rel = unquote(urlsplit(self.path).path).lstrip("/")
+        path = os.path.abspath(os.path.join(self.root, rel))
+        # No escaping the media root, and only media files
+        if os.path.commonpath([path, self.root]) != self.root:
+            return None
+        if os.path.splitext(path)[1].lower() not in ALLOWED_EXTENSIONS or not os.path.isfile(path):
+            return None
+        return path
+
+    def _error(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        path = self._resolve()
+        if path is None:
+            self._error(404)
+            return
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+        header = self.headers.get("Range")
+        if header:
+            match = RANGE_RE.match(header.strip())
+            if not match or (not match.group(1) and not match.group(2)):
+                self._error(416)
+                return
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:  # Suffix range: the last N bytes
+                start = max(0, size - int(match.group(2)))
+            if start > end or start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Cache-Control", "public, max-age=3600")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return  # Browsers routinely abort range requests while seeking
+                remaining -= len(chunk)
+
+
+class MediaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        logger.debug(f"media connection from {client_address} closed: {sys.exc_info()[1]}")
+
+
+def start_media_server(root=OUTPUT_DIR, host=MEDIA_HOST, port=MEDIA_PORT):
+    """Serve *root* on a background thread. Returns the server."""
+    handler = type("BoundMediaHandler", (MediaHandler,), {"root": os.path.abspath(root)})
+    server = MediaServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Media server for {root} listening on port {server.server_address[1]}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve dashboard media with HTTP Range support.")
+    parser.add_argument("--root", default=OUTPUT_DIR)
+    parser.add_argument("--host", default=MEDIA_HOST, help="0.0.0.0 to serve all interfaces (no auth)")
+    parser.add_argument("--port", type=int, default=MEDIA_PORT)
+    args = parser.parse_args()
+
+    handler = type("BoundMediaHandler", (MediaHandler,), {"root": os.path.abspath(args.root)})
+    server = MediaServer((args.host, args.port), handler)
+    logger.info(f"Serving {args.root} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+# ---------------------------------------------------------
+# DEFAULT BEHAVIOUR
+# ---------------------------------------------------------
+# A local stand-in for the Ollama /api/generate endpoint so the agent can be
+# benchmarked and tested without the SSH tunnel to the GPU box.
+DEFAULT_CONFIG = {
+    "latency_s": 1.0,          # Base time to "think" before answering
+    "jitter_s": 0.2,           # Uniform +/- jitter added to the base latency
+    "per_image_latency_s": 0.0,  # Extra latency per attached image (vision cost)
+    "max_concurrency": 1,      # Requests served at once (like a single GPU)
+    "max_queue": 16,           # Requests allowed to wait; beyond this → 503
+    "tokens_per_s": 50.0,      # Streaming pace once generation starts
+    "error_rate": 0.0,         # Fraction of requests answered with HTTP 500
+    "hang_rate": 0.0,          # Fraction of requests that stall for `hang_s`
+    "hang_s": 30.0,
+    "malformed_rate": 0.0,     # Fraction of 200 responses that are not JSON
+    "seed": None,
+}
+
+CANNED_RESPONSE = {
+    "primary_trade": "Mason",
+    "specific_tasks": "Laying bricks, spreading mortar",
+    "quantified_output": "12 bricks laid, 1 course levelled",
+    "universal_efficiency_score": 82,
+    "performance_summary": "The worker keeps a steady pace with consistent technique. Little idle time was observed between courses.",
+}
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, MockOllamaHandler)
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.rng = random.Random(self.config["seed"])
+        self.rng_lock = threading.Lock()
+        self.slots = threading.Semaphore(self.config["max_concurrency"])
+        self.waiting = 0
+        self.waiting_lock = threading.Lock()
+        self.stats = {"requests": 0, "served": 0, "errors": 0, "rejected": 0, "hung": 0, "malformed": 0}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request, client_address):
+        # Clients that hang up mid-stream are expected under load; don't dump tracebacks
+        logger.debug(f"mock-ollama connection from {client_address} closed: {sys.exc_info()[1]}")
+
+    def count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def roll(self, key):
+        with self.rng_lock:
+            return self.rng.random() < self.config[key]
+
+    def generation_time(self, num_images):
+        cfg = self.config
+        with self.rng_lock:
+            jitter = self.rng.uniform(-cfg["jitter_s"], cfg["jitter_s"])
+        return max(0.0, cfg["latency_s"] + jitter + cfg["per_image_latency_s"] * num_images)
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    server: MockOllamaServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"mock-ollama {self.address_string()} {format % args}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "llava:latest"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+
+        srv = self.server
+        srv.count("requests")
+
+        # Throughput limit: a bounded queue in front of `max_concurrency` slots
+        with srv.waiting_lock:
+            if srv.waiting >= srv.config["max_queue"]:
+                srv.count("rejected")
+                self._send_json(503, {"error": "server busy"})
+                return
+            srv.waiting += 1
+        srv.slots.acquire()
+        with srv.waiting_lock:
+            srv.waiting -= 1
+
+        try:
+            self._generate(payload)
+        finally:
+            srv.slots.release()
+
+    def _generate(self, payload):
+        srv = self.server
+
+        if srv.roll("hang_rate"):
+            srv.count("hung")
+            time.sleep(srv.config["hang_s"])
+
+        time.sleep(srv.generation_time(len(payload.get("images") or [])))
+
+        if srv.roll("error_rate"):
+            srv.count("errors")
+            self._send_json(500, {"error": "injected failure"})
+            return
+
+        text = json.dumps(CANNED_RESPONSE)
+        if srv.roll("malformed_rate"):
+            srv.count("malformed")
+            text = "I could not determine the trade from these frames."
+
+        model = payload.get("model", "llava:latest")
+        if payload.get("stream", True):
+            self._stream(model, text)
+        else:
+            self._send_json(200, self._chunk(model, text, done=True))
+        srv.count("served")
+
+    def _chunk(self, model, text, done):
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": text,
+            "done": done,
+        }
+
+    def _stream(self, model, text):
+        # Ollama streams newline-delimited JSON; emulate it word by word
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        delay = 1.0 / self.server.config["tokens_per_s"] if self.server.config["tokens_per_s"] > 0 else 0.0
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            token = word if i == len(words) - 1 else word + " "
+            self._write_chunk(json.dumps(self._chunk(model, token, done=False)) + "\n")
+            time.sleep(delay)
+        self._write_chunk(json.dumps(self._chunk(model, "", done=True)) + "\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.close_connection = True
+
+    def _write_chunk(self, line):
+        data = line.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_mock_server(host="127.0.0.1", port=0, **config):
+    """Start a mock Ollama server on a background thread.
+    Returns the server; use `server.url` to reach it and `server.shutdown()` to stop it."""
+    server = MockOllamaServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(f"Mock Ollama listening on {server.url}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama /api/generate endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    for key, default in DEFAULT_CONFIG.items():
+        if key == "seed":
+            parser.add_argument("--seed", type=int, default=None)
+        else:
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=default)
+    args = vars(parser.parse_args())
+
+    host, port = args.pop("host"), args.pop("port")
+    server = MockOllamaServer((host, port), args)
+    logger.info(f"Mock Ollama listening on {server.url} with {server.config}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Stats: {server.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,465 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from loguru import logger
+import first_person_pipeline as fpp
+import yolo_engines
+import analyze_results
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# One entry point for the whole chain. Each stage declares its inputs, outputs and the
+# code it runs; a stage x video task is rerun only when its key changed. The key hashes
+# the stage's source files, its parameters, the content of its source inputs and the
+# keys of the upstream tasks, so an upstream rerun always reaches everything downstream
+# (even where a stage rewrites an upstream file in place, as the metrics passes do).
+INPUT_DIR = fpp.INPUT_DIR
+OUTPUT_DIR = fpp.OUTPUT_DIR
+MASTER_CSV = fpp.MASTER_CSV
+STATE_PATH = os.getenv("DAG_STATE", os.path.join(OUTPUT_DIR, ".dag_state.json"))
+JOBS = int(os.getenv("DAG_JOBS", str(max(1, (os.cpu_count() or 2) // 2))))
+START_METHOD = os.getenv("DAG_START_METHOD", "spawn")
+METRICS_MODE = os.getenv("DAG_METRICS_MODE", "hands")   # hands: recalculate_metrics.py, motion: apply_global_motion.py
+HASH_CHUNK = 1 << 20
+
+DATA_COLUMNS = ("frame", "objects_list", "smoothed_exertion", "is_working")
+MASTER_COLUMNS = ("Video", "Total Frames", "Working Frames", "Productivity %", "Peak Exertion (px)", "Detected Task")
+
+
+class Artifact:
+    """A typed file a stage reads or writes. *kind* decides how a written file is checked:
+    csv (header has *columns*), json (parses), anything else (exists and is non-empty)."""
+
+    def __init__(self, template, kind, columns=(), optional=False):
+        self.template = template
+        self.kind = kind
+        self.columns = columns
+        self.optional = optional
+
+    def path(self, video=None):
+        return self.template.format(video=video, input_dir=INPUT_DIR, output_dir=OUTPUT_DIR)
+
+    def check(self, path):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return f"{path} missing or empty"
+        if self.kind == "csv":
+            with open(path) as f:
+                header = f.readline().strip().split(",")
+            missing = [c for c in self.columns if c not in header]
+            return f"{path} lacks columns {missing}" if missing else None
+        if self.kind == "json":
+            try:
+                with open(path) as f:
+                    json.load(f)
+            except ValueError as e:
+                return f"{path} is not valid JSON: {e}"
+        return None
+
+
+class Stage:
+    """*per_video* stages fan out into one task per video; the others run once over all
+    videos. *deps* are stages whose results (and keys) a task needs; *after* only orders
+    the run when both stages are scheduled. *modules*, *inputs* and *outputs* may be
+    callables of the run config. *executor* is process, thread or inline."""
+
+    def __init__(self, name, run, modules, inputs=(), outputs=(), params=(), deps=(), after=(),
+                 per_video=True, executor="process"):
+        self.name = name
+        self.run = run
+        self.modules = modules
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params
+        self.deps = deps
+        self.after = after
+        self.per_video = per_video
+        self.executor = executor
+
+    def resolve(self, attr, config):
+        value = getattr(self, attr)
+        return value(config) if callable(value) else value
+
+
+def _video_path(video):
+    return os.path.join(INPUT_DIR, f"{video}.mp4")
+
+
+def _data_path(video):
+    return os.path.join(OUTPUT_DIR, f"{video}_data.csv")
+
+
+# ---------------------------------------------------------
+# STAGE BODIES (top-level so they pickle into worker processes)
+# ---------------------------------------------------------
+def run_detect(video, config, upstream):
+    # Via the environment too, so segment workers load the same engine
+    fpp.YOLO_ENGINE = os.environ["YOLO_ENGINE"] = config["engine"]
+    metrics = fpp.process_video(_video_path(video), segments=config["segments"], adaptive=config["adaptive"],
+                                reuse_detections=config["reuse_detections"], work_width=config["work_width"])
+    if metrics is None:
+        raise RuntimeError(f"Stage 1 could not open {_video_path(video)}")
+    return metrics
+
+
+def run_metrics(video, config, upstream):
+    mode = config["metrics_mode"]
+    if mode == "hands":
+        import recalculate_metrics
+        return recalculate_metrics.recalculate_video(_data_path(video), video)
+    if mode == "motion":
+        import apply_global_motion
+        return apply_global_motion.process_motion_for_video(_video_path(video), video)
+    return upstream[f"detect/{video}"]
+
+
+def run_agent(video, config, upstream):
+    import agent_video_analyzer
+    ai_data = agent_video_analyzer.analyze_video(_video_path(video), cv_metrics=upstream[f"metrics/{video}"],
+                                                 update_master=False)
+    if ai_data is None:
+        raise RuntimeError(f"No AI analysis for {video}")
+    return agent_video_analyzer.master_columns(ai_data)
+
+
+def run_master(videos, config, upstream):
+    """The only writer of the master CSV: Stage 1 row, refined by the metrics pass, plus
+    the AI columns of whatever agent analyses exist."""
+    import agent_video_analyzer
+    rows = []
+    for video in videos:
+        row = {**upstream[f"detect/{video}"], **upstream[f"metrics/{video}"]}
+        agent_json = os.path.join(OUTPUT_DIR, f"Agent_Analysis_{video}.json")
+        if os.path.exists(agent_json):
+            with open(agent_json) as f:
+                row.update(agent_video_analyzer.master_columns(json.load(f)))
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    df = df[[c for c in MASTER_COLUMNS if c in df] + [c for c in df if c not in MASTER_COLUMNS]]
+    tmp = MASTER_CSV + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, MASTER_CSV)
+    return {"videos": len(df)}
+
+
+def run_report(videos, config, upstream):
+    generate_fn = (analyze_results.ollama_generate_fn() if config["report_backend"] == "ollama"
+                   else analyze_results.gemini_generate_fn())
+    if analyze_results.generate_site_report(pd.read_csv(MASTER_CSV), generate_fn=generate_fn,
+                                            token_budget=config["token_budget"]) is None:
+        raise RuntimeError("Site report generation failed")
+    return {"report": analyze_results.REPORT_OUTPUT}
+
+
+# ---------------------------------------------------------
+# THE DAG
+# ---------------------------------------------------------
+STAGE1_MODULES = ("first_person_pipeline", "frame_prep", "detection_reuse", "adaptive_sampler", "yolo_engines",
+                  "frame_records", "timeline_pyramid", "media_proxies", "contact_sheet", "work_bouts",
+                  "landmark_store", "event_index")
+METRICS_MODULES = {"hands": ("recalculate_metrics", "adaptive_sampler", "timeline_pyramid", "event_index"),
+                   "motion": ("apply_global_motion", "adaptive_sampler", "timeline_pyramid", "event_index"),
+                   "none": ()}
+AGENT_MODULES = ("agent_video_analyzer", "work_bouts", "event_index")
+
+STAGES = [
+    Stage("detect", run_detect, STAGE1_MODULES,
+          inputs=[Artifact("{input_dir}{video}.mp4", "video"),
+                  Artifact(fpp.YOLO_WEIGHTS, "model"), Artifact(fpp.HAND_MODEL_PATH, "model")],
+          outputs=[Artifact("{output_dir}{video}_data.csv", "csv", DATA_COLUMNS),
+                   Artifact("{output_dir}{video}_annotated.mp4", "video"),
+                   Artifact("{output_dir}{video}_plot.png", "image"),
+                   Artifact("{output_dir}{video}_events.npz", "index")],
+          # Segments only change how the work is split, not the result. The metrics pass
+          # rewrites this stage's outputs in place, so a new metrics mode must start again
+          # from a fresh Stage 1 rather than from the previous mode's rewrite
+          params=("engine", "adaptive", "reuse_detections", "work_width", "metrics_mode")),
+    Stage("metrics", run_metrics, lambda c: METRICS_MODULES[c["metrics_mode"]], deps=("detect",),
+          inputs=lambda c: [Artifact("{input_dir}{video}.mp4", "video")] if c["metrics_mode"] == "motion" else [],
+          outputs=lambda c: [] if c["metrics_mode"] == "none" else
+                            [Artifact("{output_dir}{video}_data.csv", "csv", DATA_COLUMNS),
+                             Artifact("{output_dir}{video}_plot.png", "image"),
+                             Artifact("{output_dir}{video}_events.npz", "index")],
+          params=("metrics_mode",)),
+    Stage("agent", run_agent, AGENT_MODULES, deps=("metrics",), executor="thread",
+          inputs=[Artifact("{input_dir}{video}.mp4", "video")],
+          outputs=[Artifact("{output_dir}Agent_Analysis_{video}.json", "json")]),
+    Stage("master", run_master, ("pipeline_dag", "agent_video_analyzer"), deps=("detect", "metrics"), after=("agent",),
+          per_video=False, executor="inline",
+          # The agent analyses are read as files: the master table stays buildable without Stage 2
+          inputs=[Artifact("{output_dir}Agent_Analysis_{video}.json", "json", optional=True)],
+          outputs=[Artifact(MASTER_CSV, "csv", MASTER_COLUMNS)]),
+    Stage("report", run_report, ("analyze_results", "report_context"), deps=("master",), per_video=False,
+          executor="inline", outputs=[Artifact("{output_dir}Final_AI_Site_Report.txt", "text")],
+          params=("report_backend", "token_budget")),
+]
+STAGES_BY_NAME = {s.name: s for s in STAGES}
+
+
+# ---------------------------------------------------------
+# FINGERPRINTS
+# ---------------------------------------------------------
+def load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"hashes": {}, "runs": {}}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+    os.replace(tmp, path)
+
+
+def file_hash(path, state):
+    """sha256 of *path*, recomputed only when its size or mtime changed since last time."""
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    cached = state["hashes"].get(os.path.abspath(path))
+    if cached and cached[:2] == [st.st_size, st.st_mtime_ns]:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    state["hashes"][os.path.abspath(path)] = [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def code_hash(modules, state):
+    # Located without importing, so a dry run stays cheap
+    files = sorted(importlib.util.find_spec(m).origin for m in modules)
+    return hashlib.sha256("".join(file_hash(p, state) for p in files).encode()).hexdigest()[:16]
+
+
+def _task_videos(stage, video, videos):
+    return [video] if stage.per_video else videos
+
+
+def plan(targets, videos, config, state, force=(), subset=False):
+    """Every task the targets need, in dependency order, with its key and why it has to
+    run (None = up to date). Nothing is executed. With *subset* (only some videos
+    selected) the stages over all videos are left out."""
+    needed = []
+    def visit(name):
+        for dep in STAGES_BY_NAME[name].deps:
+            visit(dep)
+        if name not in needed:
+            needed.append(name)
+    for target in targets:
+        visit(target)
+    if subset:
+        # A stage over all videos must not be rebuilt from a selection of them
+        skipped = [n for n in needed if not STAGES_BY_NAME[n].per_video]
+        if skipped:
+            logger.warning(f"Not running {', '.join(skipped)}: only some videos were selected")
+        needed = [n for n in needed if STAGES_BY_NAME[n].per_video]
+
+    tasks, keys, stale = [], {}, set()
+    for name in needed:
+        stage = STAGES_BY_NAME[name]
+        code = code_hash(stage.resolve("modules", config), state)
+        params = {k: config[k] for k in stage.params}
+        for video in (videos if stage.per_video else [None]):
+            task_id = f"{name}/{video}" if stage.per_video else name
+            inputs = {}
+            for artifact in stage.resolve("inputs", config):
+                for v in _task_videos(stage, video, videos):
+                    path = artifact.path(v)
+                    inputs[path] = file_hash(path, state)
+            missing = [p for a in stage.resolve("inputs", config) if not a.optional
+                       for p in {a.path(v) for v in _task_videos(stage, video, videos)} if inputs[p] is None]
+            deps = {}
+            for dep in stage.deps:
+                dep_stage = STAGES_BY_NAME[dep]
+                for v in (_task_videos(stage, video, videos) if dep_stage.per_video else [None]):
+                    dep_id = f"{dep}/{v}" if dep_stage.per_video else dep
+                    deps[dep_id] = keys[dep_id]
+            parts = {"code": code, "params": params, "inputs": inputs, "deps": deps}
+            key = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+            keys[task_id] = key
+
+            rerun_deps = [d for d in deps if d in stale]
+            prev = state["runs"].get(task_id)
+            outputs = [a.path(v) for a in stage.resolve("outputs", config) for v in _task_videos(stage, video, videos)]
+            if missing:
+                reason = f"blocked: missing input {missing[0]}"
+            elif name in force:
+                reason = "forced"
+            elif rerun_deps:
+                # Also when the upstream key is unchanged: its rerun rewrites files this task refined
+                reason = f"upstream {rerun_deps[0]} reruns"
+            elif prev is None:
+                reason = "never run"
+            elif prev["key"] == key and all(os.path.exists(p) for p in outputs):
+                reason = None
+            elif prev["key"] == key:
+                reason = "output missing"
+            else:
+                changed = [k for k in ("code", "params", "inputs", "deps") if prev["parts"].get(k) != parts[k]]
+                reason = f"{changed[0]} changed" if changed else "key changed"
+                if changed and changed[0] == "deps":
+                    reason = "upstream " + next(d for d in deps if prev["parts"]["deps"].get(d) != deps[d])
+            if reason is not None:
+                stale.add(task_id)
+            tasks.append({"id": task_id, "stage": name, "video": video, "key": key, "parts": parts,
+                          "deps": list(deps), "reason": reason})
+    return tasks
+
+
+# ---------------------------------------------------------
+# RUNNER
+# ---------------------------------------------------------
+def _run_task(stage_name, video, videos, config, upstream):
+    stage = STAGES_BY_NAME[stage_name]
+    started = time.perf_counter()
+    result = stage.run(video if stage.per_video else videos, config, upstream)
+    return result, time.perf_counter() - started
+
+
+def execute(tasks, videos, config, state, jobs=JOBS, state_path=STATE_PATH):
+    """Run the stale tasks, each as soon as its upstream tasks are done: per-video tasks of
+    different stages and videos overlap. A failed task blocks only what depends on it."""
+    status = {t["id"]: "done" if t["reason"] is None else "pending" for t in tasks}
+    for t in tasks:
+        if t["reason"] and t["reason"].startswith("blocked"):
+            status[t["id"]] = "failed"
+    # *after* tasks only have to be finished, successfully or not
+    ordered_after = {t["id"]: [o["id"] for o in tasks if o["stage"] in STAGES_BY_NAME[t["stage"]].after]
+                     for t in tasks}
+
+    needs_threads = any(STAGES_BY_NAME[t["stage"]].executor == "thread" and status[t["id"]] == "pending" for t in tasks)
+    thread_workers = 1
+    if needs_threads:
+        import agent_video_analyzer
+        pool = agent_video_analyzer.get_backend_pool()
+        pool.health_check()
+        thread_workers = pool.capacity
+    executors = {
+        "process": ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(START_METHOD)),
+        "thread": ThreadPoolExecutor(max_workers=thread_workers),
+        "inline": ThreadPoolExecutor(max_workers=1),   # Off the scheduler thread, one at a time
+    }
+    running = {}
+    try:
+        while any(s == "pending" for s in status.values()) or running:
+            for t in tasks:
+                if status[t["id"]] != "pending":
+                    continue
+                upstream_status = [status[d] for d in t["deps"]]
+                if any(s in ("failed", "blocked") for s in upstream_status):
+                    status[t["id"]] = "blocked"
+                    logger.warning(f"{t['id']}: skipped, an upstream task failed")
+                    continue
+                if any(s != "done" for s in upstream_status) or \
+                        any(status[a] in ("pending", "running") for a in ordered_after[t["id"]]):
+                    continue
+                stage = STAGES_BY_NAME[t["stage"]]
+                upstream = {d: state["runs"][d]["result"] for d in t["deps"]}
+                args = (t["stage"], t["video"], videos, config, upstream)
+                logger.info(f"{t['id']}: running ({t['reason']})")
+                status[t["id"]] = "running"
+                running[executors[stage.executor].submit(_run_task, *args)] = t
+            if not running:
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                t = running.pop(future)
+                stage = STAGES_BY_NAME[t["stage"]]
+                try:
+                    result, seconds = future.result()
+                    problems = [p for a in stage.resolve("outputs", config)
+                                for v in _task_videos(stage, t["video"], videos)
+                                for p in [a.check(a.path(v))] if p]
+                    if problems:
+                        raise RuntimeError("; ".join(problems))
+                except Exception as e:
+                    status[t["id"]] = "failed"
+                    logger.error(f"{t['id']}: failed: {e}")
+                    continue
+                status[t["id"]] = "done"
+                state["runs"][t["id"]] = {"key": t["key"], "parts": t["parts"], "result": result,
+                                          "seconds": round(seconds, 2), "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                save_state(state, state_path)
+                logger.success(f"{t['id']}: done in {seconds:.1f}s")
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True)
+    save_state(state, state_path)
+    return status
+
+
+def print_plan(tasks):
+    print(f"\n{'task':<52}{'status'}")
+    for t in tasks:
+        print(f"{t['id']:<52}{'up to date' if t['reason'] is None else 'RUN: ' + t['reason']}")
+    stale = sum(t["reason"] is not None for t in tasks)
+    print(f"\n{stale}/{len(tasks)} tasks would run")
+
+
+def discover_videos(selected=None):
+    videos = sorted(os.path.splitext(f)[0] for f in os.listdir(INPUT_DIR) if f.endswith(".mp4")) \
+        if os.path.isdir(INPUT_DIR) else []
+    return [v for v in videos if not selected or v in selected]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline as a DAG: only stale stage x video tasks, in parallel.")
+    parser.add_argument("targets", nargs="*", default=["master"],
+                        help=f"Stages to bring up to date, with everything they depend on: {', '.join(STAGES_BY_NAME)} (default: master)")
+    parser.add_argument("--videos", nargs="+", help="Only these videos (base names)")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would run and why, then exit")
+    parser.add_argument("--force", nargs="+", default=[], choices=list(STAGES_BY_NAME), help="Rerun these stages regardless")
+    parser.add_argument("--jobs", type=int, default=JOBS, help="Worker processes for per-video stages")
+    parser.add_argument("--state", default=STATE_PATH)
+    parser.add_argument("--metrics-mode", choices=list(METRICS_MODULES), default=METRICS_MODE,
+                        help="hands: recalculate_metrics.py, motion: apply_global_motion.py, none: keep Stage 1's")
+    parser.add_argument("--engine", choices=list(yolo_engines.ENGINES), default=fpp.YOLO_ENGINE)
+    parser.add_argument("--adaptive", action="store_true", default=fpp.ADAPTIVE_SAMPLING)
+    parser.add_argument("--reuse-detections", action="store_true", default=fpp.DETECTION_REUSE)
+    parser.add_argument("--work-width", type=int, default=fpp.WORK_WIDTH)
+    parser.add_argument("--segments", type=int, default=1, help="Stage 1 segments per video (inside each task)")
+    parser.add_argument("--report-backend", choices=["gemini", "ollama"], default="gemini")
+    parser.add_argument("--token-budget", type=int, default=analyze_results.TOKEN_BUDGET)
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in STAGES_BY_NAME]
+    if unknown:
+        parser.error(f"unknown stage(s) {unknown}; choose from {', '.join(STAGES_BY_NAME)}")
+
+    videos = discover_videos(args.videos)
+    if not videos:
+        logger.error(f"No .mp4 files found in {INPUT_DIR}")
+        return 1
+    config = {"engine": args.engine, "adaptive": args.adaptive, "reuse_detections": args.reuse_detections,
+              "work_width": args.work_width, "segments": args.segments, "metrics_mode": args.metrics_mode,
+              "report_backend": args.report_backend, "token_budget": args.token_budget}
+
+    state = load_state(args.state)
+    tasks = plan(args.targets, videos, config, state, force=set(args.force), subset=bool(args.videos))
+    save_state(state, args.state)   # Keep the input hashes computed while planning
+    print_plan(tasks)
+    if args.dry_run:
+        return 0
+    status = execute(tasks, videos, config, state, jobs=args.jobs, state_path=args.state)
+    failed = [t for t, s in status.items() if s in ("failed", "blocked")]
+    if failed:
+        logger.error(f"{len(failed)} task(s) failed or were blocked: {', '.join(failed)}")
+        return 1
+    logger.success(f"Up to date: {', '.join(args.targets)} for {len(videos)} videos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
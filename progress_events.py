@@ -0,0 +1,131 @@
+import os
+import json
+import time
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Running pipelines append one JSON line per progress event; the dashboard tails
+# the file from its last read offset instead of re-reading results.
+EVENT_LOG = 'outputs/pipeline_events.jsonl'
+PROGRESS_INTERVAL_S = 1.0     # Throttle for "progress" events per video
+TAIL_START_BYTES = 256 * 1024  # A new reader starts this far from the end, not at byte 0
+
+
+def append_event(event: dict, path=EVENT_LOG):
+    line = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+    # O_APPEND + one write per line keeps lines whole with several writers
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+class ProgressReporter:
+    """Emits start / progress / finished / failed events for one video."""
+
+    def __init__(self, video, total_frames, source_fps, path=EVENT_LOG, interval_s=PROGRESS_INTERVAL_S):
+        self.video = video
+        self.total_frames = int(total_frames or 0)
+        self.source_fps = source_fps
+        self.path = path
+        self.interval_s = interval_s
+        self.started = time.time()
+        self.last_emit = 0.0
+
+    def _emit(self, event, **fields):
+        append_event({"ts": round(time.time(), 3), "video": self.video, "event": event, **fields}, self.path)
+
+    def start(self):
+        self.started = time.time()
+        self._emit("start", total_frames=self.total_frames, source_fps=self.source_fps)
+
+    def update(self, frames_done, sampled_frames, working_frames, force=False, **extra):
+        """*frames_done* counts decoded source frames; *working_frames* is the running
+        count of sampled frames that look like active work. *extra* fields (e.g. live
+        lag) are passed through into the event."""
+        now = time.time()
+        if not force and now - self.last_emit < self.interval_s:
+            return
+        self.last_emit = now
+        elapsed = max(now - self.started, 1e-6)
+        rate = frames_done / elapsed
+        remaining = max(self.total_frames - frames_done, 0)
+        self._emit(
+            "progress",
+            frames_done=frames_done,
+            total_frames=self.total_frames,
+            sampled_frames=sampled_frames,
+            fps=round(rate, 1),
+            productivity=round(100.0 * working_frames / sampled_frames, 1) if sampled_frames else 0.0,
+            eta_s=round(remaining / rate, 1) if rate > 0 and self.total_frames else None,
+            **extra,
+        )
+
+    def finish(self, metrics=None):
+        self._emit("finished", elapsed_s=round(time.time() - self.started, 1),
+                   metrics={k: (v.item() if hasattr(v, "item") else v) for k, v in (metrics or {}).items()})
+
+    def fail(self, error):
+        self._emit("failed", error=str(error))
+
+
+class EventTailer:
+    """Incremental reader: each poll() returns only events appended since the last one."""
+
+    def __init__(self, path=EVENT_LOG, start_bytes=TAIL_START_BYTES):
+        self.path = path
+        self.offset = None
+        self.start_bytes = start_bytes
+        self.latest = {}   # video -> most recent event
+
+    def poll(self) -> list[dict]:
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return []
+        if self.offset is None or size < self.offset:
+            # First read (or the log was rotated): start near the end
+            self.offset = max(0, size - self.start_bytes)
+            skip_partial = self.offset > 0
+        else:
+            skip_partial = False
+        if size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+
+        if skip_partial:
+            newline = chunk.find(b"\n")
+            if newline == -1:
+                return []
+            self.offset += newline + 1
+            chunk = chunk[newline + 1:]
+        # Leave a trailing half-written line for the next poll
+        complete = chunk[: chunk.rfind(b"\n") + 1]
+        self.offset += len(complete)
+
+        events = []
+        for line in complete.splitlines():
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            events.append(event)
+            self.latest[event.get("video")] = event
+        return events
+
+    def active(self, stale_after_s=600) -> list[dict]:
+        """Latest event of every video still running (not finished/failed, heard from recently)."""
+        now = time.time()
+        return [
+            e for e in self.latest.values()
+            if e.get("event") in ("start", "progress") and now - e.get("ts", 0) < stale_after_s
+        ]
+
+    def recent_finished(self, limit=5) -> list[dict]:
+        done = [e for e in self.latest.values() if e.get("event") in ("finished", "failed")]
+        return sorted(done, key=lambda e: e.get("ts", 0), reverse=True)[:limit]
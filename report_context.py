@@ -0,0 +1,235 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from loguru import logger
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Instead of pasting df.to_string() of the whole master table into the prompt,
+# we precompute aggregates and fit them to a token budget so the prompt stays
+# the same size whether the site has 14 videos or 1,400.
+DEFAULT_TOKEN_BUDGET = 6000
+TRADE_SECTION_BUDGET = 800   # Tokens of context per trade sent to the per-trade call
+TOP_K = 5
+MAX_TRADES = 8               # Trades that get their own summary call; the rest are merged
+OTHER_TRADE = "Other"
+OUTLIER_Z = 2.0
+SUMMARY_CHARS = 160          # Long AI_Summary/AI_Tasks text is truncated to this
+CHARS_PER_TOKEN = 4          # Rough heuristic, good enough for budgeting
+
+METRIC_COLUMNS = ["Productivity %", "Peak Exertion (px)", "AI_UES"]
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate(text, limit=SUMMARY_CHARS) -> str:
+    text = "" if pd.isna(text) else str(text).strip()
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalise the master table: numeric metrics and a Trade column that is never empty."""
+    df = df.copy()
+    for col in METRIC_COLUMNS:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    if "AI_UES" not in df:
+        df["AI_UES"] = float("nan")
+    trade = df["AI_Trade"] if "AI_Trade" in df else pd.Series(index=df.index, dtype=object)
+    df["Trade"] = trade.fillna("Unclassified").astype(str).str.strip().replace("", "Unclassified")
+    return df
+
+
+def group_trades(df: pd.DataFrame, max_trades: int = MAX_TRADES) -> pd.DataFrame:
+    """Keep the *max_trades* trades with the most videos and relabel every other row as OTHER_TRADE."""
+    counts = df["Trade"].value_counts()
+    if len(counts) <= max_trades:
+        return df
+    top = counts.index[:max_trades]
+    df = df.copy()
+    df.loc[~df["Trade"].isin(top), "Trade"] = OTHER_TRADE
+    return df
+
+
+# ---------------------------------------------------------
+# SECTION BUILDERS
+# ---------------------------------------------------------
+def site_aggregates(df: pd.DataFrame) -> str:
+    peak_idx = df["Peak Exertion (px)"].idxmax()
+    common_tasks = df["Detected Task"].value_counts().head(TOP_K)
+    lines = [
+        "Site-Wide Aggregates:",
+        f"- Videos analyzed: {len(df)}",
+        f"- Average Site Productivity: {df['Productivity %'].mean():.1f}% (median {df['Productivity %'].median():.1f}%)",
+        f"- Highest Peak Exertion: {df.loc[peak_idx, 'Peak Exertion (px)']:.2f} pixels/frame (Observed in video: {df.loc[peak_idx, 'Video']})",
+        f"- Average AI Efficiency (UES): {df['AI_UES'].mean():.1f}/100",
+        "- Most common tasks detected: " + ", ".join(f"{task} ({n})" for task, n in common_tasks.items()),
+    ]
+    return "\n".join(lines)
+
+
+def _other_label(df: pd.DataFrame, k: int) -> str:
+    return f"{OTHER_TRADE} ({df['Trade'].nunique() - k} trades)"
+
+
+def trade_rollups(df: pd.DataFrame, k: int | None = None) -> str:
+    """Per-trade metrics table; with *k*, the k largest trades plus one row for the rest."""
+    other = None
+    if k is not None and df["Trade"].nunique() > k:
+        other = _other_label(df, k)
+        df = group_trades(df, k).replace({"Trade": {OTHER_TRADE: other}})
+    grouped = df.groupby("Trade").agg(
+        videos=("Video", "count"),
+        avg_productivity=("Productivity %", "mean"),
+        min_productivity=("Productivity %", "min"),
+        max_peak_exertion=("Peak Exertion (px)", "max"),
+        avg_ues=("AI_UES", "mean"),
+    ).sort_values("videos", ascending=False)
+    if other is not None:
+        grouped = pd.concat([grouped.drop(index=other), grouped.loc[[other]]])
+    return "Per-Trade Rollups:\n" + grouped.round(1).to_string()
+
+
+def trade_counts(df: pd.DataFrame, k: int) -> str:
+    """Smallest rollup: video count of the k largest trades, then the rest as one figure."""
+    counts = df["Trade"].value_counts()
+    parts = [f"{trade} ({n})" for trade, n in counts.head(k).items()]
+    if len(counts) > k:
+        parts.append(f"{_other_label(df, k)}: {counts.iloc[k:].sum()} videos")
+    return "Videos per Trade: " + ", ".join(parts)
+
+
+def ranked_workers(df: pd.DataFrame, k: int) -> str:
+    columns = ["Video", "Trade", "Detected Task", "Productivity %", "Peak Exertion (px)", "AI_UES"]
+    ranked = df.sort_values("Productivity %", ascending=False)[columns].round(1)
+    top = ranked.head(k).to_string(index=False)
+    bottom = ranked.tail(k).iloc[::-1].to_string(index=False)
+    return f"Top {k} Workers by Productivity:\n{top}\n\nBottom {k} Workers by Productivity:\n{bottom}"
+
+
+def outliers(df: pd.DataFrame, z=OUTLIER_Z) -> str:
+    lines = []
+    for col in ["Productivity %", "Peak Exertion (px)"]:
+        std = df[col].std()
+        if not std or pd.isna(std):
+            continue
+        scores = (df[col] - df[col].mean()) / std
+        for idx in scores[scores.abs() >= z].sort_values(key=abs, ascending=False).index:
+            lines.append(f"- {df.loc[idx, 'Video']}: {col} = {df.loc[idx, col]:.1f} (z = {scores[idx]:+.1f})")
+    if not lines:
+        return f"Outliers (|z| >= {z}): none"
+    return f"Outliers (|z| >= {z}):\n" + "\n".join(lines)
+
+
+def worker_notes(df: pd.DataFrame, limit: int) -> str:
+    # Short AI notes for the most extreme workers only, truncated
+    ranked = df.sort_values("Productivity %", ascending=False)
+    picks = pd.concat([ranked.head(limit), ranked.tail(limit)]).drop_duplicates("Video")
+    lines = [
+        f"- {row['Video']} ({row['Trade']}): {truncate(row.get('AI_Summary'))} Tasks: {truncate(row.get('AI_Tasks'), 80)}"
+        for _, row in picks.iterrows()
+    ]
+    return "AI Agent Notes (extremes only):\n" + "\n".join(lines)
+
+
+# ---------------------------------------------------------
+# BUDGET FITTING
+# ---------------------------------------------------------
+def fit_sections(builders, token_budget: int) -> list[str]:
+    """Add sections in priority order. Each builder is a list of variants from
+    most to least detailed; the most detailed variant that still fits is used,
+    and a section is dropped entirely if even its smallest variant does not fit."""
+    sections, used = [], 0
+    for name, variants in builders:
+        for build in variants:
+            text = build()
+            cost = estimate_tokens(text)
+            if used + cost <= token_budget:
+                sections.append(text)
+                used += cost
+                break
+        else:
+            logger.warning(f"Dropped report section '{name}' to stay within {token_budget} tokens.")
+    logger.info(f"Report context uses ~{used}/{token_budget} tokens across {len(sections)} sections.")
+    return sections
+
+
+def build_report_context(df: pd.DataFrame, token_budget: int = DEFAULT_TOKEN_BUDGET, top_k: int = TOP_K) -> str:
+    df = prepare_frame(df)
+    k_options = sorted({top_k, max(1, top_k // 2), 1}, reverse=True)
+    builders = [
+        ("aggregates", [lambda: site_aggregates(df)]),
+        ("trade rollups", [lambda: trade_rollups(df)]
+                          + [lambda k=k: trade_rollups(df, k) for k in (2 * top_k, top_k)]
+                          + [lambda k=k: trade_counts(df, k) for k in (2 * top_k, top_k)]),
+        ("ranked workers", [lambda k=k: ranked_workers(df, k) for k in k_options]),
+        ("outliers", [lambda: outliers(df)]),
+        ("worker notes", [lambda k=k: worker_notes(df, k) for k in k_options]),
+    ]
+    return "\n\n".join(fit_sections(builders, token_budget))
+
+
+def build_trade_context(trade_df: pd.DataFrame, trade: str, token_budget: int = TRADE_SECTION_BUDGET) -> str:
+    k_options = sorted({TOP_K, 2, 1}, reverse=True)
+    builders = [
+        ("trade aggregates", [lambda: (
+            f"Trade: {trade}\n"
+            f"- Videos: {len(trade_df)}\n"
+            f"- Average Productivity: {trade_df['Productivity %'].mean():.1f}%\n"
+            f"- Highest Peak Exertion: {trade_df['Peak Exertion (px)'].max():.2f} px\n"
+            f"- Average UES: {trade_df['AI_UES'].mean():.1f}/100"
+        )]),
+        ("trade ranking", [lambda k=k: ranked_workers(trade_df, k) for k in k_options]),
+        ("trade notes", [lambda k=k: worker_notes(trade_df, k) for k in k_options]),
+    ]
+    return "\n\n".join(fit_sections(builders, token_budget))
+
+
+# ---------------------------------------------------------
+# PARALLEL PER-TRADE SUMMARIES
+# ---------------------------------------------------------
+TRADE_PROMPT = """You are an AI Site Supervisor. Summarize the following data for one trade on a construction site
+in at most 3 sentences: overall productivity, the standout worker, and any ergonomic concern.
+
+{context}
+"""
+
+
+def summarize_trades(df: pd.DataFrame, generate_fn, max_workers: int = 4, max_trades: int = MAX_TRADES,
+                     token_budget: int = TRADE_SECTION_BUDGET) -> dict[str, str]:
+    """Run one small LLM call per trade concurrently. *generate_fn* takes a prompt and returns text.
+    Only the *max_trades* largest trades get their own call; the rest share one "Other" call,
+    so there are at most max_trades + 1 calls however many trades the archive has."""
+    df = group_trades(prepare_frame(df), max_trades)
+    trades = df["Trade"].value_counts().index.tolist()
+
+    def summarize(trade):
+        context = build_trade_context(df[df["Trade"] == trade], trade, token_budget)
+        try:
+            return trade, generate_fn(TRADE_PROMPT.format(context=context)).strip()
+        except Exception as e:
+            logger.error(f"Trade summary failed for {trade}: {e}")
+            return trade, ""
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(summarize, trades))
+
+
+def merge_trade_summaries(summaries: dict[str, str], token_budget: int) -> str:
+    lines, used = ["Per-Trade Supervisor Notes:"], 0
+    for trade, text in summaries.items():
+        if not text:
+            continue
+        entry = f"- {trade}: {text}"
+        cost = estimate_tokens(entry)
+        if used + cost > token_budget:
+            entry = f"- {trade}: {truncate(text, max(0, (token_budget - used) * CHARS_PER_TOKEN - len(trade) - 4))}"
+            cost = estimate_tokens(entry)
+            if used + cost > token_budget:
+                break
+        lines.append(entry)
+        used += cost
+    return "\n".join(lines) if len(lines) > 1 else ""
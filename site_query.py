@@ -0,0 +1,335 @@
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import urllib.parse
+import numpy as np
+import pandas as pd
+from loguru import logger
+import work_bouts
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Cross-video queries over every video's per-frame and per-bout data. `sync()` mirrors
+# outputs/*_data.csv into hive-partitioned Parquet (trade=/date=/video=), and DuckDB
+# queries it in place: filters on trade/date/video skip whole files, filters on
+# frame/second skip row groups, and only the columns a query uses are read.
+OUTPUT_DIR = 'outputs/'
+MASTER_CSV = 'master_dashboard.csv'
+WAREHOUSE_DIR = os.path.join(OUTPUT_DIR, 'warehouse')
+PROCESS_FPS = 5
+UNCLASSIFIED = "Unclassified"      # Same fallback as the dashboard for videos without an AI_Trade
+
+# Per-frame columns kept in the warehouse (whichever of them a _data.csv has)
+FRAME_COLUMNS = {
+    "lw_x": "DOUBLE", "lw_y": "DOUBLE", "rw_x": "DOUBLE", "rw_y": "DOUBLE",
+    "objects_detected": "SMALLINT", "smoothed_exertion": "DOUBLE",
+    "is_moving": "BOOLEAN", "is_working": "BOOLEAN",
+}
+GROUP_COLUMNS = ("trade", "date", "video", "hour")
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        logger.error("site_query needs DuckDB: pip install duckdb")
+        sys.exit(1)
+    return duckdb
+
+
+def _quote(value):
+    return urllib.parse.quote(str(value), safe="")
+
+
+def _partition(kind, trade, date, video, warehouse):
+    return os.path.join(warehouse, kind, f"trade={_quote(trade)}", f"date={date}", f"video={_quote(video)}")
+
+
+def _sql_str(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# ---------------------------------------------------------
+# SYNC: _data.csv -> PARQUET
+# ---------------------------------------------------------
+def _video_meta(master_csv):
+    """video -> (trade, date) from the master table, where it has them."""
+    if not os.path.exists(master_csv):
+        return {}
+    cols = lambda c: c in ("Video", "AI_Trade", "Date")
+    df = pd.read_csv(master_csv, usecols=cols)
+    trades = df["AI_Trade"] if "AI_Trade" in df else pd.Series(pd.NA, index=df.index)
+    dates = pd.to_datetime(df["Date"], errors="coerce") if "Date" in df else pd.Series(pd.NaT, index=df.index)
+    return {v: (t if isinstance(t, str) and t.strip() else None, None if pd.isna(d) else d.date().isoformat())
+            for v, t, d in zip(df["Video"], trades, dates)}
+
+
+def _manifest_path(warehouse):
+    return os.path.join(warehouse, "_manifest.json")
+
+
+def _load_manifest(warehouse):
+    try:
+        with open(_manifest_path(warehouse)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_manifest(manifest, warehouse):
+    tmp = _manifest_path(warehouse) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, _manifest_path(warehouse))
+
+
+def _drop_partitions(entry, video, warehouse):
+    for kind in ("frames", "bouts"):
+        shutil.rmtree(_partition(kind, entry["trade"], entry["date"], video, warehouse), ignore_errors=True)
+
+
+def _write_frames(con, csv_path, out_dir, fps):
+    with open(csv_path) as f:
+        header = f.readline().strip().split(",")
+    weight = "CAST(weight AS SMALLINT)" if "weight" in header else "CAST(1 AS SMALLINT)"
+    select = [
+        "CAST(frame AS INTEGER) AS frame",
+        f"(frame - 1) / {fps}.0 AS second",
+        f"CAST(floor((frame - 1) / {fps}.0 / 3600) AS SMALLINT) AS hour",   # Hour into the recording
+        f"{weight} AS weight",
+        "coalesce(CAST(objects_list AS VARCHAR), '') AS objects_list",
+    ]
+    select += [f"CAST({c} AS {t}) AS {c}" for c, t in FRAME_COLUMNS.items() if c in header]
+    os.makedirs(out_dir, exist_ok=True)
+    con.execute(f"""
+        COPY (SELECT {', '.join(select)} FROM read_csv({_sql_str(csv_path)}, header = true, all_varchar = false)
+              ORDER BY frame)
+        TO {_sql_str(os.path.join(out_dir, 'part-0.parquet'))} (FORMAT PARQUET, COMPRESSION ZSTD)
+    """)
+
+
+def _write_bouts(con, frames_dir, out_dir, fps):
+    cols = con.execute(f"""
+        SELECT frame, weight, is_working, objects_list
+        FROM read_parquet({_sql_str(os.path.join(frames_dir, 'part-0.parquet'))}) ORDER BY frame
+    """).fetchnumpy()
+    if not len(cols["frame"]) or "is_working" not in cols:
+        return 0
+    bouts = work_bouts.bouts_to_seconds(work_bouts.find_bouts(cols["is_working"]), fps, cols["frame"], cols["weight"])
+    labels = cols["objects_list"]
+    weights = np.asarray(cols["weight"], dtype=np.int64)
+    for i, b in enumerate(bouts):
+        seen = {name for label in labels[b["start"]:b["end"]] if label for name in label.split(", ")}
+        b.update(bout=i, duration_s=b["end_s"] - b["start_s"], rows=b["end"] - b["start"],
+                 frames=int(weights[b["start"]:b["end"]].sum()), objects=sorted(seen))
+    df = pd.DataFrame(bouts).drop(columns=["start", "end"])
+    os.makedirs(out_dir, exist_ok=True)
+    con.register("bouts_df", df)
+    con.execute(f"COPY (SELECT * FROM bouts_df ORDER BY bout) TO {_sql_str(os.path.join(out_dir, 'part-0.parquet'))} "
+                "(FORMAT PARQUET, COMPRESSION ZSTD)")
+    con.unregister("bouts_df")
+    return len(df)
+
+
+def sync(output_dir=OUTPUT_DIR, warehouse=WAREHOUSE_DIR, master_csv=MASTER_CSV, fps=PROCESS_FPS):
+    """Bring the warehouse up to date with outputs/*_data.csv. Only videos whose CSV,
+    trade or date changed since the last sync are rewritten; removed videos are dropped.
+    Returns {"updated": n, "removed": n, "videos": n}."""
+    duckdb = _duckdb()
+    os.makedirs(warehouse, exist_ok=True)
+    manifest = _load_manifest(warehouse)
+    meta = _video_meta(master_csv)
+    con = duckdb.connect()
+    updated = 0
+    present = set()
+    for csv_path in sorted(glob.glob(os.path.join(output_dir, "*_data.csv"))):
+        video = os.path.basename(csv_path)[:-len("_data.csv")]
+        present.add(video)
+        st = os.stat(csv_path)
+        trade, date = meta.get(video, (None, None))
+        entry = {
+            "version": [st.st_mtime_ns, st.st_size],
+            "trade": trade or UNCLASSIFIED,
+            # Videos without a Date in the master table: when their data was written (as in the dashboard)
+            "date": date or pd.Timestamp(st.st_mtime_ns, unit="ns").date().isoformat(),
+        }
+        if {k: manifest.get(video, {}).get(k) for k in entry} == entry:
+            continue
+        if video in manifest:
+            _drop_partitions(manifest[video], video, warehouse)
+        frames_dir = _partition("frames", entry["trade"], entry["date"], video, warehouse)
+        _write_frames(con, csv_path, frames_dir, fps)
+        entry["bouts"] = _write_bouts(con, frames_dir, _partition("bouts", entry["trade"], entry["date"], video, warehouse), fps)
+        manifest[video] = entry
+        updated += 1
+        _save_manifest(manifest, warehouse)   # After each video, so an interrupted sync resumes
+
+    removed = [v for v in manifest if v not in present]
+    for video in removed:
+        _drop_partitions(manifest.pop(video), video, warehouse)
+    _save_manifest(manifest, warehouse)
+    return {"updated": updated, "removed": len(removed), "videos": len(manifest)}
+
+
+# ---------------------------------------------------------
+# QUERY API
+# ---------------------------------------------------------
+class SiteQuery:
+    """Rollups over the warehouse. Filters (trades, videos, date_from, date_to) are on
+    partition columns, so files outside them are never opened. Results are small pandas
+    frames; the per-frame data itself is scanned by DuckDB, never loaded into pandas."""
+
+    def __init__(self, warehouse=WAREHOUSE_DIR, auto_sync=True, fps=PROCESS_FPS, **sync_kwargs):
+        duckdb = _duckdb()
+        if auto_sync:
+            sync(warehouse=warehouse, fps=fps, **sync_kwargs)
+        self.fps = fps
+        self.con = duckdb.connect()
+        for kind in ("frames", "bouts"):
+            pattern = os.path.join(warehouse, kind, "*", "*", "*", "*.parquet")
+            if glob.glob(pattern):
+                self.con.execute(f"CREATE VIEW {kind} AS SELECT * FROM read_parquet({_sql_str(pattern)}, "
+                                 "hive_partitioning = true, union_by_name = true)")
+
+    def sql(self, query, params=None):
+        return self.con.execute(query, params or []).df()
+
+    def explain(self, query):
+        """DuckDB's profile of *query*: shows the files and row groups actually scanned."""
+        return self.con.execute(f"EXPLAIN ANALYZE {query}").fetchall()[0][1]
+
+    @staticmethod
+    def _where(trades=None, videos=None, date_from=None, date_to=None, extra=()):
+        # Literals rather than parameters, so DuckDB can prune partitions at plan time
+        clauses = list(extra)
+        if trades:
+            clauses.append(f"trade IN ({', '.join(_sql_str(t) for t in trades)})")
+        if videos:
+            clauses.append(f"video IN ({', '.join(_sql_str(v) for v in videos)})")
+        if date_from:
+            clauses.append(f"date >= DATE {_sql_str(pd.Timestamp(date_from).date())}")
+        if date_to:
+            clauses.append(f"date <= DATE {_sql_str(pd.Timestamp(date_to).date())}")
+        return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    @staticmethod
+    def _group(by, allowed=GROUP_COLUMNS):
+        by = [by] if isinstance(by, str) else list(by)
+        bad = [c for c in by if c not in allowed]
+        if bad:
+            raise ValueError(f"Cannot group by {bad} (choose from {', '.join(allowed)})")
+        return ", ".join(by)
+
+    def working_minutes(self, by=("trade", "hour"), **filters):
+        """Working vs. observed minutes (and the working share) per group."""
+        group = self._group(by)
+        return self.sql(f"""
+            SELECT {group},
+                   round(sum(weight) FILTER (WHERE is_working) / {self.fps} / 60.0, 2) AS working_min,
+                   round(sum(weight) / {self.fps} / 60.0, 2) AS observed_min,
+                   round(100.0 * sum(weight) FILTER (WHERE is_working) / sum(weight), 1) AS working_pct,
+                   count(DISTINCT video) AS videos
+            FROM frames {self._where(**filters)}
+            GROUP BY {group} ORDER BY {group}
+        """)
+
+    def idle_near(self, obj, min_minutes=10.0, **filters):
+        """Videos with more than *min_minutes* idle while *obj* (a YOLO class, case-insensitive)
+        was in view. Class names match exactly, so "Hardhat" does not match "NO-Hardhat"."""
+        # objects_list is the pipeline's ", "-joined class names
+        in_view = f"list_contains(string_split(lower(objects_list), ', '), {_sql_str(obj.strip().lower())})"
+        where = self._where(**filters, extra=["NOT is_working", in_view])
+        return self.sql(f"""
+            SELECT trade, date, video, round(sum(weight) / {self.fps} / 60.0, 2) AS idle_min
+            FROM frames {where}
+            GROUP BY trade, date, video
+            HAVING sum(weight) / {self.fps} / 60.0 > {float(min_minutes)}
+            ORDER BY idle_min DESC
+        """)
+
+    def bout_stats(self, by=("trade",), **filters):
+        """Work / idle bout counts and lengths per group."""
+        group = self._group(by, GROUP_COLUMNS[:3])
+        return self.sql(f"""
+            SELECT {group},
+                   count(*) FILTER (WHERE working) AS work_bouts,
+                   round(avg(duration_s) FILTER (WHERE working), 1) AS mean_work_s,
+                   count(*) FILTER (WHERE NOT working) AS idle_bouts,
+                   round(avg(duration_s) FILTER (WHERE NOT working), 1) AS mean_idle_s,
+                   round(max(duration_s) FILTER (WHERE NOT working), 1) AS longest_idle_s
+            FROM bouts {self._where(**filters)}
+            GROUP BY {group} ORDER BY {group}
+        """)
+
+    def productivity(self, by=("trade", "date"), **filters):
+        group = self._group(by)
+        return self.sql(f"""
+            SELECT {group}, count(DISTINCT video) AS videos,
+                   round(100.0 * sum(weight) FILTER (WHERE is_working) / sum(weight), 1) AS productivity_pct,
+                   round(max(smoothed_exertion), 2) AS peak_exertion
+            FROM frames {self._where(**filters)}
+            GROUP BY {group} ORDER BY {group}
+        """)
+
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Cross-video queries over per-frame and per-bout data (DuckDB).")
+    parser.add_argument("--warehouse", default=WAREHOUSE_DIR)
+    parser.add_argument("--csv", help="Write the result here instead of printing it")
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--trade", action="append", dest="trades", help="Repeatable")
+    filters.add_argument("--video", action="append", dest="videos", help="Repeatable")
+    filters.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    filters.add_argument("--to", dest="date_to", help="YYYY-MM-DD")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("sync", help="Update the Parquet warehouse from outputs/*_data.csv")
+    p = sub.add_parser("working-minutes", parents=[filters], help="Working minutes per group")
+    p.add_argument("--by", nargs="+", default=["trade", "hour"], choices=GROUP_COLUMNS)
+    p = sub.add_parser("idle-near", parents=[filters], help="Videos idle for long with an object in view")
+    p.add_argument("object")
+    p.add_argument("--min-minutes", type=float, default=10.0)
+    p = sub.add_parser("bouts", parents=[filters], help="Work/idle bout statistics per group")
+    p.add_argument("--by", nargs="+", default=["trade"], choices=GROUP_COLUMNS[:3])
+    p = sub.add_parser("productivity", parents=[filters], help="Time-weighted productivity per group")
+    p.add_argument("--by", nargs="+", default=["trade", "date"], choices=GROUP_COLUMNS)
+    p = sub.add_parser("sql", help="Any query over the `frames` and `bouts` views")
+    p.add_argument("query")
+    p.add_argument("--explain", action="store_true", help="Print DuckDB's profile (files/row groups scanned)")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        logger.info(f"Warehouse sync: {sync(warehouse=args.warehouse)}")
+        return 0
+    q = SiteQuery(args.warehouse)
+    flt = {k: getattr(args, k) for k in ("trades", "videos", "date_from", "date_to") if hasattr(args, k)}
+    if args.command == "working-minutes":
+        result = q.working_minutes(args.by, **flt)
+    elif args.command == "idle-near":
+        result = q.idle_near(args.object, args.min_minutes, **flt)
+    elif args.command == "bouts":
+        result = q.bout_stats(args.by, **flt)
+    elif args.command == "productivity":
+        result = q.productivity(args.by, **flt)
+    elif args.explain:
+        print(q.explain(args.query))
+        return 0
+    else:
+        result = q.sql(args.query)
+
+    if args.csv:
+        result.to_csv(args.csv, index=False)
+        logger.success(f"{len(result)} rows written to {args.csv}")
+    else:
+        print(result.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Per-stage wall-time histograms and frame counters for one pipeline run,
+# exported as `<video>_timing.json` and a Prometheus textfile.
+BUCKETS_S = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+METRIC_PREFIX = "builderbobs_pipeline"
+
+_NULL = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("hist", "name", "start")
+
+    def __init__(self, hist, name):
+        self.hist = hist
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.hist.observe(self.name, time.perf_counter() - self.start)
+
+
+class StageTimer:
+    """`with timer.stage("yolo"): ...` records one observation. A disabled timer hands
+    out a shared no-op context, so instrumented code costs next to nothing."""
+
+    def __init__(self, enabled=True, counters=()):
+        self.enabled = enabled
+        self.stages = {}     # name -> {"buckets": [...], "count", "sum", "max"}
+        self.counters = {name: 0 for name in counters}
+        self.started = time.time()
+        self._stage_cms = {}
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL
+        cm = self._stage_cms.get(name)
+        if cm is None:
+            cm = self._stage_cms[name] = _Stage(self, name)
+        return cm
+
+    def observe(self, name, seconds):
+        s = self.stages.get(name)
+        if s is None:
+            s = self.stages[name] = {"buckets": [0] * (len(BUCKETS_S) + 1), "count": 0, "sum": 0.0, "max": 0.0}
+        s["buckets"][bisect_left(BUCKETS_S, seconds)] += 1
+        s["count"] += 1
+        s["sum"] += seconds
+        if seconds > s["max"]:
+            s["max"] = seconds
+
+    def merge(self, stages, counters):
+        """Fold in the `stages` / `counters` of another timer (e.g. from a worker process)."""
+        for name, other in stages.items():
+            s = self.stages.setdefault(name, {"buckets": [0] * (len(BUCKETS_S) + 1), "count": 0, "sum": 0.0, "max": 0.0})
+            s["buckets"] = [a + b for a, b in zip(s["buckets"], other["buckets"])]
+            s["count"] += other["count"]
+            s["sum"] += other["sum"]
+            s["max"] = max(s["max"], other["max"])
+        for name, n in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def _quantile(self, s, q):
+        # Upper bound of the bucket holding the q-th observation
+        target = q * s["count"]
+        seen = 0
+        for bound, n in zip(BUCKETS_S + [float("inf")], s["buckets"]):
+            seen += n
+            if seen >= target:
+                return min(bound, s["max"])
+        return s["max"]
+
+    def summary(self, **extra):
+        stages = {}
+        for name, s in self.stages.items():
+            stages[name] = {
+                "count": s["count"],
+                "total_s": round(s["sum"], 4),
+                "mean_ms": round(1000 * s["sum"] / s["count"], 3) if s["count"] else 0.0,
+                "p50_ms": round(1000 * self._quantile(s, 0.5), 3),
+                "p95_ms": round(1000 * self._quantile(s, 0.95), 3),
+                "max_ms": round(1000 * s["max"], 3),
+                "histogram": {f"le_{b}": n for b, n in zip(BUCKETS_S + ["inf"], s["buckets"])},
+            }
+        return {"started": self.started, "stages": stages, "counters": dict(self.counters), **extra}
+
+    def write_json(self, path, **extra):
+        with open(path, "w") as f:
+            json.dump(self.summary(**extra), f, indent=4)
+
+    def write_prometheus(self, path, labels, gauges=None):
+        """Node-exporter textfile: stage histograms, counters, and any extra *gauges*.
+        Written to a temp file and renamed, as the textfile collector requires."""
+        base = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        lines = [f"# HELP {METRIC_PREFIX}_stage_seconds Wall time per pipeline stage call.",
+                 f"# TYPE {METRIC_PREFIX}_stage_seconds histogram"]
+        for name, s in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS_S + ["+Inf"], s["buckets"]):
+                cumulative += n
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{{base},stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{{base},stage="{name}"}} {s["sum"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{{base},stage="{name}"}} {s["count"]}')
+
+        lines += [f"# HELP {METRIC_PREFIX}_frames Frames by outcome in the last run.",
+                  f"# TYPE {METRIC_PREFIX}_frames gauge"]
+        for name, n in sorted(self.counters.items()):
+            lines.append(f'{METRIC_PREFIX}_frames{{{base},kind="{name}"}} {n}')
+
+        for name, value in (gauges or {}).items():
+            lines += [f"# TYPE {METRIC_PREFIX}_{name} gauge", f"{METRIC_PREFIX}_{name}{{{base}}} {value}"]
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
+
+
+DISABLED = StageTimer(enabled=False)
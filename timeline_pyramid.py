@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# A multi-resolution summary of `smoothed_exertion` / `is_working` so the
+# dashboard can draw any zoom level of a 10-hour shift with a few hundred points.
+OUTPUT_DIR = 'outputs/'
+PROCESS_FPS = 5
+LEVELS_S = [1, 10, 60]   # Bucket sizes in seconds (the raw sampled frames are level 0)
+MAX_POINTS = 1500        # Most points a single query returns
+
+
+def pyramid_path(base_name, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{base_name}_timeline.npz")
+
+
+def _bucketize(t, exertion, working, weight, bucket_s):
+    ids = np.floor(t / bucket_s).astype(np.int64)
+    # Rows are time-ordered, so each bucket is a contiguous run
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+    # NaN-safe: missing exertion contributes nothing to min/max/mean; a bucket with
+    # no valid sample at all is NaN (a gap in the chart, not a dip to 0)
+    valid = ~np.isnan(exertion)
+    n_valid = np.add.reduceat(valid.astype(np.int64), starts)
+    empty = n_valid == 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lo = np.minimum.reduceat(np.where(valid, exertion, np.inf), starts)
+        hi = np.maximum.reduceat(np.where(valid, exertion, -np.inf), starts)
+        mean = np.add.reduceat(np.where(valid, exertion, 0.0), starts) / n_valid
+    lo[empty] = hi[empty] = mean[empty] = np.nan
+    # Adaptively sampled rows stand for `weight` grid slots each
+    return {
+        "t": (ids[starts] * bucket_s).astype(np.float32),
+        "min": lo.astype(np.float32),
+        "max": hi.astype(np.float32),
+        "mean": mean.astype(np.float32),
+        "working": (np.add.reduceat(working * weight, starts) / np.add.reduceat(weight, starts)).astype(np.float32),
+    }
+
+
+def build_pyramid(df: pd.DataFrame, fps=PROCESS_FPS) -> dict:
+    """Per-level arrays {level_s: {"t", "min", "max", "mean", "working"}} from a per-frame data frame.
+    `working` is the fraction of the bucket's grid slots that were working (rows weighted
+    by `weight` on adaptively sampled data). Missing exertion stays NaN."""
+    t = ((df["frame"].to_numpy(dtype=np.float64) - 1) / fps)
+    exertion = df["smoothed_exertion"].to_numpy(dtype=np.float64)
+    working = df["is_working"].astype(bool).to_numpy(dtype=np.float64)
+    weight = df["weight"].to_numpy(dtype=np.float64) if "weight" in df else np.ones(len(df))
+
+    raw = exertion.astype(np.float32)
+    levels = {0: {"t": t.astype(np.float32), "min": raw, "max": raw, "mean": raw,
+                  "working": working.astype(np.float32)}}
+    for level_s in LEVELS_S:
+        levels[level_s] = _bucketize(t, exertion, working, weight, level_s)
+    return levels
+
+
+def save_pyramid(df: pd.DataFrame, base_name, output_dir=OUTPUT_DIR, fps=PROCESS_FPS):
+    levels = build_pyramid(df, fps)
+    arrays = {f"L{level}_{key}": arr for level, cols in levels.items() for key, arr in cols.items()}
+    path = pyramid_path(base_name, output_dir)
+    np.savez_compressed(path, **arrays)
+    logger.info(f"Timeline pyramid saved to {path}")
+    return path
+
+
+def load_pyramid(path) -> dict:
+    levels = {}
+    with np.load(path) as data:
+        for name in data.files:
+            level, key = name[1:].split("_", 1)
+            levels.setdefault(int(level), {})[key] = data[name]
+    return levels
+
+
+def duration_s(levels) -> float:
+    t = levels[0]["t"]
+    return float(t[-1]) if len(t) else 0.0
+
+
+def query(levels, t0=None, t1=None, max_points=MAX_POINTS) -> tuple[pd.DataFrame, float]:
+    """Rows of the finest level that covers [t0, t1] in at most *max_points* points.
+    Returns (frame with t/min/max/mean/working columns, bucket size in seconds; 0 = raw frames)."""
+    t0 = 0.0 if t0 is None else t0
+    t1 = duration_s(levels) if t1 is None else t1
+    ordered = sorted(levels)
+    for level in ordered:
+        t = levels[level]["t"]
+        # Start one bucket early so the first partial bucket is included
+        lo = np.searchsorted(t, t0 - level, side="left")
+        hi = np.searchsorted(t, t1, side="right")
+        if hi - lo <= max_points or level == ordered[-1]:
+            step = max(1, int(np.ceil((hi - lo) / max_points)))
+            cols = {key: arr[lo:hi:step] for key, arr in levels[level].items()}
+            return pd.DataFrame(cols), level
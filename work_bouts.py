@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pandas as pd
+import event_index
+
+# ---------------------------------------------------------
+# WORK BOUTS
+# ---------------------------------------------------------
+# A "bout" is a contiguous run of sampled frames that are all working or all
+# idle according to the `is_working` column of `<video>_data.csv`.
+OUTPUT_DIR = 'outputs/'
+PROCESS_FPS = 5  # Sampled frames per second in the per-frame data
+
+
+def find_bouts(is_working) -> list[dict]:
+    """Split a boolean per-frame series into contiguous bouts.
+    Each bout is {"start": i, "end": j, "working": bool} with `end` exclusive (row indices)."""
+    flags = np.asarray(is_working, dtype=bool)
+    if flags.size == 0:
+        return []
+    change = np.flatnonzero(np.diff(flags.astype(np.int8))) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [flags.size]))
+    return [
+        {"start": int(s), "end": int(e), "working": bool(flags[s])}
+        for s, e in zip(starts, ends)
+    ]
+
+
+def bouts_to_seconds(bouts, fps=PROCESS_FPS, frames=None, weights=None) -> list[dict]:
+    """Adds start_s/end_s plus the first/last sampling-grid frame of each bout. Without
+    *frames* row i is grid frame i + 1; adaptively sampled data passes its `frame` and
+    `weight` columns (rows standing for several grid slots)."""
+    if frames is None:
+        return [
+            {**b, "start_s": b["start"] / fps, "end_s": b["end"] / fps,
+             "first_frame": b["start"] + 1, "last_frame": b["end"]}
+            for b in bouts
+        ]
+    frames = np.asarray(frames, dtype=np.int64)
+    last_slot = frames + (np.asarray(weights, dtype=np.int64) if weights is not None else 1) - 1
+    return [
+        {**b, "start_s": (frames[b["start"]] - 1) / fps, "end_s": last_slot[b["end"] - 1] / fps,
+         "first_frame": int(frames[b["start"]]), "last_frame": int(last_slot[b["end"] - 1])}
+        for b in bouts
+    ]
+
+
+def load_bouts(base_name, output_dir=OUTPUT_DIR, fps=PROCESS_FPS) -> list[dict] | None:
+    """Bouts (with second offsets) for a processed video, or None if it has no per-frame data yet.
+    Read from the video's event index when it is up to date, else from _data.csv."""
+    index = event_index.load_index(base_name, output_dir)
+    if index is not None and index.fps == fps:
+        return index.bouts()
+    csv_path = os.path.join(output_dir, f"{base_name}_data.csv")
+    if not os.path.exists(csv_path):
+        return None
+    df = pd.read_csv(csv_path, usecols=lambda c: c in ("frame", "weight", "is_working"))
+    bouts = find_bouts(df["is_working"].astype(bool))
+    if "weight" not in df:
+        return bouts_to_seconds(bouts, fps)
+    return bouts_to_seconds(bouts, fps, df["frame"], df["weight"])
@@ -0,0 +1,628 @@
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import socket
+import sqlite3
+import argparse
+import threading
+import contextlib
+import urllib.parse
+import multiprocessing
+import cv2
+import pandas as pd
+from loguru import logger
+import first_person_pipeline as fpp
+import adaptive_sampler
+import detection_reuse
+import progress_events
+import stage_timer
+import yolo_engines
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# Job queue for spreading videos (or segments of long videos) over many workers and
+# machines. A worker leases a job and renews the lease with heartbeats while it runs;
+# a crashed worker's lease runs out and the job goes to the next worker, up to
+# MAX_ATTEMPTS attempts. Backends:
+#   sqlite:<path>  one machine (several worker processes); SQLite locking is not safe on NFS
+#   dir:<path>     a directory on a filesystem every node mounts (NFS, SMB, ...); claims are
+#                  exclusive file creates, so no server is needed
+# Workers read INPUT_DIR and write OUTPUT_DIR by the paths in the job, so on several
+# machines both must be shared and mounted at the same place.
+QUEUE_URL = os.getenv("WORK_QUEUE", "sqlite:" + os.path.join(fpp.OUTPUT_DIR, "work_queue.db"))
+LEASE_S = float(os.getenv("WORK_LEASE_S", "120"))
+HEARTBEAT_EVERY_S = LEASE_S / 4
+MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", "3"))
+POLL_S = float(os.getenv("WORK_POLL_S", "5"))
+STEPS = ("stage1", "motion", "agent")     # process_video, apply_global_motion, agent_video_analyzer
+DEFAULT_STEPS = os.getenv("WORK_STEPS", ",".join(STEPS))
+TIMER_COUNTERS = ("decoded", "sampled", "skipped", "failed", "dropped")
+
+
+def _json(obj):
+    return json.dumps(obj, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------------------------------------
+# BACKENDS
+# ---------------------------------------------------------
+# Both implement: put, claim, heartbeat, complete, fail, jobs, reset. A job spec is a dict
+# with id, kind (video / segment / stitch), video, after (ids that must be done first),
+# max_attempts and params. claim() returns (spec, attempt) or None.
+
+class SQLiteQueue:
+    def __init__(self, path, lease_s=LEASE_S):
+        self.path = path
+        self.lease_s = lease_s
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._tx() as con:
+            con.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, spec TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, worker TEXT,
+                lease_expires REAL, result TEXT, error TEXT, updated REAL)""")
+        with contextlib.closing(sqlite3.connect(path, timeout=60)) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+
+    @contextlib.contextmanager
+    def _tx(self):
+        # BEGIN IMMEDIATE takes the write lock up front: two workers never pick the same job
+        con = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            yield con
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def put(self, spec, replace=False):
+        with self._tx() as con:
+            if replace:
+                con.execute("DELETE FROM jobs WHERE id = ?", (spec["id"],))
+            cur = con.execute("INSERT OR IGNORE INTO jobs (id, spec, updated) VALUES (?, ?, ?)",
+                              (spec["id"], _json(spec), time.time()))
+            return cur.rowcount == 1
+
+    def claim(self, worker):
+        now = time.time()
+        with self._tx() as con:
+            states = dict(con.execute("SELECT id, state FROM jobs"))
+            rows = con.execute("SELECT id, spec, state, attempts, lease_expires FROM jobs "
+                               "WHERE state IN ('queued', 'leased') ORDER BY seq").fetchall()
+            for job_id, spec, state, attempts, expires in rows:
+                if state == "leased" and expires > now:
+                    continue
+                spec = json.loads(spec)
+                if attempts >= spec["max_attempts"]:
+                    self._finish(con, job_id, "failed", error=f"lease expired on attempt {attempts} (worker lost)")
+                    states[job_id] = "failed"
+                    continue
+                waiting = [a for a in spec["after"] if states.get(a) != "done"]
+                if any(states.get(a) == "failed" for a in waiting):
+                    self._finish(con, job_id, "failed", error="an upstream job failed")
+                    states[job_id] = "failed"
+                    continue
+                if waiting:
+                    continue
+                con.execute("UPDATE jobs SET state = 'leased', attempts = attempts + 1, worker = ?, "
+                            "lease_expires = ?, updated = ? WHERE id = ?", (worker, now + self.lease_s, now, job_id))
+                return spec, attempts + 1
+        return None
+
+    def _owned(self, con, job_id, worker, attempt):
+        row = con.execute("SELECT state, worker, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and row == ("leased", worker, attempt)
+
+    def _finish(self, con, job_id, state, result=None, error=None):
+        con.execute("UPDATE jobs SET state = ?, result = ?, error = ?, lease_expires = NULL, updated = ? WHERE id = ?",
+                    (state, None if result is None else _json(result), error, time.time(), job_id))
+
+    def heartbeat(self, job_id, worker, attempt):
+        with self._tx() as con:
+            if not self._owned(con, job_id, worker, attempt):
+                return False
+            con.execute("UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ?",
+                        (time.time() + self.lease_s, time.time(), job_id))
+            return True
+
+    def complete(self, job_id, worker, attempt, result):
+        with self._tx() as con:
+            if not self._owned(con, job_id, worker, attempt):
+                return False
+            self._finish(con, job_id, "done", result=result)
+            return True
+
+    def fail(self, job_id, worker, attempt, error):
+        """Give the job back (or fail it for good once out of attempts). Returns the new state."""
+        with self._tx() as con:
+            if not self._owned(con, job_id, worker, attempt):
+                return None
+            spec = json.loads(con.execute("SELECT spec FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+            state = "failed" if attempt >= spec["max_attempts"] else "queued"
+            self._finish(con, job_id, state, error=error)
+            return state
+
+    def jobs(self):
+        with contextlib.closing(sqlite3.connect(self.path, timeout=60)) as con:
+            rows = con.execute("SELECT spec, state, attempts, worker, lease_expires, result, error FROM jobs "
+                               "ORDER BY seq").fetchall()
+        now = time.time()
+        return [{**json.loads(spec), "state": "expired" if state == "leased" and expires <= now else state,
+                 "attempts": attempts, "worker": worker, "lease_expires": expires,
+                 "result": json.loads(result) if result else None, "error": error}
+                for spec, state, attempts, worker, expires, result, error in rows]
+
+    def reset(self, job_ids):
+        with self._tx() as con:
+            return sum(con.execute("UPDATE jobs SET state = 'queued', attempts = 0, worker = NULL, lease_expires = NULL, "
+                                   "result = NULL, error = NULL WHERE id = ?", (job_id,)).rowcount for job_id in job_ids)
+
+
+class DirQueue:
+    """Queue kept as files in a shared directory:
+
+    - jobs/<id>.json: the spec (created once, with link(), so enqueueing is idempotent)
+    - attempts/<id>.<n>: attempt n, created with O_EXCL by the worker that wins it. It is
+      also that attempt's lease ({worker, expires}), renewed in place by heartbeats
+    - done/<id>.json, failed/<id>.json: final states
+
+    A job is free when its newest attempt's lease has expired (or it has none)."""
+
+    def __init__(self, root, lease_s=LEASE_S):
+        self.root = root
+        self.lease_s = lease_s
+        for sub in ("jobs", "attempts", "done", "failed"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        self._specs = {}
+
+    def _path(self, sub, job_id, suffix=".json"):
+        return os.path.join(self.root, sub, urllib.parse.quote(job_id, safe="") + suffix)
+
+    def _write(self, path, obj):
+        tmp = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(_json(obj))
+        os.replace(tmp, path)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.loads(f.read() or "null")
+        except FileNotFoundError:
+            return None
+
+    def _load_specs(self):
+        for name in os.listdir(os.path.join(self.root, "jobs")):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.root, "jobs", name)
+            mtime = os.stat(path).st_mtime_ns
+            if self._specs.get(name, (None,))[0] != mtime:
+                self._specs[name] = (mtime, self._read(path))
+        return sorted((spec for _, spec in self._specs.values() if spec), key=lambda s: (s["seq"], s["id"]))
+
+    def _attempts(self):
+        latest = {}
+        for name in os.listdir(os.path.join(self.root, "attempts")):
+            job, _, n = name.rpartition(".")
+            if n.isdigit():
+                job_id = urllib.parse.unquote(job)
+                latest[job_id] = max(latest.get(job_id, 0), int(n))
+        return latest
+
+    def _final(self, sub):
+        return {urllib.parse.unquote(n[:-5]) for n in os.listdir(os.path.join(self.root, sub)) if n.endswith(".json")}
+
+    def _lease(self, job_id, n):
+        path = self._path("attempts", job_id, f".{n}")
+        lease = self._read(path)
+        if lease is None:
+            # Created but not written yet: counts as freshly leased
+            try:
+                return {"worker": None, "expires": os.stat(path).st_mtime + self.lease_s}
+            except FileNotFoundError:
+                return {"worker": None, "expires": 0}
+        return lease
+
+    def put(self, spec, replace=False):
+        path = self._path("jobs", spec["id"])
+        spec = {**spec, "seq": time.time_ns()}
+        if replace:
+            self.reset([spec["id"]])
+            self._write(path, spec)
+            return True
+        tmp = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(_json(spec))
+        try:
+            os.link(tmp, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp)
+
+    def claim(self, worker):
+        now = time.time()
+        done, failed, latest = self._final("done"), self._final("failed"), self._attempts()
+        for spec in self._load_specs():
+            job_id = spec["id"]
+            if job_id in done or job_id in failed:
+                continue
+            n = latest.get(job_id, 0)
+            if n and self._lease(job_id, n)["expires"] > now:
+                continue
+            if n >= spec["max_attempts"]:
+                self._write(self._path("failed", job_id), {"error": f"lease expired on attempt {n} (worker lost)"})
+                continue
+            waiting = [a for a in spec["after"] if a not in done]
+            if any(a in failed for a in waiting):
+                self._write(self._path("failed", job_id), {"error": "an upstream job failed"})
+                failed.add(job_id)
+                continue
+            if waiting:
+                continue
+            try:
+                fd = os.open(self._path("attempts", job_id, f".{n + 1}"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue   # Another worker won this attempt
+            with os.fdopen(fd, "w") as f:
+                f.write(_json({"worker": worker, "expires": now + self.lease_s}))
+            return spec, n + 1
+        return None
+
+    def _owned(self, job_id, worker, attempt):
+        return self._attempts().get(job_id) == attempt and self._lease(job_id, attempt).get("worker") == worker
+
+    def heartbeat(self, job_id, worker, attempt):
+        if not self._owned(job_id, worker, attempt):
+            return False
+        self._write(self._path("attempts", job_id, f".{attempt}"), {"worker": worker, "expires": time.time() + self.lease_s})
+        return True
+
+    def complete(self, job_id, worker, attempt, result):
+        if not self._owned(job_id, worker, attempt):
+            return False
+        self._write(self._path("done", job_id), {"result": result, "worker": worker, "attempt": attempt})
+        return True
+
+    def fail(self, job_id, worker, attempt, error):
+        if not self._owned(job_id, worker, attempt):
+            return None
+        self._write(self._path("attempts", job_id, f".{attempt}"), {"worker": worker, "expires": 0, "error": error})
+        spec = self._read(self._path("jobs", job_id))
+        if attempt >= spec["max_attempts"]:
+            self._write(self._path("failed", job_id), {"error": error})
+            return "failed"
+        return "queued"
+
+    def jobs(self):
+        now = time.time()
+        done, failed, latest = self._final("done"), self._final("failed"), self._attempts()
+        out = []
+        for spec in self._load_specs():
+            job_id = spec["id"]
+            n = latest.get(job_id, 0)
+            lease = self._lease(job_id, n) if n else {}
+            final = self._read(self._path("done" if job_id in done else "failed", job_id)) or {}
+            if job_id in done or job_id in failed:
+                state = "done" if job_id in done else "failed"
+            elif lease.get("expires", 0) > now:
+                state = "leased"
+            else:
+                state = "expired" if n and not lease.get("error") else "queued"
+            out.append({**spec, "state": state, "attempts": n, "worker": lease.get("worker"),
+                        "lease_expires": lease.get("expires"), "result": final.get("result"),
+                        "error": final.get("error") or lease.get("error")})
+        return out
+
+    def reset(self, job_ids):
+        count = 0
+        for job_id in job_ids:
+            prefix = urllib.parse.quote(job_id, safe="") + "."
+            for name in os.listdir(os.path.join(self.root, "attempts")):
+                if name.startswith(prefix) and name[len(prefix):].isdigit():
+                    os.remove(os.path.join(self.root, "attempts", name))
+            for sub in ("done", "failed"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._path(sub, job_id))
+            count += 1
+        return count
+
+
+def open_queue(url=QUEUE_URL, lease_s=LEASE_S):
+    kind, _, path = url.partition(":")
+    if kind == "sqlite":
+        return SQLiteQueue(path, lease_s)
+    if kind == "dir":
+        return DirQueue(path, lease_s)
+    raise ValueError(f"Unknown queue {url!r} (use sqlite:<path> or dir:<path>)")
+
+
+def pending(queue):
+    return sum(job["state"] not in ("done", "failed") for job in queue.jobs())
+
+
+# ---------------------------------------------------------
+# ENQUEUE
+# ---------------------------------------------------------
+def enqueue(queue, video_paths, segments=1, steps=DEFAULT_STEPS, max_attempts=MAX_ATTEMPTS, replace=False,
+            engine=None, adaptive=False, reuse_detections=False, work_width=0):
+    """One job per video, or with *segments* > 1 one job per frame range of a long video
+    plus a stitch job that runs once they are all done. Returns the ids added."""
+    steps = [s for s in steps.split(",") if s] if isinstance(steps, str) else list(steps)
+    unknown = [s for s in steps if s not in STEPS]
+    if unknown:
+        raise ValueError(f"Unknown steps {unknown} (choose from {', '.join(STEPS)})")
+    added = []
+    for video_path in video_paths:
+        base_name = os.path.splitext(os.path.basename(video_path))[0]
+        common = {"video_path": video_path, "steps": steps, "engine": engine or fpp.YOLO_ENGINE,
+                  "adaptive": adaptive, "reuse_detections": reuse_detections, "work_width": work_width}
+        specs = []
+        ranges = [(0, None)]
+        if segments > 1 and "stage1" in steps:
+            cap = cv2.VideoCapture(video_path)
+            fps = int(cap.get(cv2.CAP_PROP_FPS))
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            cap.release()
+            frame_skip = max(1, int(fps / fpp.PROCESS_FPS))
+            ranges = fpp.plan_segments(total_frames, fps, frame_skip, segments)
+        if len(ranges) == 1:
+            specs.append({"id": base_name, "kind": "video", "video": base_name, "after": [], "params": common})
+        else:
+            parts = [os.path.join(fpp.segment_dir(base_name), f"part_{i:03d}.mp4") for i in range(len(ranges))]
+            for i, (start, end) in enumerate(ranges):
+                specs.append({"id": f"{base_name}#seg{i:03d}", "kind": "segment", "video": base_name, "after": [],
+                              "params": {**common, "part": parts[i], "start": start, "end": end,
+                                         "frame_skip": frame_skip, "size": size}})
+            specs.append({"id": f"{base_name}#stitch", "kind": "stitch", "video": base_name,
+                          "after": [s["id"] for s in specs],
+                          "params": {**common, "parts": parts, "total_frames": total_frames, "fps": fps,
+                                     "size": size}})
+        for spec in specs:
+            spec["max_attempts"] = max_attempts
+            if queue.put(spec, replace=replace):
+                added.append(spec["id"])
+            else:
+                logger.info(f"{spec['id']} is already queued (use --force to run it again)")
+    return added
+
+
+# ---------------------------------------------------------
+# WORKER
+# ---------------------------------------------------------
+class Heartbeat(threading.Thread):
+    """Renews a job's lease every HEARTBEAT_EVERY_S while the job runs."""
+
+    def __init__(self, queue, job_id, worker, attempt, every_s=HEARTBEAT_EVERY_S):
+        super().__init__(daemon=True)
+        self.queue, self.job_id, self.worker, self.attempt = queue, job_id, worker, attempt
+        self.every_s = every_s
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.every_s):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker, self.attempt):
+                    self.lost = True
+                    logger.warning(f"{self.job_id}: lease lost (expired and taken over); its result will be discarded")
+                    return
+            except Exception as e:
+                logger.warning(f"{self.job_id}: heartbeat failed ({e}); retrying")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+_loaded_engine = None
+
+
+def _use_engine(engine):
+    # Models stay loaded between jobs; reload only when a job asks for another engine
+    global _loaded_engine
+    if engine != _loaded_engine:
+        fpp.YOLO_ENGINE = os.environ["YOLO_ENGINE"] = engine
+        fpp.yolo_model = None
+        _loaded_engine = engine
+
+
+def run_segment(params):
+    task = (params["video_path"], params["part"], params["start"], params["end"], params["frame_skip"],
+            tuple(params["size"]), fpp.STAGE_TIMING, params["adaptive"], params["reuse_detections"], params["work_width"])
+    os.makedirs(os.path.dirname(params["part"]), exist_ok=True)
+    started = time.perf_counter()
+    result = fpp._process_segment(task)
+    seconds = time.perf_counter() - started
+    # Picked up by the stitch job, possibly on another machine
+    tmp = params["part"] + ".pkl.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump((result, seconds), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, params["part"] + ".pkl")
+    return {"rows": len(result[0]), "decoded": result[1], "seconds": round(seconds, 2)}
+
+
+def run_stitch(params):
+    """The second half of process_video() for a video whose segments ran as separate jobs."""
+    video_path = params["video_path"]
+    base_name = os.path.splitext(os.path.basename(video_path))[0]
+    results, loop_s = [], 0.0
+    for part in params["parts"]:
+        with open(part + ".pkl", "rb") as f:
+            result, seconds = pickle.load(f)
+        results.append(result)
+        loop_s += seconds
+    timer = stage_timer.StageTimer(enabled=fpp.STAGE_TIMING, counters=TIMER_COUNTERS)
+    sampler = adaptive_sampler.AdaptiveSampler() if params["adaptive"] else None
+    reuse = detection_reuse.DetectionReuser() if params["reuse_detections"] else None
+    exertion_data = fpp.stitch_segments(results, base_name, timer, sampler, reuse)
+    output_video_path = os.path.join(fpp.OUTPUT_DIR, f"{base_name}_annotated.mp4")
+    with timer.stage("concat"):
+        fpp.concat_videos(params["parts"], output_video_path)
+    progress = progress_events.ProgressReporter(base_name, params["total_frames"], params["fps"],
+                                                path=os.path.join(fpp.OUTPUT_DIR, 'pipeline_events.jsonl'))
+    progress.start()
+    metrics = fpp.finish_video(video_path, output_video_path, exertion_data, sum(r[1] for r in results),
+                               params["total_frames"], loop_s, timer, progress, sampler, reuse,
+                               size=tuple(params["size"]))
+    shutil.rmtree(fpp.segment_dir(base_name), ignore_errors=True)
+    return metrics
+
+
+def run_job(spec):
+    """Run one job; returns its result (for video / stitch jobs the video's master row)."""
+    params = spec["params"]
+    video_path = params["video_path"]
+    _use_engine(params["engine"])
+    if spec["kind"] == "segment":
+        return run_segment(params)
+
+    row = {"Video": spec["video"]}
+    if spec["kind"] == "stitch":
+        row = run_stitch(params)
+    elif "stage1" in params["steps"]:
+        row = fpp.process_video(video_path, segments=1, adaptive=params["adaptive"],
+                                reuse_detections=params["reuse_detections"], work_width=params["work_width"])
+        if row is None:
+            raise RuntimeError(f"Cannot open video: {video_path}")
+    if "motion" in params["steps"]:
+        import apply_global_motion
+        row.update(apply_global_motion.process_motion_for_video(video_path, spec["video"]) or {})
+    if "agent" in params["steps"]:
+        import agent_video_analyzer
+        ai_data = agent_video_analyzer.analyze_video(video_path, cv_metrics=row, update_master=False)
+        if ai_data is None:
+            raise RuntimeError(f"No AI analysis for {video_path}")
+        row.update(agent_video_analyzer.master_columns(ai_data))
+    return row
+
+
+def run_worker(queue_url=QUEUE_URL, worker=None, forever=False, poll_s=POLL_S, lease_s=LEASE_S):
+    """Lease and run jobs until the queue is drained (or forever). Returns the jobs done."""
+    queue = open_queue(queue_url, lease_s)
+    worker = worker or worker_name()
+    done = 0
+    logger.info(f"Worker {worker} polling {queue_url}")
+    while True:
+        claimed = queue.claim(worker)
+        if claimed is None:
+            # Leased jobs may still come back if their worker dies, so wait for them too
+            if not forever and not pending(queue):
+                break
+            time.sleep(poll_s)
+            continue
+        spec, attempt = claimed
+        logger.info(f"{worker}: {spec['id']} (attempt {attempt}/{spec['max_attempts']})")
+        beat = Heartbeat(queue, spec["id"], worker, attempt, every_s=lease_s / 4)
+        beat.start()
+        try:
+            result = run_job(spec)
+        except Exception as e:
+            beat.stop()
+            state = queue.fail(spec["id"], worker, attempt, f"{type(e).__name__}: {e}")
+            logger.error(f"{worker}: {spec['id']} failed ({e}); {'will retry' if state == 'queued' else state}")
+            continue
+        beat.stop()
+        if queue.complete(spec["id"], worker, attempt, result):
+            done += 1
+            logger.success(f"{worker}: {spec['id']} done")
+        else:
+            logger.warning(f"{worker}: {spec['id']} finished after its lease was lost; result discarded")
+    logger.info(f"Worker {worker}: queue drained after {done} jobs")
+    return done
+
+
+def collect(queue, master_csv=fpp.MASTER_CSV):
+    """Master CSV from the finished video / stitch jobs."""
+    rows = [job["result"] for job in queue.jobs() if job["state"] == "done" and job["kind"] in ("video", "stitch")]
+    if not rows:
+        return 0
+    df = pd.DataFrame(rows).sort_values("Video")
+    tmp = master_csv + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, master_csv)
+    return len(df)
+
+
+def print_status(queue):
+    jobs = queue.jobs()
+    print(f"\n{'job':<44}{'state':<9}{'tries':>6}  {'worker':<28}{'error'}")
+    for job in jobs:
+        error = (job["error"] or "")[:60]
+        print(f"{job['id']:<44}{job['state']:<9}{job['attempts']:>6}  {str(job['worker'] or ''):<28}{error}")
+    counts = pd.Series([j["state"] for j in jobs]).value_counts().to_dict() if jobs else {}
+    print("\n" + ", ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leased job queue for processing videos on many workers.")
+    parser.add_argument("--queue", default=QUEUE_URL, help="sqlite:<path> (one machine) or dir:<path> (shared filesystem)")
+    parser.add_argument("--lease", type=float, default=LEASE_S, help="Seconds a lease lasts without a heartbeat")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("enqueue", help="Add videos (default: every .mp4 in INPUT_DIR)")
+    p.add_argument("videos", nargs="*")
+    p.add_argument("--segments", type=int, default=1, help="Split long videos into up to N segment jobs")
+    p.add_argument("--steps", default=DEFAULT_STEPS, help=f"Comma-separated subset of {','.join(STEPS)}")
+    p.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    p.add_argument("--force", action="store_true", help="Re-run jobs that are already queued or done")
+    p.add_argument("--engine", choices=list(yolo_engines.ENGINES), default=fpp.YOLO_ENGINE)
+    p.add_argument("--adaptive", action="store_true", default=fpp.ADAPTIVE_SAMPLING)
+    p.add_argument("--reuse-detections", action="store_true", default=fpp.DETECTION_REUSE)
+    p.add_argument("--work-width", type=int, default=fpp.WORK_WIDTH)
+    p = sub.add_parser("worker", help="Lease and run jobs until the queue is drained")
+    p.add_argument("--id", help="Worker name (default host:pid)")
+    p.add_argument("--processes", type=int, default=1, help="Worker processes to start on this machine")
+    p.add_argument("--forever", action="store_true", help="Keep polling when the queue is empty")
+    p.add_argument("--poll", type=float, default=POLL_S)
+    sub.add_parser("status", help="Show every job")
+    p = sub.add_parser("requeue", help="Queue jobs again (default: every failed job)")
+    p.add_argument("ids", nargs="*")
+    p = sub.add_parser("collect", help="Write the master CSV from finished jobs")
+    p.add_argument("--out", default=fpp.MASTER_CSV)
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue, args.lease)
+    if args.command == "enqueue":
+        videos = args.videos or sorted(os.path.join(fpp.INPUT_DIR, f) for f in os.listdir(fpp.INPUT_DIR)
+                                       if f.endswith(".mp4"))
+        added = enqueue(queue, videos, args.segments, args.steps, args.max_attempts, args.force, args.engine,
+                        args.adaptive, args.reuse_detections, args.work_width)
+        logger.success(f"Queued {len(added)} jobs on {args.queue}")
+    elif args.command == "worker":
+        if args.processes <= 1:
+            run_worker(args.queue, args.id, args.forever, args.poll, args.lease)
+        else:
+            # Fresh interpreters, as for segment workers: model state does not survive fork()
+            context = multiprocessing.get_context("spawn")
+            procs = [context.Process(target=run_worker, args=(args.queue, f"{args.id or worker_name()}/{i}",
+                                                              args.forever, args.poll, args.lease))
+                     for i in range(args.processes)]
+            for proc in procs:
+                proc.start()
+            for proc in procs:
+                proc.join()
+    elif args.command == "status":
+        print_status(queue)
+    elif args.command == "requeue":
+        ids = args.ids or [j["id"] for j in queue.jobs() if j["state"] == "failed"]
+        logger.info(f"Requeued {queue.reset(ids)} jobs")
+    elif args.command == "collect":
+        logger.success(f"{collect(queue, args.out)} videos written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import os
+import json
+import shutil
+import hashlib
+from loguru import logger
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+# CPU inference backends for the construction YOLO model. Every engine is an
+# ultralytics export of the same .pt weights, loaded back through ultralytics.YOLO,
+# so detect_objects sees the same results API (.boxes, .plot(), .names) whichever runs.
+ENGINE_DIR = os.getenv("YOLO_ENGINE_DIR", "models/engines/")
+IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+# Calibration set for INT8 (an ultralytics dataset yaml). Use site frames for the
+# construction model; the ultralytics default is COCO and only fits the stock weights.
+INT8_DATA = os.getenv("YOLO_INT8_DATA", "coco8.yaml")
+
+ENGINES = {
+    "pytorch": None,                                                      # The .pt as is
+    "onnx": {"format": "onnx", "suffix": ".onnx"},                        # ONNX Runtime
+    "openvino": {"format": "openvino", "suffix": "_openvino_model"},      # OpenVINO FP32
+    "openvino-int8": {"format": "openvino", "int8": True,                 # OpenVINO, NNCF post-training INT8
+                      "suffix": "_int8_openvino_model"},
+}
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def engine_path(weights, engine, engine_dir=ENGINE_DIR):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    # ultralytics picks the backend from the suffix, so it has to stay at the end
+    return os.path.join(engine_dir, f"{stem}_{IMGSZ}{ENGINES[engine]['suffix']}")
+
+
+def _fingerprint(weights, engine):
+    import ultralytics
+    return {"weights_sha256": _sha256(weights), "engine": engine, "imgsz": IMGSZ,
+            "int8_data": INT8_DATA if ENGINES[engine].get("int8") else None,
+            "ultralytics": ultralytics.__version__}
+
+
+def ensure_engine(weights, engine, engine_dir=ENGINE_DIR):
+    """Path of the exported model for *engine*, exporting it first unless a cached
+    export of the same weights/settings exists. The PyTorch engine is the weights file."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown YOLO engine '{engine}' (choose from {', '.join(ENGINES)})")
+    if ENGINES[engine] is None:
+        return weights
+
+    target = engine_path(weights, engine, engine_dir)
+    stamp_path = target + ".json"
+    fingerprint = _fingerprint(weights, engine)
+    if os.path.exists(target) and os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            if json.load(f) == fingerprint:
+                return target
+        logger.info(f"Cached {engine} export of {weights} is stale; exporting again.")
+
+    from ultralytics import YOLO
+    spec = ENGINES[engine]
+    options = {"format": spec["format"], "imgsz": IMGSZ}
+    if spec.get("int8"):
+        options.update(int8=True, data=INT8_DATA)
+    logger.info(f"Exporting {weights} to {engine} (one-off, cached in {engine_dir})...")
+    exported = YOLO(weights).export(**options)
+
+    os.makedirs(engine_dir, exist_ok=True)
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    shutil.move(str(exported), target)
+    with open(stamp_path, "w") as f:
+        json.dump(fingerprint, f, indent=4)
+    return target
+
+
+def load_engine(weights, engine="pytorch", engine_dir=ENGINE_DIR):
+    from ultralytics import YOLO
+    path = ensure_engine(weights, engine, engine_dir)
+    return YOLO(path, task="detect")